@@ -0,0 +1,193 @@
+"""
+User-to-user transfer graph for mule-account detection.
+Incrementally maintained from internal PIX transfers and queried by graph-derived anti-fraud rules.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.pix.models import PixStatus, PixTransaction, TransactionType
+
+# (timestamp, sender_id, recipient_id, value)
+TransferEvent = Tuple[float, str, str, float]
+
+
+class TransferGraph:
+    """
+    Directed transfer graph with:
+    - Rolling-window edge weights (amount and count per sender -> recipient pair)
+    - Fan-in / fan-out counters (distinct counterparties with a live edge in the window)
+    - Union-find over the edges live in the window for connected-component sizes
+
+    Expired events are evicted from a time-ordered queue on each access, so updates and
+    queries are amortized O(1) (component lookups are O(alpha(n)) with path halving).
+    Union-find cannot split components, so once an edge expires the components are rebuilt from
+    the live edges on the next lookup, at most every `component_refresh_seconds`.
+    """
+
+    def __init__(self, window_seconds: float = 86400.0, component_refresh_seconds: float = 60.0):
+        self.window_seconds = window_seconds
+        self.component_refresh_seconds = component_refresh_seconds
+        self._lock = threading.Lock()
+        self._events: Deque[TransferEvent] = deque()
+        self._edges: Dict[Tuple[str, str], List[float]] = {}  # [amount, count]
+        self._fan_out: Dict[str, int] = {}
+        self._fan_in: Dict[str, int] = {}
+        self._inflow: Dict[str, float] = {}
+        self._outflow: Dict[str, float] = {}
+        self._parent: Dict[str, str] = {}
+        self._size: Dict[str, int] = {}
+        self._components_stale = False
+        self._components_built_at = float("-inf")
+
+    def record_transfer(self, sender_id: str, recipient_id: str, value: float, timestamp: Optional[float] = None) -> None:
+        """Adds a confirmed internal transfer to the graph."""
+        now = timestamp if timestamp is not None else time.time()
+        with self._lock:
+            self._expire(now)
+
+            key = (sender_id, recipient_id)
+            edge = self._edges.get(key)
+            if edge is None:
+                edge = self._edges[key] = [0.0, 0]
+                self._fan_out[sender_id] = self._fan_out.get(sender_id, 0) + 1
+                self._fan_in[recipient_id] = self._fan_in.get(recipient_id, 0) + 1
+            edge[0] += value
+            edge[1] += 1
+            self._outflow[sender_id] = self._outflow.get(sender_id, 0.0) + value
+            self._inflow[recipient_id] = self._inflow.get(recipient_id, 0.0) + value
+
+            self._events.append((now, sender_id, recipient_id, value))
+            self._union(sender_id, recipient_id)
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._events and self._events[0][0] < cutoff:
+            _, sender_id, recipient_id, value = self._events.popleft()
+            key = (sender_id, recipient_id)
+            edge = self._edges[key]
+            edge[0] -= value
+            edge[1] -= 1
+            self._decrement(self._outflow, sender_id, value)
+            self._decrement(self._inflow, recipient_id, value)
+            if edge[1] == 0:
+                del self._edges[key]
+                self._components_stale = True
+                self._decrement(self._fan_out, sender_id, 1)
+                self._decrement(self._fan_in, recipient_id, 1)
+
+    @staticmethod
+    def _decrement(counters: Dict[str, Any], key: str, amount: float) -> None:
+        remaining = counters[key] - amount
+        if remaining <= 1e-9:
+            del counters[key]
+        else:
+            counters[key] = remaining
+
+    def _find(self, node: str) -> str:
+        parent = self._parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]  # Path halving
+            node = parent[node]
+        return node
+
+    def _union(self, a: str, b: str) -> None:
+        for node in (a, b):
+            if node not in self._parent:
+                self._parent[node] = node
+                self._size[node] = 1
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a == root_b:
+            return
+        if self._size[root_a] < self._size[root_b]:
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        self._size[root_a] += self._size[root_b]
+
+    def _rebuild_components(self, now: float) -> None:
+        self._parent.clear()
+        self._size.clear()
+        for sender_id, recipient_id in self._edges:
+            self._union(sender_id, recipient_id)
+        self._components_stale = False
+        self._components_built_at = now
+
+    def fan_in(self, user_id: str, now: Optional[float] = None) -> int:
+        """Distinct senders that transferred to the user within the window."""
+        with self._lock:
+            self._expire(now if now is not None else time.time())
+            return self._fan_in.get(user_id, 0)
+
+    def fan_out(self, user_id: str, now: Optional[float] = None) -> int:
+        """Distinct recipients the user transferred to within the window."""
+        with self._lock:
+            self._expire(now if now is not None else time.time())
+            return self._fan_out.get(user_id, 0)
+
+    def edge_weight(self, sender_id: str, recipient_id: str, now: Optional[float] = None) -> Tuple[float, int]:
+        """Windowed (amount, count) transferred from sender to recipient."""
+        with self._lock:
+            self._expire(now if now is not None else time.time())
+            amount, count = self._edges.get((sender_id, recipient_id), (0.0, 0))
+            return amount, int(count)
+
+    def flows(self, user_id: str, now: Optional[float] = None) -> Tuple[float, float]:
+        """Windowed (inflow, outflow) amounts for the user."""
+        with self._lock:
+            self._expire(now if now is not None else time.time())
+            return self._inflow.get(user_id, 0.0), self._outflow.get(user_id, 0.0)
+
+    def component_size(self, user_id: str, now: Optional[float] = None) -> int:
+        """Number of users connected to this one by transfers within the window (1 if isolated)."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._expire(now)
+            if self._components_stale and now - self._components_built_at >= self.component_refresh_seconds:
+                self._rebuild_components(now)
+            if user_id not in self._parent:
+                return 1
+            return self._size[self._find(user_id)]
+
+
+def rebuild_from_db(db: Session, graph: TransferGraph) -> int:
+    """
+    Replays internal transfers inside the rolling window into the graph (startup warm-up).
+    Internal transfers are SENT rows paired with a RECEIVED row keyed `internal-{idempotency_key}`.
+    """
+    received = aliased(PixTransaction)
+    since = datetime.now(timezone.utc) - timedelta(seconds=graph.window_seconds)
+
+    rows = db.execute(
+        select(PixTransaction.user_id, received.user_id, PixTransaction.value, PixTransaction.created_at)
+        .join(received, received.idempotency_key == "internal-" + PixTransaction.idempotency_key)
+        .where(
+            PixTransaction.type == TransactionType.SENT,
+            PixTransaction.status == PixStatus.CONFIRMED,
+            PixTransaction.created_at >= since.replace(tzinfo=None)
+        )
+        .order_by(PixTransaction.created_at)
+    )
+
+    count = 0
+    for sender_id, recipient_id, value, created_at in rows:
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        graph.record_transfer(sender_id, recipient_id, value, created_at.timestamp())
+        count += 1
+
+    logger.info(f"Transfer graph rebuilt: {count} internal transfers replayed")
+    return count
+
+
+# Singleton graph shared by the PIX service and the anti-fraud rules
+transfer_graph = TransferGraph(
+    window_seconds=settings.TRANSFER_GRAPH_WINDOW_HOURS * 3600,
+    component_refresh_seconds=settings.TRANSFER_GRAPH_COMPONENT_REFRESH_SECONDS
+)
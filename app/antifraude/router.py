@@ -2,14 +2,15 @@
 FastAPI Router for Anti-Fraud endpoints.
 Real-time risk analysis API.
 """
-from typing import Annotated, Any, Optional
-from uuid import uuid4
+from typing import Any, Optional
 
-from fastapi import APIRouter, Header
+from fastapi import APIRouter, Depends
 
 from app.antifraude.rules import antifraud_engine
 from app.antifraude.schemas import AntifraudResult, AntifraudTransaction
-from app.core.logger import audit_log, get_logger_with_correlation
+from app.auth.cache import UserSnapshot
+from app.auth.dependencies import get_optional_user
+from app.core.logger import audit_log, current_correlation_id, logger
 
 router = APIRouter(tags=["Antifraud"])
 
@@ -17,7 +18,7 @@ router = APIRouter(tags=["Antifraud"])
 @router.post("/analyze", response_model=AntifraudResult)
 def analyze_transaction(
     transaction: AntifraudTransaction,
-    x_correlation_id: Annotated[Optional[str], Header()] = None
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user)
 ) -> AntifraudResult:
     """
     **Challenge 3: Simplified Anti-Fraud Engine**
@@ -28,13 +29,15 @@ def analyze_transaction(
     - **time**: Transaction time (HH:MM)
     - **attempts_last_24h**: Velocity check
 
+    Transfer-graph rules apply to the logged-in user; a `user_id` in the body is ignored.
+
     **Returns:**
     - Approval decision
     - Risk Score (0-100)
     - Activated Rules
     """
-    correlation_id = x_correlation_id or str(uuid4())
-    logger = get_logger_with_correlation(correlation_id)
+    correlation_id = current_correlation_id()
+    transaction = transaction.model_copy(update={"user_id": current_user.id if current_user else None})
 
     logger.info(
         "Starting anti-fraud analysis: value=%s, time=%s",
@@ -83,8 +86,22 @@ def list_rules() -> dict[str, Any]:
         for rule in antifraud_engine.rules
     ]
 
+    model = antifraud_engine.model
+
     return {
         "total_rules": len(rules),
         "approval_limit": antifraud_engine.approval_limit,
-        "rules": rules
+        "rules": rules,
+        "model": {"type": model.kind, "weight": antifraud_engine.model_weight} if model else None
     }
+
+
+@router.get("/shadow", response_model=dict[str, Any])
+def shadow_stats() -> dict[str, Any]:
+    """
+    Exposes agreement counters between the primary engine and the shadow rule set.
+    """
+    if antifraud_engine.shadow is None:
+        return {"enabled": False}
+
+    return antifraud_engine.shadow.stats()
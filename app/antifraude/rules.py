@@ -2,9 +2,17 @@
 Anti-Fraud Rule Engine.
 Implements a configurable risk scoring system based on heuristic analysis.
 """
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Sequence, Tuple, Type
+import numpy as np
+from app.antifraude.graph import TransferGraph, transfer_graph
+from app.antifraude.model import RiskModel, featurize, load_model
 from app.antifraude.schemas import AntifraudTransaction
+from app.core.config import settings
 from app.core.logger import logger
+from app.core.metrics import antifraud_decisions
+
+if TYPE_CHECKING:
+    from app.antifraude.shadow import ShadowEvaluator
 
 
 class AntifraudRule:
@@ -81,6 +89,66 @@ class ExtremeValueRule(AntifraudRule):
         return transaction.value > self.limit
 
 
+class FanInRule(AntifraudRule):
+    """Graph heuristic: account collecting transfers from many distinct senders (mule pattern)."""
+
+    def __init__(self, limit: int = 5, graph: Optional[TransferGraph] = None):
+        super().__init__(
+            name="MULE_FAN_IN",
+            points=40,
+            description=f"Account received transfers from more than {limit} distinct users in the window"
+        )
+        self.limit = limit
+        self.graph = graph or transfer_graph
+
+    def evaluate(self, transaction: AntifraudTransaction) -> bool:
+        return transaction.user_id is not None and self.graph.fan_in(transaction.user_id) > self.limit
+
+
+class FanOutRule(AntifraudRule):
+    """Graph heuristic: account dispersing funds to many distinct recipients."""
+
+    def __init__(self, limit: int = 10, graph: Optional[TransferGraph] = None):
+        super().__init__(
+            name="FAN_OUT",
+            points=30,
+            description=f"Account transferred to more than {limit} distinct users in the window"
+        )
+        self.limit = limit
+        self.graph = graph or transfer_graph
+
+    def evaluate(self, transaction: AntifraudTransaction) -> bool:
+        return transaction.user_id is not None and self.graph.fan_out(transaction.user_id) > self.limit
+
+
+class LargeComponentRule(AntifraudRule):
+    """Graph heuristic: account belongs to an unusually large transfer ring."""
+
+    def __init__(self, limit: int = 50, graph: Optional[TransferGraph] = None):
+        super().__init__(
+            name="TRANSFER_RING",
+            points=20,
+            description=f"Account is connected to more than {limit} users through transfers"
+        )
+        self.limit = limit
+        self.graph = graph or transfer_graph
+
+    def evaluate(self, transaction: AntifraudTransaction) -> bool:
+        return transaction.user_id is not None and self.graph.component_size(transaction.user_id) > self.limit
+
+
+# Rule classes addressable by name in rule-set configurations
+RULE_REGISTRY: Dict[str, Type[AntifraudRule]] = {
+    "NIGHT_TIME": NightTimeRule,
+    "HIGH_VALUE": HighValueRule,
+    "EXCESSIVE_ATTEMPTS": ExcessiveAttemptsRule,
+    "EXTREME_VALUE": ExtremeValueRule,
+    "MULE_FAN_IN": FanInRule,
+    "FAN_OUT": FanOutRule,
+    "TRANSFER_RING": LargeComponentRule,
+}
+
+
 class AntifraudEngine:
     """
     Fraud Detection Engine.
@@ -89,32 +157,114 @@ class AntifraudEngine:
     Score >= 60: Rejected
     """
 
-    def __init__(self):
-        self.rules: List[AntifraudRule] = [
+    def __init__(
+        self,
+        rules: Optional[List[AntifraudRule]] = None,
+        approval_limit: int = 60,
+        model: Optional[RiskModel] = None,
+        model_weight: int = 40
+    ):
+        self.rules: List[AntifraudRule] = rules if rules is not None else [
             NightTimeRule(),
             HighValueRule(limit=300.0),
             ExcessiveAttemptsRule(limit=3),
-            ExtremeValueRule(limit=1000.0)
+            ExtremeValueRule(limit=1000.0),
+            FanInRule(limit=5),
+            FanOutRule(limit=10),
+            LargeComponentRule(limit=50)
         ]
-        self.approval_limit = 60
+        self.approval_limit = approval_limit
+        # Optional probability model adding up to `model_weight` points on top of the rules
+        self.model = model
+        self.model_weight = model_weight
+        # Optional candidate rule set evaluated off the request path (see app.antifraude.shadow)
+        self.shadow: Optional["ShadowEvaluator"] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "AntifraudEngine":
+        """
+        Builds an engine from a declarative rule-set configuration.
+
+        Example:
+            {"approval_limit": 60, "rules": [{"name": "HIGH_VALUE", "limit": 500.0, "points": 25}],
+             "model": {"path": "models/risk.json", "weight": 40}}
+
+        Every rule key other than `name` and `points` is passed to the rule constructor.
+        """
+        rules: List[AntifraudRule] = []
+        for rule_config in config.get("rules", []):
+            params = dict(rule_config)
+            name = params.pop("name")
+            points = params.pop("points", None)
+            if name not in RULE_REGISTRY:
+                raise ValueError(f"Unknown anti-fraud rule: {name}")
+            rule = RULE_REGISTRY[name](**params)
+            if points is not None:
+                rule.points = int(points)
+            rules.append(rule)
+
+        engine = cls(rules=rules, approval_limit=int(config.get("approval_limit", 60)))
+        model_config = config.get("model")
+        if model_config:
+            engine.model = load_model(model_config["path"])
+            engine.model_weight = int(model_config.get("weight", engine.model_weight))
+        return engine
+
+    def _rule_points(self, transaction: AntifraudTransaction) -> Tuple[int, List[AntifraudRule]]:
+        score = 0
+        triggered: List[AntifraudRule] = []
+        for rule in self.rules:
+            if rule.evaluate(transaction):
+                score += rule.points
+                triggered.append(rule)
+        return score, triggered
+
+    def model_points(self, transactions: Sequence[AntifraudTransaction]) -> np.ndarray:
+        """Model contribution per transaction: fraud probability scaled to `model_weight` points."""
+        if self.model is None:
+            return np.zeros(len(transactions), dtype=np.int64)
+        probabilities = self.model.predict_proba(featurize(transactions))
+        return np.rint(probabilities * self.model_weight).astype(np.int64)
+
+    def evaluate(self, transaction: AntifraudTransaction) -> Tuple[int, List[AntifraudRule]]:
+        """
+        Runs the rule chain (and model, if any) without side effects (no logging).
+        Returns the capped score and the triggered rules; suited for replays.
+        """
+        score, triggered = self._rule_points(transaction)
+        if self.model is not None:
+            score += int(self.model_points([transaction])[0])
+        return min(score, 100), triggered
+
+    def evaluate_batch(self, transactions: Sequence[AntifraudTransaction]) -> List[Tuple[int, List[AntifraudRule]]]:
+        """Batch variant of `evaluate`: model inference runs once, vectorized, over the whole batch."""
+        model_points: List[int] = self.model_points(transactions).tolist()
+        results: List[Tuple[int, List[AntifraudRule]]] = []
+        for transaction, extra in zip(transactions, model_points):
+            score, triggered = self._rule_points(transaction)
+            results.append((min(score + extra, 100), triggered))
+        return results
 
     def analyze(self, transaction: AntifraudTransaction) -> Dict[str, Any]:
         """
         Executes the rule chain against the transaction context.
         Returns a comprehensive risk assessment including score, decision, and triggered rules.
         """
-        score = 0
+        # Evaluate each rule
+        rule_score, triggered = self._rule_points(transaction)
+
         triggered_rules: List[str] = []
+        for rule in triggered:
+            triggered_rules.append(f"{rule.name}: {rule.description}")
+            logger.info(f"Rule triggered: {rule.name} (+{rule.points} points)")
 
-        # Evaluate each rule
-        for rule in self.rules:
-            if rule.evaluate(transaction):
-                score += rule.points
-                triggered_rules.append(f"{rule.name}: {rule.description}")
-                logger.info(f"Rule triggered: {rule.name} (+{rule.points} points)")
+        # Model contribution
+        model_points = int(self.model_points([transaction])[0]) if self.model is not None else 0
+        if model_points:
+            triggered_rules.append(f"MODEL_RISK: Model-estimated fraud risk (+{model_points} points)")
 
         # Cap score at 100
-        score = min(score, 100)
+        score = min(rule_score + model_points, 100)
 
         # Determine approval status
         approved = score < self.approval_limit
@@ -146,9 +296,23 @@ class AntifraudEngine:
         }
 
         logger.info(f"Anti-fraud analysis completed: score={score}, approved={approved}, level={risk_level}")
+        antifraud_decisions.inc("approved" if approved else "rejected", risk_level)
+
+        if self.shadow is not None:
+            self.shadow.submit(transaction, score, approved)
 
         return result
 
 
+def configure_model(engine: AntifraudEngine) -> None:
+    """Loads the risk model configured in ANTIFRAUD_MODEL_PATH into the engine, if any."""
+    if not settings.ANTIFRAUD_MODEL_PATH:
+        return
+
+    engine.model = load_model(settings.ANTIFRAUD_MODEL_PATH)
+    engine.model_weight = settings.ANTIFRAUD_MODEL_WEIGHT
+    logger.info(f"Anti-fraud risk model loaded: type={engine.model.kind}, weight={engine.model_weight}")
+
+
 # Singleton engine instance
 antifraud_engine = AntifraudEngine()
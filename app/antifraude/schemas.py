@@ -13,6 +13,9 @@ class AntifraudTransaction(BaseModel):
     attempts_last_24h: int = Field(..., ge=0, description="Attempts in last 24h")
     transaction_type: str = Field(default="PIX", description="Transaction type")
     origin: Optional[str] = Field(None, description="Transaction origin")
+    user_id: Optional[str] = Field(
+        None, description="Originating user ID (enables transfer-graph rules); /analyze takes it from the session"
+    )
 
     @field_validator('time')
     @classmethod
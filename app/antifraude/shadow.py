@@ -0,0 +1,179 @@
+"""
+Shadow-mode evaluation of candidate anti-fraud rule sets.
+Replays sampled live decisions against a candidate engine off the request path,
+tracking agreement with the primary engine without ever affecting the outcome.
+"""
+import json
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.antifraude.rules import AntifraudEngine
+from app.antifraude.schemas import AntifraudTransaction
+from app.core.config import settings
+from app.core.logger import logger
+
+# (transaction, primary score, primary decision)
+ShadowJob = Tuple[AntifraudTransaction, int, bool]
+
+
+class ShadowEvaluator:
+    """
+    Evaluates a candidate engine on a background thread.
+    The request path only pays for a sampling draw and a non-blocking enqueue;
+    when the queue is full the job is dropped and counted instead of waiting.
+    """
+
+    def __init__(
+        self,
+        engine: AntifraudEngine,
+        name: str = "shadow",
+        sample_rate: float = 1.0,
+        queue_size: int = 1000,
+        max_samples: int = 100
+    ):
+        self.engine = engine
+        self.name = name
+        self.sample_rate = sample_rate
+        self._queue: "queue.Queue[Optional[ShadowJob]]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._abandon = threading.Event()
+        self._counters: Dict[str, int] = {
+            "sampled": 0,
+            "dropped": 0,
+            "evaluated": 0,
+            "agreements": 0,
+            "disagreements": 0,
+            "shadow_stricter": 0,
+            "shadow_looser": 0,
+        }
+        self._score_delta_sum = 0
+        self.divergent_samples: Deque[Dict[str, Any]] = deque(maxlen=max_samples)
+
+    def submit(self, transaction: AntifraudTransaction, primary_score: int, primary_approved: bool) -> None:
+        """Hot-path hook: samples and enqueues the primary decision without blocking."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+
+        if self._worker is None:
+            self._start()
+
+        try:
+            self._queue.put_nowait((transaction, primary_score, primary_approved))
+            self._increment("sampled")
+        except queue.Full:
+            self._increment("dropped")
+
+    def _increment(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._worker is None:
+                self._abandon = threading.Event()
+                self._worker = threading.Thread(
+                    target=self._run, args=(self._abandon,), name=f"antifraud-{self.name}", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self, abandon: threading.Event) -> None:
+        while not abandon.is_set():
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._evaluate(*job)
+            except Exception as e:
+                logger.error(f"Shadow evaluation failed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _evaluate(self, transaction: AntifraudTransaction, primary_score: int, primary_approved: bool) -> None:
+        score, triggered = self.engine.evaluate(transaction)
+        approved = score < self.engine.approval_limit
+
+        with self._lock:
+            self._counters["evaluated"] += 1
+            self._score_delta_sum += score - primary_score
+            if approved == primary_approved:
+                self._counters["agreements"] += 1
+                return
+            self._counters["disagreements"] += 1
+            self._counters["shadow_looser" if approved else "shadow_stricter"] += 1
+            self.divergent_samples.append({
+                "value": transaction.value,
+                "time": transaction.time,
+                "attempts_last_24h": transaction.attempts_last_24h,
+                "primary_score": primary_score,
+                "primary_approved": primary_approved,
+                "shadow_score": score,
+                "shadow_approved": approved,
+                "shadow_rules": [rule.name for rule in triggered]
+            })
+
+    def flush(self) -> None:
+        """Blocks until every queued job has been evaluated."""
+        self._queue.join()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Drains pending jobs and stops the worker thread, waiting at most `timeout` seconds overall;
+        past the deadline the worker exits after its current job and the rest are discarded.
+        """
+        worker = self._worker
+        if worker is None:
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        worker.join(max(0.0, deadline - time.monotonic()))
+        if worker.is_alive():
+            self._abandon.set()
+            logger.warning(f"Shadow evaluator {self.name} stopped with {self._queue.qsize()} jobs pending")
+        self._worker = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of agreement counters and the most recent divergent samples."""
+        with self._lock:
+            counters = dict(self._counters)
+            evaluated = counters["evaluated"]
+            return {
+                "enabled": True,
+                "name": self.name,
+                "sample_rate": self.sample_rate,
+                "approval_limit": self.engine.approval_limit,
+                "pending": self._queue.qsize(),
+                **counters,
+                "agreement_rate": round(counters["agreements"] / evaluated, 4) if evaluated else None,
+                "mean_score_delta": round(self._score_delta_sum / evaluated, 2) if evaluated else None,
+                "divergent_samples": list(self.divergent_samples)
+            }
+
+
+def configure_shadow(engine: AntifraudEngine) -> Optional[ShadowEvaluator]:
+    """
+    Attaches the candidate rule set configured in ANTIFRAUD_SHADOW_RULESET (JSON file)
+    to the given engine. No-op when shadow mode is not configured.
+    """
+    if not settings.ANTIFRAUD_SHADOW_RULESET:
+        return None
+
+    with open(settings.ANTIFRAUD_SHADOW_RULESET, encoding="utf-8") as f:
+        config = json.load(f)
+
+    shadow = ShadowEvaluator(
+        AntifraudEngine.from_config(config),
+        name=config.get("name", "shadow"),
+        sample_rate=settings.ANTIFRAUD_SHADOW_SAMPLE_RATE,
+        queue_size=settings.ANTIFRAUD_SHADOW_QUEUE_SIZE
+    )
+    engine.shadow = shadow
+    logger.info(f"Anti-fraud shadow rule set enabled: {shadow.name} (sample_rate={shadow.sample_rate})")
+    return shadow
@@ -0,0 +1,22 @@
+"""
+Append-only audit trail.
+Each record carries the hash of its predecessor, so any edit or deletion breaks the chain.
+"""
+from datetime import datetime
+from sqlalchemy import DateTime, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+
+
+class AuditRecord(Base):
+    __tablename__ = "auditoria"
+
+    sequence: Mapped[int] = mapped_column("sequencia", Integer, primary_key=True, autoincrement=False)
+    created_at: Mapped[datetime] = mapped_column("criado_em", DateTime, nullable=False, index=True)
+    action: Mapped[str] = mapped_column("acao", String(100), nullable=False, index=True)
+    user: Mapped[str] = mapped_column("usuario", String(100), nullable=False, index=True)
+    resource: Mapped[str] = mapped_column("recurso", String(200), nullable=False)
+    correlation_id: Mapped[str] = mapped_column(String(100), nullable=True, index=True)
+    details: Mapped[str] = mapped_column("detalhes", Text, nullable=False)  # Canonical JSON
+    prev_hash: Mapped[str] = mapped_column("hash_anterior", String(64), nullable=False)
+    hash: Mapped[str] = mapped_column("hash", String(64), nullable=False)
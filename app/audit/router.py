@@ -0,0 +1,90 @@
+"""
+FastAPI Router for the audit trail.
+Admin-only search by user, correlation ID, action and time range, and chain verification.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.audit.models import AuditRecord
+from app.audit.schemas import AuditQueryResponse, AuditRecordResponse, AuditVerifyResponse
+from app.audit.store import audit_store, verify_chain
+from app.auth.dependencies import require_admin
+from app.core.database import get_db
+from app.core.logger import logger
+
+router = APIRouter(tags=["Audit"], dependencies=[Depends(require_admin)])
+
+
+def _flush_pending() -> None:
+    # Best effort: a failing flush (database trouble) must not take the query endpoints down with it
+    try:
+        audit_store.flush()
+    except Exception as e:
+        logger.warning(f"Audit flush before query failed; serving persisted records only: {str(e)}")
+
+
+def _utc(moment: datetime) -> datetime:
+    # Stored timestamps are naive UTC
+    return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+
+
+@router.get("/records", response_model=AuditQueryResponse)
+def query_audit_records(
+    user: Optional[str] = None,
+    correlation_id: Optional[str] = None,
+    action: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    before: Optional[int] = Query(default=None, description="Only records older than this sequence"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+) -> AuditQueryResponse:
+    """
+    Searches the audit trail, newest first (times in UTC).
+    Buffered records are flushed first so recent operations are visible (best effort).
+    """
+    _flush_pending()
+
+    query = select(AuditRecord).order_by(AuditRecord.sequence.desc()).limit(limit)
+    if user:
+        query = query.where(AuditRecord.user == user)
+    if correlation_id:
+        query = query.where(AuditRecord.correlation_id == correlation_id)
+    if action:
+        query = query.where(AuditRecord.action == action)
+    if start:
+        query = query.where(AuditRecord.created_at >= _utc(start))
+    if end:
+        query = query.where(AuditRecord.created_at < _utc(end))
+    if before:
+        query = query.where(AuditRecord.sequence < before)
+
+    records = db.execute(query).scalars().all()
+    return AuditQueryResponse(
+        records=[
+            AuditRecordResponse(
+                sequence=record.sequence,
+                created_at=record.created_at,
+                action=record.action,
+                user=record.user,
+                resource=record.resource,
+                correlation_id=record.correlation_id,
+                details=json.loads(record.details),
+                hash=record.hash
+            )
+            for record in records
+        ],
+        next_before=records[-1].sequence if len(records) == limit else None
+    )
+
+
+@router.get("/verify", response_model=AuditVerifyResponse)
+def verify_audit_chain(db: Session = Depends(get_db)) -> AuditVerifyResponse:
+    """Recomputes the hash chain and reports the first tampered or missing record."""
+    _flush_pending()
+    return AuditVerifyResponse(**verify_chain(db))
@@ -0,0 +1,28 @@
+"""
+Pydantic schemas for the audit query API.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+
+class AuditRecordResponse(BaseModel):
+    sequence: int
+    created_at: datetime
+    action: str
+    user: str
+    resource: str
+    correlation_id: Optional[str]
+    details: Dict[str, Any]
+    hash: str
+
+
+class AuditQueryResponse(BaseModel):
+    records: List[AuditRecordResponse]
+    next_before: Optional[int]  # Pass as `before` to fetch the next (older) page
+
+
+class AuditVerifyResponse(BaseModel):
+    valid: bool
+    records: int
+    broken_at: Optional[int]
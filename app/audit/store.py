@@ -0,0 +1,266 @@
+"""
+Buffered writer and integrity check for the audit trail.
+`audit_log` records are collected in memory and appended in batches, chaining SHA-256 hashes.
+"""
+import hashlib
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert, inspect, select
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.audit.models import AuditRecord
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logger import correlation_id_var, logger
+
+GENESIS_HASH = "0" * 64
+
+# Bounded text columns (e.g. correlation_id from a client header): values are cut to fit before
+# hashing, since PostgreSQL rejects longer ones and would fail the whole batch
+_TEXT_LIMITS = {
+    key: column.type.length
+    for key, column in inspect(AuditRecord).columns.items()
+    if key in ("action", "user", "resource", "correlation_id")
+}
+
+
+def record_hash(prev_hash: str, row: Dict[str, Any]) -> str:
+    """Hash of a record chained to its predecessor, over a canonical encoding of every field."""
+    payload = "|".join([
+        prev_hash,
+        str(row["sequence"]),
+        row["created_at"].strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        row["action"],
+        row["user"],
+        row["resource"],
+        row["correlation_id"] or "",
+        row["details"]
+    ])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class AuditStore:
+    """
+    Buffers audit records and appends them in batches, mirroring SimulationWriter.
+
+    - The worker flushes every `interval` seconds, or sooner once `batch_size` records are pending
+    - Each flush reads the chain tail in its own transaction and numbers the batch after it; a
+      concurrent writer (another worker process) makes the sequence collide (IntegrityError) and the
+      whole batch is retried once on a fresh tail
+    - A batch rejected for its data (DataError, or IntegrityError again on the retry) is written record
+      by record; a record that still fails is quarantined to the error log instead of blocking the
+      records behind it
+    - Above `max_pending` the caller flushes synchronously (back-pressure) unless a flush is already
+      running; at twice that (database down) new records are dropped, keeping only their log line
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        batch_size: int = 500,
+        interval: float = 1.0,
+        max_pending: int = 10000
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+
+        self._pending: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.written = 0
+        self.failed_batches = 0
+        self.quarantined = 0
+        self.dropped = 0
+
+    def append(self, action: str, user: str, resource: str, details: Dict[str, Any]) -> None:
+        """Audit sink: schedules a record for the next batch."""
+        record = {
+            "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+            "action": action,
+            "user": str(user),
+            "resource": str(resource),
+            "correlation_id": details.get("correlation_id") or correlation_id_var.get(),
+            "details": json.dumps(details, default=str, sort_keys=True, ensure_ascii=False)
+        }
+        for key, limit in _TEXT_LIMITS.items():
+            if record[key] is not None and len(record[key]) > limit:
+                record[key] = record[key][:limit]
+
+        with self._cond:
+            if len(self._pending) >= 2 * self.max_pending:
+                self.dropped += 1
+                dropped = True
+            else:
+                self._pending.append(record)
+                dropped = False
+            pending = len(self._pending)
+            if pending >= self.batch_size:
+                self._cond.notify()
+            if self._worker is None and not self._stopping:
+                self._worker = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._worker.start()
+
+        if dropped:
+            logger.error("Audit buffer full (%d pending); record dropped: action=%s resource=%s", pending, action, resource)
+        elif pending >= self.max_pending:
+            logger.warning("Audit buffer full (%d pending); flushing inline", pending)
+            try:
+                self.flush(blocking=False)
+            except Exception as e:
+                logger.error(f"Inline audit flush failed: {str(e)}")
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self, blocking: bool = True) -> int:
+        """
+        Appends every pending record, chained after the current tail. Returns the number written.
+        With `blocking=False` it returns 0 right away when another flush is in progress.
+        """
+        if not self._flush_lock.acquire(blocking=blocking):
+            return 0
+        try:
+            with self._cond:
+                batch = list(self._pending)
+            if not batch:
+                return 0
+
+            for attempt in range(2):
+                try:
+                    self._insert(batch)
+                    written = len(batch)
+                    self._discard(len(batch))
+                    self.written += written
+                    break
+                except IntegrityError as e:
+                    if attempt == 0:
+                        logger.info(f"Audit batch collided with a concurrent writer, retrying on a fresh tail: {str(e)}")
+                        continue
+                    logger.warning(f"Audit batch of {len(batch)} records rejected, writing one by one: {str(e)}")
+                    written = self._insert_one_by_one(batch)
+                except DataError as e:
+                    logger.warning(f"Audit batch of {len(batch)} records rejected, writing one by one: {str(e)}")
+                    written = self._insert_one_by_one(batch)
+                    break
+        finally:
+            self._flush_lock.release()
+
+        logger.debug(f"Audit store flushed {written} records")
+        return written
+
+    def _insert(self, records: List[Dict[str, Any]]) -> None:
+        """Numbers and chains `records` after the tail read in the same transaction, then commits them."""
+        db = self.session_factory()
+        try:
+            tail = db.execute(
+                select(AuditRecord.sequence, AuditRecord.hash).order_by(AuditRecord.sequence.desc()).limit(1)
+            ).first()
+            sequence, prev_hash = tail if tail else (0, GENESIS_HASH)
+
+            rows: List[Dict[str, Any]] = []
+            for record in records:
+                sequence += 1
+                row = dict(record, sequence=sequence, prev_hash=prev_hash)
+                row["hash"] = prev_hash = record_hash(prev_hash, row)
+                rows.append(row)
+
+            db.execute(insert(AuditRecord), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self.failed_batches += 1
+            raise
+        finally:
+            db.close()
+
+    def _insert_one_by_one(self, batch: List[Dict[str, Any]]) -> int:
+        """
+        Isolates the records that make a batch fail. Each record gets a second attempt on a fresh tail
+        (a concurrent writer may have taken its sequence) before it is quarantined; any other error
+        (e.g. the database being down) stops here and leaves the rest pending.
+        """
+        written = 0
+        for record in batch:
+            for attempt in range(2):
+                try:
+                    self._insert([record])
+                    written += 1
+                    self.written += 1
+                    break
+                except (DataError, IntegrityError) as e:
+                    if attempt == 0:
+                        continue
+                    self.quarantined += 1
+                    logger.error(
+                        "Audit record quarantined (%s): %s", str(e).splitlines()[0],
+                        json.dumps(record, default=str, ensure_ascii=False)
+                    )
+            self._discard(1)
+        return written
+
+    def _discard(self, count: int) -> None:
+        with self._cond:
+            del self._pending[:count]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.interval)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Audit store flush failed (will retry): {str(e)}")
+            if stopping:
+                return
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stops the worker and writes everything still buffered (application shutdown)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+        self.flush()
+        logger.info(
+            f"Audit store stopped: {self.written} written, {self.failed_batches} failed batches, "
+            f"{self.quarantined} quarantined, {self.dropped} dropped"
+        )
+
+
+def verify_chain(db: Session, chunk_size: int = 10000) -> Dict[str, Any]:
+    """Recomputes the hash chain from the first record; reports the first sequence that does not match."""
+    prev_hash, expected, checked = GENESIS_HASH, 1, 0
+    while True:
+        records = db.execute(
+            select(AuditRecord).where(AuditRecord.sequence >= expected).order_by(AuditRecord.sequence).limit(chunk_size)
+        ).scalars().all()
+        if not records:
+            return {"valid": True, "records": checked, "broken_at": None}
+        for record in records:
+            row = {column: getattr(record, column) for column in (
+                "sequence", "created_at", "action", "user", "resource", "correlation_id", "details"
+            )}
+            if record.sequence != expected or record.prev_hash != prev_hash or record.hash != record_hash(prev_hash, row):
+                return {"valid": False, "records": checked, "broken_at": expected}
+            prev_hash, expected, checked = record.hash, expected + 1, checked + 1
+
+
+# Singleton store registered as an audit_log sink at startup
+audit_store = AuditStore(
+    batch_size=settings.AUDIT_WRITE_BATCH_SIZE,
+    interval=settings.AUDIT_WRITE_INTERVAL_SECONDS,
+    max_pending=settings.AUDIT_WRITE_MAX_PENDING
+)
@@ -0,0 +1,283 @@
+"""
+Bulk user onboarding for portfolio migrations.
+Validates a whole batch at once (vectorized CPF/CNPJ check digits, set-based duplicate lookup),
+hashes passwords in the bulk hashing pool and inserts each chunk with a single executemany.
+Imports run as background jobs whose progress is stored in `importacoes_usuarios`.
+"""
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.auth.hashing import PasswordHasher
+from app.auth.models import BulkImportJob, ImportJobStatus, User
+from app.auth.schemas import UserCreate
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logger import logger, audit_log
+from app.core.utils import time_ordered_uuid
+
+CPF_WEIGHTS = (np.arange(10, 1, -1), np.arange(11, 1, -1))
+CNPJ_WEIGHTS = (np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]), np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+
+# Bound parameters per IN list, below SQLite's default variable limit
+LOOKUP_CHUNK = 500
+
+
+def _digit_matrix(docs: Sequence[str], width: int) -> np.ndarray:
+    return (np.frombuffer("".join(docs).encode(), dtype=np.uint8).reshape(-1, width) - ord("0")).astype(np.int64)
+
+
+def _cpf_valid(digits: np.ndarray) -> np.ndarray:
+    first = (digits[:, :9] @ CPF_WEIGHTS[0]) * 10 % 11 % 10
+    second = (digits[:, :10] @ CPF_WEIGHTS[1]) * 10 % 11 % 10
+    repeated = (digits == digits[:, :1]).all(axis=1)
+    return (first == digits[:, 9]) & (second == digits[:, 10]) & ~repeated
+
+
+def _cnpj_valid(digits: np.ndarray) -> np.ndarray:
+    def check(remainder: np.ndarray) -> np.ndarray:
+        return np.where(remainder < 2, 0, 11 - remainder)
+
+    first = check((digits[:, :12] @ CNPJ_WEIGHTS[0]) % 11)
+    second = check((digits[:, :13] @ CNPJ_WEIGHTS[1]) % 11)
+    repeated = (digits == digits[:, :1]).all(axis=1)
+    return (first == digits[:, 12]) & (second == digits[:, 13]) & ~repeated
+
+
+def valid_documents(docs: Sequence[str]) -> np.ndarray:
+    """Check-digit validation of normalized CPFs (11 digits) and CNPJs (14 digits), one mask for the batch."""
+    valid = np.zeros(len(docs), dtype=bool)
+    for width, validator in ((11, _cpf_valid), (14, _cnpj_valid)):
+        rows = [k for k, doc in enumerate(docs) if len(doc) == width and doc.isdigit()]
+        if rows:
+            valid[rows] = validator(_digit_matrix([docs[k] for k in rows], width))
+    return valid
+
+
+def _existing(db: Session, cpfs: List[str], emails: List[str]) -> Dict[str, set]:
+    """Registered CPF/CNPJs and emails among the candidates, one query per lookup chunk."""
+    found: Dict[str, set] = {"cpf_cnpj": set(), "email": set()}
+    for start in range(0, max(len(cpfs), len(emails)), LOOKUP_CHUNK):
+        rows = db.execute(
+            select(User.cpf_cnpj, User.email).where(or_(
+                User.cpf_cnpj.in_(cpfs[start:start + LOOKUP_CHUNK]),
+                User.email.in_(emails[start:start + LOOKUP_CHUNK])
+            ))
+        ).all()
+        for cpf_cnpj, email in rows:
+            found["cpf_cnpj"].add(cpf_cnpj)
+            found["email"].add(email)
+    return found
+
+
+def _insert_chunk(db: Session, rows: List[Tuple[int, Dict[str, Any]]], errors: List[Dict[str, Any]]) -> int:
+    """Multi-row insert of a chunk; on a conflict (concurrent registration) rows are retried one by one."""
+    try:
+        db.execute(insert(User), [values for _, values in rows])
+        db.commit()
+        return len(rows)
+    except IntegrityError:
+        db.rollback()
+
+    created = 0
+    for k, values in rows:
+        try:
+            db.execute(insert(User), [values])
+            db.commit()
+            created += 1
+        except IntegrityError:
+            db.rollback()
+            errors.append({"row": k, "reason": "Email or CPF/CNPJ already registered"})
+    return created
+
+
+# Progress callback: (rows processed, users created, errors so far)
+Progress = Callable[[int, int, List[Dict[str, Any]]], None]
+
+
+def import_users(
+    db: Session,
+    users: List[Dict[str, Any]],
+    hasher: PasswordHasher,
+    correlation_id: str,
+    chunk_size: int = settings.BULK_IMPORT_CHUNK_SIZE,
+    progress: Optional[Progress] = None
+) -> Dict[str, Any]:
+    """
+    Imports a batch of users, reporting failures per row (0-based index) instead of failing the batch.
+    Rows are rejected for schema errors, invalid check digits, duplicates inside the batch and
+    users already registered; the accepted ones are hashed and inserted chunk by chunk, calling
+    `progress` after validation and after every chunk.
+    """
+    errors: List[Dict[str, Any]] = []
+    candidates: List[tuple] = []
+    for k, raw in enumerate(users):
+        try:
+            candidates.append((k, UserCreate.model_validate(raw)))
+        except ValidationError as e:
+            errors.append({"row": k, "reason": "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())})
+
+    valid = valid_documents([user.cpf_cnpj for _, user in candidates])
+    checked = []
+    for (k, user), ok in zip(candidates, valid.tolist()):
+        if ok:
+            checked.append((k, user))
+        else:
+            errors.append({"row": k, "reason": "Invalid CPF/CNPJ check digits"})
+
+    existing = _existing(db, [user.cpf_cnpj for _, user in checked], [user.email for _, user in checked])
+    seen_cpfs, seen_emails = set(existing["cpf_cnpj"]), set(existing["email"])
+    accepted = []
+    for k, user in checked:
+        if user.cpf_cnpj in seen_cpfs or user.email in seen_emails:
+            errors.append({"row": k, "reason": "Email or CPF/CNPJ already registered"})
+            continue
+        seen_cpfs.add(user.cpf_cnpj)
+        seen_emails.add(user.email)
+        accepted.append((k, user))
+
+    created = 0
+    processed = len(users) - len(accepted)
+    if progress:
+        progress(processed, created, errors)
+    for start in range(0, len(accepted), chunk_size):
+        chunk = accepted[start:start + chunk_size]
+        hashes = hasher.hash_many([user.password for _, user in chunk])
+        created += _insert_chunk(db, [
+            (k, {"name": user.name, "email": user.email, "cpf_cnpj": user.cpf_cnpj, "hashed_password": hashed})
+            for (k, user), hashed in zip(chunk, hashes)
+        ], errors)
+        processed += len(chunk)
+        if progress:
+            progress(processed, created, errors)
+
+    errors.sort(key=lambda error: error["row"])
+    result = {"received": len(users), "created": created, "failed": len(errors), "errors": errors}
+
+    audit_log(
+        action="users_bulk_imported",
+        user="admin",
+        resource=f"rows={len(users)}",
+        details={"correlation_id": correlation_id, "created": created, "failed": len(errors)}
+    )
+    logger.info(f"Bulk import completed: {created} created, {len(errors)} failed of {len(users)}")
+
+    return result
+
+
+class ImportInterrupted(Exception):
+    """Raised between chunks when the application shuts down during an import."""
+
+
+class ImportJobRunner:
+    """
+    Runs bulk imports one at a time on a background thread.
+
+    - Progress and the final report are stored in BulkImportJob rows, so any worker can answer a status query
+    - Submitted rows (with plaintext passwords) only live in memory until their job has run
+    - On shutdown queued jobs are marked failed and a running job stops after its current chunk
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    def submit(
+        self, db: Session, users: List[Dict[str, Any]], hasher: PasswordHasher, correlation_id: str
+    ) -> BulkImportJob:
+        """Records a queued job and schedules it. Returns the job row."""
+        job = BulkImportJob(
+            id=time_ordered_uuid(),
+            status=ImportJobStatus.QUEUED,
+            received=len(users),
+            correlation_id=correlation_id,
+            created_at=datetime.now(timezone.utc)
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        with self._lock:
+            if self._executor is None:
+                self._stopping = False
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-import")
+            self._futures[job.id] = self._executor.submit(self._run, job.id, users, hasher, correlation_id)
+        logger.info(f"Bulk import queued: job_id={job.id}, rows={len(users)}")
+        return job
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> None:
+        """Blocks until a job submitted by this process has finished (tests, tools)."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout)
+
+    def _run(self, job_id: str, users: List[Dict[str, Any]], hasher: PasswordHasher, correlation_id: str) -> None:
+        db = self.session_factory()
+        errors: List[Dict[str, Any]] = []
+        job: Optional[BulkImportJob] = None
+        try:
+            job = db.get(BulkImportJob, job_id)
+            job.status = ImportJobStatus.RUNNING
+            db.commit()
+
+            def progress(processed: int, created: int, so_far: List[Dict[str, Any]]) -> None:
+                errors[:] = so_far
+                job.processed, job.created, job.failed = processed, created, len(so_far)
+                db.commit()
+                if self._stopping:
+                    raise ImportInterrupted()
+
+            import_users(db, users, hasher, correlation_id, progress=progress)
+            job.status = ImportJobStatus.COMPLETED
+        except ImportInterrupted:
+            job.status, job.detail = ImportJobStatus.FAILED, "Interrupted by shutdown"
+            logger.warning(f"Bulk import interrupted by shutdown: job_id={job_id}")
+        except Exception as e:
+            db.rollback()
+            job = db.get(BulkImportJob, job_id)
+            job.status, job.detail = ImportJobStatus.FAILED, str(e)[:255]
+            logger.error(f"Bulk import failed: job_id={job_id}: {str(e)}", exc_info=True)
+        finally:
+            if job is not None:
+                job.errors = json.dumps(sorted(errors, key=lambda error: error["row"]))
+                job.finished_at = datetime.now(timezone.utc)
+                db.commit()
+            with self._lock:
+                self._futures.pop(job_id, None)
+            db.close()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Application shutdown: fails queued jobs and waits up to `timeout` for the running one."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._stopping = True
+            futures = dict(self._futures)
+        if executor is None:
+            return
+
+        cancelled = [job_id for job_id, future in futures.items() if future.cancel()]
+        if cancelled:
+            with self.session_factory() as db:
+                for job_id in cancelled:
+                    job = db.get(BulkImportJob, job_id)
+                    job.status, job.detail = ImportJobStatus.FAILED, "Cancelled by shutdown"
+                    job.finished_at = datetime.now(timezone.utc)
+                db.commit()
+        wait([future for future in futures.values() if not future.cancelled()], timeout)
+        executor.shutdown(wait=False)
+
+
+# Singleton runner used by the admin endpoint
+import_jobs = ImportJobRunner()
@@ -0,0 +1,112 @@
+"""
+Verified-token cache for cookie authentication.
+Maps a token digest to an immutable snapshot of the resolved user, so repeated requests skip
+JWT verification and the user lookup until the token expires or the user changes.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+from app.auth.models import User
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Read-only view of the authenticated user handed to request handlers."""
+    id: str
+    name: str
+    cpf_cnpj: str
+    email: str
+    credit_limit: float
+    activated_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(
+            id=user.id, name=user.name, cpf_cnpj=user.cpf_cnpj, email=user.email, credit_limit=user.credit_limit,
+            activated_at=user.activated_at
+        )
+
+
+def token_digest(token: str) -> str:
+    """Cache key: raw tokens are never kept in memory longer than the request."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified tokens. Entries live until the token's `exp` or `ttl_seconds`,
+    whichever comes first, and can be dropped per token (logout) or per user (credential or
+    credit-limit changes).
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[UserSnapshot, float]]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[UserSnapshot]:
+        digest = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            snapshot, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(digest)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return snapshot
+
+    def put(self, token: str, snapshot: UserSnapshot, exp: Optional[float] = None) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        digest = token_digest(token)
+        with self._lock:
+            self._remove(digest)
+            self._entries[digest] = (snapshot, expires_at)
+            self._by_user.setdefault(snapshot.id, set()).add(digest)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_token(self, token: str) -> None:
+        with self._lock:
+            self._remove(token_digest(token))
+
+    def invalidate_user(self, user_id: str) -> None:
+        with self._lock:
+            for digest in list(self._by_user.get(user_id, ())):
+                self._remove(digest)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _remove(self, digest: str) -> None:
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        user_id = entry[0].id
+        digests = self._by_user.get(user_id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[user_id]
+
+
+# Singleton cache shared by the auth dependencies and the services that mutate users
+token_cache = TokenCache(max_entries=settings.TOKEN_CACHE_SIZE, ttl_seconds=settings.TOKEN_CACHE_TTL_SECONDS)
@@ -1,18 +1,26 @@
-from fastapi import Request, HTTPException, Depends, status
+import hmac
+from typing import Optional
+from fastapi import Request, HTTPException, Depends, Header, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.core.database import get_db
 from app.auth.models import User
+from app.auth.cache import UserSnapshot, token_cache
+from app.auth.service import activate_account
+from app.core.timing import span
 from app.pix.models import PixTransaction, PixStatus, TransactionType
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
-def get_current_user(request: Request, db: Session = Depends(get_db)):
+@span("auth")
+def get_current_user(request: Request, db: Session = Depends(get_db)) -> UserSnapshot:
     """
     Extracts the current user from the access_token cookie.
+    Verified tokens are cached with a snapshot of the user until `exp` (see app/auth/cache.py),
+    so only the first request of a session pays the HMAC verification and the user lookup.
     """
     token = request.cookies.get("access_token")
     if not token:
@@ -27,6 +35,10 @@ def get_current_user(request: Request, db: Session = Depends(get_db)):
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
         # Token format: "Bearer <token>"
         scheme, _, param = token.partition(" ")
@@ -44,17 +56,38 @@ def get_current_user(request: Request, db: Session = Depends(get_db)):
     if not user:
         raise credentials_exception
 
-    return user
+    snapshot = UserSnapshot.from_user(user)
+    token_cache.put(token, snapshot, exp=payload.get("exp"))
+    return snapshot
+
+
+def get_optional_user(request: Request, db: Session = Depends(get_db)) -> Optional[UserSnapshot]:
+    """
+    Same as `get_current_user` for endpoints that also serve anonymous callers:
+    None without a cookie or with an invalid token.
+    """
+    if not request.cookies.get("access_token"):
+        return None
+    try:
+        return get_current_user(request, db)
+    except HTTPException:
+        return None
 
 
+@span("auth")
 def require_active_account(
-    user: User = Depends(get_current_user),
+    user: UserSnapshot = Depends(get_current_user),
     db: Session = Depends(get_db)
-) -> User:
+) -> UserSnapshot:
     """
     Verifies if the user has made at least one deposit (Incoming PIX).
     Blocks access to critical features if the account is not active.
+    The flag travels in the cached snapshot; the transaction probe only runs for accounts not yet
+    flagged (e.g. activated before `activated_at` existed), which are backfilled on success.
     """
+    if user.activated_at is not None:
+        return user
+
     has_deposit = db.query(PixTransaction).filter(
         PixTransaction.user_id == user.id,
         PixTransaction.type == TransactionType.RECEIVED,
@@ -67,4 +100,17 @@ def require_active_account(
             detail="Inactive account. Make a first deposit (Received PIX) to unlock all features."
         )
 
+    if activate_account(db, user.id):
+        db.commit()
+    token_cache.invalidate_user(user.id)
+
     return user
+
+
+def require_admin(x_admin_key: Optional[str] = Header(default=None, alias="X-Admin-Key")) -> None:
+    """
+    Guards administrative endpoints with the ADMIN_API_KEY shared secret.
+    With no key configured the endpoints are disabled.
+    """
+    if not settings.ADMIN_API_KEY or not x_admin_key or not hmac.compare_digest(x_admin_key, settings.ADMIN_API_KEY):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin credentials required")
@@ -0,0 +1,138 @@
+"""
+Password hashing offloaded to a bounded process pool.
+Keeps CPU-bound argon2 work off the request threadpool and sheds excess load instead of queueing it.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.security import pwd_context, verify_and_update_password
+from app.core.utils import process_pool_context
+
+T = TypeVar("T")
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing queue is full; callers should answer 503 with Retry-After."""
+
+
+def _load_policy(policy: str) -> None:
+    # Worker processes adopt the parent's (calibrated) password policy
+    pwd_context.load(policy)
+
+
+def _load_bulk_policy(policy: str) -> None:
+    # Bulk workers also yield the CPU to interactive hashing where the OS allows it
+    _load_policy(policy)
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return verify_and_update_password(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs hash/verify calls in `workers` processes with at most `max_pending` calls admitted
+    (running or queued). Admission is non-blocking: above the limit `HashingOverloaded` is raised
+    immediately, so a login burst occupies at most `max_pending` request threads.
+    With `workers=0` calls run inline (tests, single-process tools).
+
+    Batches (`hash_many`, bulk imports) run in a separate pool of `bulk_workers` lower-priority
+    processes, so they never queue ahead of interactive logins or take their admission slots.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 16, bulk_workers: int = 1):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.bulk_workers = bulk_workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._bulk_pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self.rejected = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=process_pool_context(),
+                    initializer=_load_policy, initargs=(pwd_context.to_string(),)
+                )
+            return self._pool
+
+    def _get_bulk_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._bulk_pool is None:
+                self._bulk_pool = ProcessPoolExecutor(
+                    max_workers=self.bulk_workers, mp_context=process_pool_context(),
+                    initializer=_load_bulk_policy, initargs=(pwd_context.to_string(),)
+                )
+            return self._bulk_pool
+
+    @contextmanager
+    def _admitted(self) -> Iterator[None]:
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            logger.warning(f"Password hashing overloaded: {self.max_pending} calls pending, request shed")
+            raise HashingOverloaded()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        with self._admitted():
+            if self.workers <= 0:
+                return fn(*args)
+            return self._get_pool().submit(fn, *args).result()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def hash_many(self, passwords: Sequence[str]) -> List[str]:
+        """Hashes a batch in the bulk pool (no admission slot: interactive calls are unaffected)."""
+        if self.workers <= 0 or self.bulk_workers <= 0:
+            return [_hash(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (self.bulk_workers * 4))
+        return list(self._get_bulk_pool().map(_hash, passwords, chunksize=chunksize))
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self._run(_verify, password, hashed_password)
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verifies and returns a replacement hash when the stored one is outdated (see security.py)."""
+        return self._run(_verify_and_update, password, hashed_password)
+
+    def reload_policy(self) -> None:
+        """Restarts the workers so they pick up a recalibrated password policy."""
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        """Stops the worker processes (application shutdown hook)."""
+        with self._pool_lock:
+            for pool in (self._pool, self._bulk_pool):
+                if pool is not None:
+                    pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = self._bulk_pool = None
+
+
+# Singleton hasher shared by the auth endpoints and bulk imports
+password_hasher = PasswordHasher(
+    workers=settings.AUTH_HASH_WORKERS,
+    max_pending=settings.AUTH_HASH_MAX_PENDING,
+    bulk_workers=settings.AUTH_BULK_HASH_WORKERS
+)
@@ -1,8 +1,11 @@
-from sqlalchemy import String, DateTime, Float
+import enum
+from typing import Optional
+from sqlalchemy import String, DateTime, Enum, Float, Integer, Text
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime, timezone
 from uuid import uuid4
 from app.core.database import Base
+from app.pix.models import get_enum_values
 
 
 class User(Base):
@@ -15,3 +18,36 @@ class User(Base):
     hashed_password: Mapped[str] = mapped_column("hashed_password", String(255), nullable=False)
     credit_limit: Mapped[float] = mapped_column("limite_credito", Float, default=10000.00, nullable=False)
     created_at: Mapped[datetime] = mapped_column("criado_em", DateTime, default=lambda: datetime.now(timezone.utc))
+    # Set once, in the same commit as the first confirmed deposit (Received PIX)
+    activated_at: Mapped[Optional[datetime]] = mapped_column("ativado_em", DateTime, nullable=True)
+
+
+class ImportJobStatus(str, enum.Enum):
+    """Lifecycle of a bulk user import job."""
+    QUEUED = "NA_FILA"
+    RUNNING = "EM_EXECUCAO"
+    COMPLETED = "CONCLUIDO"
+    FAILED = "FALHOU"
+
+
+class BulkImportJob(Base):
+    """Progress and per-row report of a bulk user import (the submitted rows are never stored)."""
+
+    __tablename__ = "importacoes_usuarios"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)  # Time-ordered UUID
+    status: Mapped[ImportJobStatus] = mapped_column(
+        "status",
+        Enum(ImportJobStatus, values_callable=get_enum_values),
+        nullable=False,
+        default=ImportJobStatus.QUEUED
+    )
+    received: Mapped[int] = mapped_column("recebidos", Integer, nullable=False)
+    processed: Mapped[int] = mapped_column("processados", Integer, nullable=False, default=0)
+    created: Mapped[int] = mapped_column("criados", Integer, nullable=False, default=0)
+    failed: Mapped[int] = mapped_column("falhas", Integer, nullable=False, default=0)
+    errors: Mapped[str] = mapped_column("erros", Text, nullable=False, default="[]")  # Serialized JSON
+    detail: Mapped[Optional[str]] = mapped_column("detalhe", String(255), nullable=True)
+    correlation_id: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    created_at: Mapped[datetime] = mapped_column("criado_em", DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at: Mapped[Optional[datetime]] = mapped_column("concluido_em", DateTime, nullable=True)
@@ -1,25 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from app.core.database import get_db
-from app.auth.models import User
-from app.auth.schemas import UserCreate, UserLogin
-from app.auth.service import get_password_hash, verify_password, create_access_token
+from app.auth.models import BulkImportJob, User
+from app.auth.schemas import BulkUserImportJobResponse, BulkUserImportRequest, UserCreate, UserLogin
+from app.auth.bulk import import_jobs
+from app.auth.dependencies import require_admin
+from app.auth.cache import token_cache
+from app.auth.hashing import HashingOverloaded, password_hasher
+from app.auth.throttle import login_throttle
+from app.auth.service import create_access_token
 from datetime import timedelta
 from app.core.config import settings
-from app.core.logger import logger
+from app.core.logger import current_correlation_id, logger
+from app.core.security import mask_sensitive_data
+from app.core.utils import mask_cpf_cnpj
+import json
 import traceback
 
 router = APIRouter()
 
 
+def _overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service busy. Please retry shortly.",
+        headers={"Retry-After": str(settings.AUTH_HASH_RETRY_AFTER_SECONDS)}
+    )
+
+
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 def register(response: Response, user: UserCreate, db: Session = Depends(get_db)):
     """
     Registers a new user with robust validation and error handling.
     """
     try:
-        logger.info(f"Starting registration for CPF/CNPJ: {user.cpf_cnpj}")
+        masked_document = mask_cpf_cnpj(user.cpf_cnpj)
+        logger.info("Starting registration for CPF/CNPJ: %s", masked_document, extra={"cpf_cnpj": masked_document})
 
         # Check if user already exists
         db_user = db.query(User).filter(
@@ -27,14 +44,17 @@ def register(response: Response, user: UserCreate, db: Session = Depends(get_db)
         ).first()
 
         if db_user:
-            logger.warning(f"Duplicate registration attempt: {user.cpf_cnpj} or {user.email}")
+            logger.warning(
+                "Duplicate registration attempt: %s or %s", masked_document, mask_sensitive_data(user.email),
+                extra={"cpf_cnpj": masked_document}
+            )
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email or CPF/CNPJ already registered in the system."
             )
 
         # Create new user
-        hashed_password = get_password_hash(user.password)
+        hashed_password = password_hasher.hash(user.password)
         new_user = User(
             name=user.name,
             email=user.email,
@@ -46,7 +66,7 @@ def register(response: Response, user: UserCreate, db: Session = Depends(get_db)
         db.commit()
         db.refresh(new_user)
 
-        logger.info(f"User created successfully: ID {new_user.id}")
+        logger.info("User created successfully: ID %s", new_user.id, extra={"user_id": new_user.id})
 
         # Auto-login: Generate token
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -73,16 +93,21 @@ def register(response: Response, user: UserCreate, db: Session = Depends(get_db)
             "message": "Registration successful."
         }
 
+    except HTTPException:
+        raise
+    except HashingOverloaded:
+        raise _overloaded()
     except IntegrityError as e:
         db.rollback()
-        logger.error(f"Database integrity error: {str(e)}")
+        # The driver message echoes the conflicting key (the CPF/CNPJ or e-mail): log only its type
+        logger.error("Database integrity error: %s", type(e.orig).__name__)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Error processing data. Check if fields are correct."
         )
     except Exception as e:
         db.rollback()
-        logger.error(f"Internal registration error: {str(e)}")
+        logger.error("Internal registration error: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -91,22 +116,47 @@ def register(response: Response, user: UserCreate, db: Session = Depends(get_db)
 
 
 @router.post("/login")
-def login(response: Response, user_in: UserLogin, db: Session = Depends(get_db)):
+def login(request: Request, response: Response, user_in: UserLogin, db: Session = Depends(get_db)):
     """
     Authenticates user and sets session cookie.
+    Repeated failures per CPF/CNPJ or per IP are refused with 429 before any hashing work.
     """
     try:
-        logger.info(f"Login attempt for CPF/CNPJ: {user_in.cpf_cnpj}")
+        masked_document = mask_cpf_cnpj(user_in.cpf_cnpj)
+        logger.info("Login attempt for CPF/CNPJ: %s", masked_document, extra={"cpf_cnpj": masked_document})
+
+        client_ip = request.client.host if request.client else "unknown"
+        retry_after = login_throttle.check(user_in.cpf_cnpj, client_ip)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many failed login attempts. Please try again later.",
+                headers={"Retry-After": str(retry_after)}
+            )
 
         user = db.query(User).filter(User.cpf_cnpj == user_in.cpf_cnpj).first()
 
-        if not user or not verify_password(user_in.password, user.hashed_password):
-            logger.warning(f"Login failure for {user_in.cpf_cnpj}: Invalid credentials")
+        valid, new_hash = password_hasher.verify_and_update(user_in.password, user.hashed_password) if user else (False, None)
+
+        if not user or not valid:
+            login_throttle.record_failure(user_in.cpf_cnpj, client_ip)
+            logger.warning(
+                "Login failure for %s: Invalid credentials", masked_document, extra={"cpf_cnpj": masked_document}
+            )
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect CPF/CNPJ or password."
             )
 
+        login_throttle.reset(user.cpf_cnpj)
+
+        # Transparent upgrade of hashes with a deprecated scheme or outdated cost parameters
+        if new_hash:
+            user.hashed_password = new_hash
+            db.commit()
+            token_cache.invalidate_user(user.id)
+            logger.info("Password hash upgraded for user %s", user.id, extra={"user_id": user.id})
+
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
             data={"sub": user.cpf_cnpj, "name": user.name},
@@ -123,7 +173,9 @@ def login(response: Response, user_in: UserLogin, db: Session = Depends(get_db))
             expires=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
         )
 
-        logger.info(f"Login successful for {user.cpf_cnpj}")
+        logger.info(
+            "Login successful for %s", masked_document, extra={"cpf_cnpj": masked_document, "user_id": user.id}
+        )
 
         return {
             "access_token": access_token,
@@ -133,8 +185,10 @@ def login(response: Response, user_in: UserLogin, db: Session = Depends(get_db))
 
     except HTTPException as he:
         raise he
+    except HashingOverloaded:
+        raise _overloaded()
     except Exception as e:
-        logger.error(f"Internal login error: {str(e)}")
+        logger.error("Internal login error: %s", e)
         logger.error(traceback.format_exc())
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -143,6 +197,52 @@ def login(response: Response, user_in: UserLogin, db: Session = Depends(get_db))
 
 
 @router.post("/logout")
-def logout(response: Response):
+def logout(request: Request, response: Response):
+    token = request.cookies.get("access_token")
+    if token:
+        token_cache.invalidate_token(token)
     response.delete_cookie("access_token")
     return {"message": "Logout successful"}
+
+
+def _job_response(job: BulkImportJob) -> BulkUserImportJobResponse:
+    return BulkUserImportJobResponse(
+        job_id=job.id,
+        status=job.status.value,
+        received=job.received,
+        processed=job.processed,
+        created=job.created,
+        failed=job.failed,
+        errors=json.loads(job.errors),
+        detail=job.detail,
+        created_at=job.created_at,
+        finished_at=job.finished_at
+    )
+
+
+@router.post(
+    "/admin/users/bulk",
+    response_model=BulkUserImportJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_admin)]
+)
+def bulk_import_users(
+    data: BulkUserImportRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Queues a batch of users (portfolio migrations) for import as a background job.
+    Poll `GET /auth/admin/users/bulk/{job_id}` for progress and the per-row failure report.
+    Requires the X-Admin-Key header.
+    """
+    job = import_jobs.submit(db, data.users, password_hasher, current_correlation_id())
+    return _job_response(job)
+
+
+@router.get("/admin/users/bulk/{job_id}", response_model=BulkUserImportJobResponse, dependencies=[Depends(require_admin)])
+def bulk_import_status(job_id: str, db: Session = Depends(get_db)):
+    """Status, progress and per-row failures of a bulk import job. Requires the X-Admin-Key header."""
+    job = db.get(BulkImportJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return _job_response(job)
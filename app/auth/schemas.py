@@ -1,4 +1,7 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, EmailStr, Field, field_validator
+from app.core.config import settings
 import re
 
 
@@ -29,3 +32,26 @@ class UserResponse(BaseModel):
     name: str
     email: str
     cpf_cnpj: str
+
+
+class BulkUserImportRequest(BaseModel):
+    # Rows are validated one by one (as UserCreate) so a bad row fails alone, not the whole batch
+    users: List[Dict[str, Any]] = Field(..., min_length=1, max_length=settings.BULK_IMPORT_MAX_ROWS)
+
+
+class BulkUserImportError(BaseModel):
+    row: int
+    reason: str
+
+
+class BulkUserImportJobResponse(BaseModel):
+    job_id: str
+    status: str
+    received: int
+    processed: int
+    created: int
+    failed: int
+    errors: List[BulkUserImportError]
+    detail: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
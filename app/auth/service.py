@@ -1,18 +1,10 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from jose import jwt
 from typing import Dict, Any, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
 from app.core.config import settings
-
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+from app.auth.models import User
 
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
@@ -25,3 +17,21 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
+
+
+def mark_account_activated(user: User) -> bool:
+    """Flags a loaded user as activated by a confirmed deposit; the caller commits. Returns True on the first deposit."""
+    if user.activated_at is not None:
+        return False
+    user.activated_at = datetime.now(timezone.utc)
+    return True
+
+
+def activate_account(db: Session, user_id: str) -> bool:
+    """Same as mark_account_activated without loading the user: a conditional UPDATE inside the caller's transaction."""
+    result = db.execute(
+        update(User)
+        .where(User.id == user_id, User.activated_at.is_(None))
+        .values(activated_at=datetime.now(timezone.utc))
+    )
+    return bool(result.rowcount)
@@ -0,0 +1,163 @@
+"""
+Pre-hash login throttling with sliding-window counters.
+Failed logins are counted per CPF/CNPJ and per client IP; once a key exceeds its limit the login
+is refused with 429 before any user lookup or password hashing happens.
+"""
+import math
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class MemoryCounterStore:
+    """Per-process counters: key -> (window index, count in that window, count in the previous one)."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Tuple[int, int, int]] = {}
+
+    def _current(self, key: str, window: int) -> Tuple[int, int]:
+        entry = self._counters.get(key)
+        if entry is None:
+            return 0, 0
+        index, current, previous = entry
+        if index == window:
+            return current, previous
+        if index == window - 1:
+            return 0, current
+        return 0, 0
+
+    def counts(self, key: str, window: int) -> Tuple[int, int]:
+        with self._lock:
+            return self._current(key, window)
+
+    def hit(self, key: str, window: int) -> None:
+        with self._lock:
+            current, previous = self._current(key, window)
+            self._counters[key] = (window, current + 1, previous)
+            if len(self._counters) > self.max_keys:
+                self._prune(window)
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def _prune(self, window: int) -> None:
+        stale = [key for key, (index, _, _) in self._counters.items() if index < window - 1]
+        for key in stale:
+            del self._counters[key]
+        # Still full of live keys: drop the oldest insertions rather than grow without bound
+        overflow = len(self._counters) - self.max_keys
+        for key in list(self._counters)[:max(overflow, 0)]:
+            del self._counters[key]
+
+
+class SQLiteCounterStore:
+    """
+    Counters shared by every worker on the host through a SQLite file (WAL mode).
+    One row per (key, window); rows older than the previous window are purged on window change.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._purged_window = -1
+        db = self._connection()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS login_throttle ("
+            "key TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (key, window))"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._local.db = db
+        return db
+
+    def counts(self, key: str, window: int) -> Tuple[int, int]:
+        rows = dict(self._connection().execute(
+            "SELECT window, count FROM login_throttle WHERE key = ? AND window IN (?, ?)", (key, window, window - 1)
+        ).fetchall())
+        return rows.get(window, 0), rows.get(window - 1, 0)
+
+    def hit(self, key: str, window: int) -> None:
+        db = self._connection()
+        db.execute(
+            "INSERT INTO login_throttle (key, window, count) VALUES (?, ?, 1) "
+            "ON CONFLICT (key, window) DO UPDATE SET count = count + 1",
+            (key, window)
+        )
+        if window != self._purged_window:
+            self._purged_window = window
+            db.execute("DELETE FROM login_throttle WHERE window < ?", (window - 1,))
+
+    def reset(self, key: str) -> None:
+        self._connection().execute("DELETE FROM login_throttle WHERE key = ?", (key,))
+
+
+class LoginThrottle:
+    """
+    Approximate sliding window: the failures of the previous fixed window are weighted by the
+    fraction of it still covered by the sliding one, plus the failures of the current window.
+    Two counters per key, O(1) per check, no per-attempt timestamps.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        window_seconds: int = 300,
+        max_per_identity: int = 5,
+        max_per_ip: int = 50,
+        clock: Callable[[], float] = time.time
+    ):
+        self.store = store if store is not None else MemoryCounterStore()
+        self.window_seconds = window_seconds
+        self.max_per_identity = max_per_identity
+        self.max_per_ip = max_per_ip
+        self.clock = clock
+        self.rejected = 0
+
+    def _estimate(self, key: str, now: float) -> float:
+        window, offset = divmod(now, self.window_seconds)
+        current, previous = self.store.counts(key, int(window))
+        return previous * (1 - offset / self.window_seconds) + current
+
+    def check(self, cpf_cnpj: str, ip: str) -> Optional[int]:
+        """Returns the Retry-After in seconds if the login must be refused, None otherwise."""
+        now = self.clock()
+        for key, limit in ((f"id:{cpf_cnpj}", self.max_per_identity), (f"ip:{ip}", self.max_per_ip)):
+            if limit > 0 and self._estimate(key, now) >= limit:
+                self.rejected += 1
+                logger.warning(f"Login throttled: {key.split(':')[0]} limit of {limit} failures reached")
+                return max(1, math.ceil(self.window_seconds - now % self.window_seconds))
+        return None
+
+    def record_failure(self, cpf_cnpj: str, ip: str) -> None:
+        window = int(self.clock() // self.window_seconds)
+        self.store.hit(f"id:{cpf_cnpj}", window)
+        self.store.hit(f"ip:{ip}", window)
+
+    def reset(self, cpf_cnpj: str) -> None:
+        """Clears the identity counter after a successful login (the IP counter keeps running)."""
+        self.store.reset(f"id:{cpf_cnpj}")
+
+
+def build_login_throttle() -> LoginThrottle:
+    store = SQLiteCounterStore(settings.LOGIN_THROTTLE_STORE_PATH) if settings.LOGIN_THROTTLE_STORE_PATH else None
+    return LoginThrottle(
+        store=store,
+        window_seconds=settings.LOGIN_THROTTLE_WINDOW_SECONDS,
+        max_per_identity=settings.LOGIN_THROTTLE_MAX_PER_IDENTITY,
+        max_per_ip=settings.LOGIN_THROTTLE_MAX_PER_IP
+    )
+
+
+# Singleton throttle shared by the auth endpoints
+login_throttle = build_login_throttle()
@@ -1,12 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Header
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from uuid import uuid4
 
 from app.core.database import get_db
+from app.core.logger import current_correlation_id
 from app.auth.dependencies import get_current_user
-from app.auth.models import User
+from app.auth.cache import UserSnapshot
 from app.boleto.schemas import BoletoQuery, BoletoDetails, BoletoPaymentRequest, PaymentResponse
 from app.boleto.service import query_boleto, process_payment
 from app.pix.service import get_balance
@@ -19,7 +19,7 @@ templates = Jinja2Templates(directory="app/templates")
 async def view_boleto(
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     balance = get_balance(db, current_user.id)
     return templates.TemplateResponse("boleto.html", {
@@ -33,7 +33,7 @@ async def view_boleto(
 @router.post("/api/boleto/query", response_model=BoletoDetails)
 def api_query_boleto(
     data: BoletoQuery,
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     try:
         return query_boleto(data.barcode)
@@ -45,10 +45,9 @@ def api_query_boleto(
 def api_pay_boleto(
     data: BoletoPaymentRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    x_correlation_id: str = Header(default=None)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    correlation_id = x_correlation_id or str(uuid4())
+    correlation_id = current_correlation_id()
     try:
         boleto = process_payment(db, data, current_user.id, correlation_id)
         return PaymentResponse(
@@ -2,6 +2,7 @@
 Centralized application configuration implementing the 12-Factor App methodology.
 Enforces strict environment separation and security protocols.
 """
+from typing import Any, Dict, List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -22,6 +23,95 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080
 
     LOG_LEVEL: str = "INFO"
+    # "text" (pipe-separated) or "json" (one object per line with the structured fields)
+    LOG_FORMAT: str = "text"
+    # Fraction of records kept per log category, e.g. LOG_SAMPLING_RATES='{"access": 0.1}'
+    LOG_SAMPLING_RATES: Dict[str, float] = {}
+    # Asynchronous logging: bounded queue between request threads and the writer thread;
+    # when full, "drop" discards records immediately and "block" waits up to the timeout first
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_QUEUE_POLICY: str = "drop"
+    LOG_QUEUE_BLOCK_TIMEOUT_SECONDS: float = 1.0
+
+    # Prometheus metrics: with a directory, each worker writes a snapshot there every interval and
+    # /metrics aggregates all of them (clear it on deploy); empty reports the serving worker only
+    METRICS_DIR: str = ""
+    METRICS_WRITE_INTERVAL_SECONDS: float = 5.0
+
+    # Password hashing: argon2id cost used until startup calibration fits it to the latency budget (0 = no calibration)
+    PASSWORD_HASH_BUDGET_MS: int = 250
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 4
+    # Stored argon2 hashes are re-hashed on login only when their cost is this fraction below the policy
+    ARGON2_REHASH_TOLERANCE: float = 0.5
+
+    # Password hashing process pool: workers (0 = inline), admitted calls before shedding with 503
+    AUTH_HASH_WORKERS: int = 2
+    AUTH_HASH_MAX_PENDING: int = 16
+    AUTH_HASH_RETRY_AFTER_SECONDS: int = 1
+    # Lower-priority processes hashing bulk imports, separate from the interactive pool above
+    AUTH_BULK_HASH_WORKERS: int = 1
+
+    # Verified-token cache: entries and maximum age of a cached user snapshot (capped by the token's exp)
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+
+    # Login throttling: failed attempts per CPF/CNPJ and per IP over a sliding window (0 = no limit);
+    # a SQLite file path shares the counters across workers, empty keeps them in process memory
+    LOGIN_THROTTLE_WINDOW_SECONDS: int = 300
+    LOGIN_THROTTLE_MAX_PER_IDENTITY: int = 5
+    LOGIN_THROTTLE_MAX_PER_IP: int = 50
+    LOGIN_THROTTLE_STORE_PATH: str = ""
+    # Proxies (comma-separated IPs/CIDRs) whose X-Forwarded-For/-Proto are honoured; the client IP is the
+    # right-most address not in this list. Behind an unlisted proxy every client shares the proxy's IP.
+    TRUSTED_PROXY_IPS: str = "127.0.0.1"
+
+    # Admin endpoints (X-Admin-Key header; empty disables them) and bulk user import limits;
+    # an import job reports progress (and stops on shutdown) once per chunk
+    ADMIN_API_KEY: str = ""
+    BULK_IMPORT_MAX_ROWS: int = 50000
+    BULK_IMPORT_CHUNK_SIZE: int = 200
+
+    # Memoized installment simulations (LRU entries) and standard products pre-computed at startup, then
+    # again shortly before each midnight in Brasília (keys include the disbursement date, today by default),
+    # e.g. INSTALLMENT_PRODUCT_CATALOG='[{"value": 1000, "installments": 12, "monthly_rate": 0.035}]'
+    INSTALLMENT_CACHE_SIZE: int = 1024
+    INSTALLMENT_PRODUCT_CATALOG: List[Dict[str, Any]] = []
+
+    # Write-behind persistence of simulations: batch size, flush interval and back-pressure threshold
+    SIMULATION_WRITE_BATCH_SIZE: int = 500
+    SIMULATION_WRITE_INTERVAL_SECONDS: float = 1.0
+    SIMULATION_WRITE_MAX_PENDING: int = 10000
+
+    # Audit trail persistence: batch size, flush interval and back-pressure threshold
+    AUDIT_WRITE_BATCH_SIZE: int = 500
+    AUDIT_WRITE_INTERVAL_SECONDS: float = 1.0
+    AUDIT_WRITE_MAX_PENDING: int = 10000
+
+    # Contract accrual: 2% late fee per overdue installment, 1%/month moratory interest pro rata die
+    CONTRACT_LATE_FEE_RATE: float = 0.02
+    CONTRACT_MORATORY_MONTHLY_RATE: float = 0.01
+    CONTRACT_ACCRUAL_CHUNK_SIZE: int = 10000
+
+    # Installment offer-matrix limits; grids above the parallel threshold are split across processes
+    INSTALLMENT_GRID_MAX_CELLS: int = 1000000
+    INSTALLMENT_GRID_PARALLEL_CELLS: int = 250000
+    INSTALLMENT_GRID_WORKERS: int = 4
+
+    # Anti-Fraud risk model (JSON file) combined with the rule points
+    ANTIFRAUD_MODEL_PATH: Optional[str] = None
+    ANTIFRAUD_MODEL_WEIGHT: int = 40
+
+    # Rolling window for transfer-graph edge weights, fan-in/fan-out counters and connected components;
+    # components are rebuilt from the live edges at most this often once an edge has expired
+    TRANSFER_GRAPH_WINDOW_HOURS: int = 24
+    TRANSFER_GRAPH_COMPONENT_REFRESH_SECONDS: float = 60.0
+
+    # Anti-Fraud shadow mode: candidate rule set (JSON file) evaluated off the request path
+    ANTIFRAUD_SHADOW_RULESET: Optional[str] = None
+    ANTIFRAUD_SHADOW_SAMPLE_RATE: float = 1.0
+    ANTIFRAUD_SHADOW_QUEUE_SIZE: int = 1000
 
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
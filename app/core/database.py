@@ -8,6 +8,8 @@ from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.metrics import track_pool, track_sql
+from app.core.timing import instrument_engine
 
 engine = create_engine(
     settings.DATABASE_URL,
@@ -24,6 +26,12 @@ if "sqlite" in settings.DATABASE_URL:
         cursor.execute("PRAGMA synchronous=NORMAL")
         cursor.close()
 
+# SQL execution time per request (Server-Timing `db` span)
+instrument_engine(engine)
+# Statement counts/latencies and pool usage for /metrics
+track_sql(engine)
+track_pool(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
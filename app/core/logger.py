@@ -1,22 +1,147 @@
 """
 Structured logging subsystem implementing observability patterns.
 Correlation IDs for distributed tracing and sensitive data masking.
+Records are handed to a background listener through a bounded queue, so slow stdout never stalls a request.
 """
+import atexit
+import json
 import logging
+import queue
 import sys
-from typing import Any, Dict, MutableMapping, Tuple
+import threading
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, MutableMapping, Optional, Tuple
+from uuid import uuid4
 from app.core.config import settings
 
 
+# Correlation ID of the request being handled, set by the tracing middleware
+correlation_id_var: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+
+def current_correlation_id() -> str:
+    """Correlation ID of the current context; outside a request (scripts, jobs) a new one is bound."""
+    correlation_id = correlation_id_var.get()
+    if correlation_id is None:
+        correlation_id = str(uuid4())
+        correlation_id_var.set(correlation_id)
+    return correlation_id
+
+
 class CorrelationFilter(logging.Filter):
-    """Injects a default Correlation ID into log records to maintain schema consistency."""
+    """
+    Injects the context's Correlation ID (or 'N/A') into log records to maintain schema consistency.
+    Must run in the emitting thread, i.e. before the record is queued.
+    """
 
     def filter(self, record: logging.LogRecord) -> bool:
         if not hasattr(record, 'correlation_id'):
-            record.correlation_id = 'N/A'  # type: ignore
+            record.correlation_id = correlation_id_var.get() or 'N/A'  # type: ignore
         return True
 
 
+# Attributes every LogRecord has; anything else was passed through `extra` and is a structured field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: standard fields plus every `extra` field passed by the caller."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of the records of each sampled category (the `category` extra field),
+    e.g. {"access": 0.1} keeps one request/response line in ten. Sampling is deterministic
+    (evenly spaced) and never applies to warnings and errors.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = getattr(record, "category", None)
+        rate = self.rates.get(category) if category else None
+        if rate is None or rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            seen = self._seen.get(category, 0) + 1
+            self._seen[category] = seen
+        return int(seen * rate) > int((seen - 1) * rate)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Enqueues records for the listener thread. When the queue is full, the "drop" policy discards
+    the record immediately and "block" waits up to `block_timeout` seconds before discarding.
+    Discarded records are counted and reported by a warning once the queue has room again.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]", policy: str = "drop", block_timeout: float = 1.0):
+        super().__init__(log_queue)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._unreported = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Interpolate in the emitting thread: args and container extras (e.g. the audit details dict)
+        # may be mutated by the caller before the listener formats the record
+        record.msg = record.getMessage()
+        record.args = None
+        for key, value in list(vars(record).items()):
+            if key not in _RECORD_ATTRIBUTES and isinstance(value, (dict, list)):
+                setattr(record, key, value.copy())
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                self._unreported += 1
+            return
+
+        if self._unreported:
+            with self._lock:
+                unreported, self._unreported = self._unreported, 0
+            if unreported:
+                self._report_drops(unreported)
+
+    def _report_drops(self, count: int) -> None:
+        warning = logging.LogRecord(
+            "fintech.logging", logging.WARNING, __file__, 0, "Log queue full: %d records dropped", (count,), None
+        )
+        try:
+            self.queue.put_nowait(warning)
+        except queue.Full:
+            with self._lock:
+                self._unreported += count
+
+
 # Configuração de structured logging
 # Create handler with filter to ensure correlation_id is always present before formatting
 handler = logging.StreamHandler(sys.stdout)
@@ -25,7 +150,15 @@ formatter = logging.Formatter(
     '%(asctime)s | %(levelname)-8s | %(name)s | %(correlation_id)s | %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S'
 )
-handler.setFormatter(formatter)
+handler.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else formatter)
+
+# The root logger only enqueues; the listener thread owns the (blocking) stream handler
+log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+queue_handler = BoundedQueueHandler(
+    log_queue, policy=settings.LOG_QUEUE_POLICY, block_timeout=settings.LOG_QUEUE_BLOCK_TIMEOUT_SECONDS
+)
+queue_handler.addFilter(CorrelationFilter())
+listener: Optional[QueueListener] = None
 
 # Configure root logger
 root_logger = logging.getLogger()
@@ -34,19 +167,49 @@ root_logger.setLevel(getattr(logging, settings.LOG_LEVEL))
 if root_logger.handlers:
     for h in root_logger.handlers:
         root_logger.removeHandler(h)
-root_logger.addHandler(handler)
+
+
+def start_log_listener() -> None:
+    """Routes root logging through the queue and starts the listener thread (idempotent)."""
+    global listener
+    if listener is not None:
+        return
+    root_logger.removeHandler(handler)
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    root_logger.addHandler(queue_handler)
+
+
+def stop_log_listener() -> None:
+    """
+    Drains the queue and stops the listener thread (shutdown hook).
+    Later records, e.g. from interpreter teardown, are written synchronously.
+    """
+    global listener
+    if listener is None:
+        return
+    root_logger.removeHandler(queue_handler)
+    root_logger.addHandler(handler)
+    listener.stop()
+    listener = None
+
+
+start_log_listener()
+atexit.register(stop_log_listener)
 
 logger = logging.getLogger("fintech")
+# Sampled categories are filtered before a record reaches the queue
+logger.addFilter(SamplingFilter(settings.LOG_SAMPLING_RATES))
 
 
 class CorrelationLoggerAdapter(logging.LoggerAdapter[logging.Logger]):
-    """Context-aware logger adapter ensuring Correlation ID propagation across the execution context."""
+    """
+    Logger bound to an explicit Correlation ID, for work running outside the request context
+    (e.g. background threads). Request code just uses `logger`: the ID comes from the context.
+    """
 
     def process(self, msg: Any, kwargs: MutableMapping[str, Any]) -> Tuple[Any, MutableMapping[str, Any]]:
-        if 'extra' not in kwargs:
-            kwargs['extra'] = {}
-        if 'correlation_id' not in kwargs['extra']:
-            kwargs['extra']['correlation_id'] = 'N/A'
+        kwargs['extra'] = {**(self.extra or {}), **kwargs.get('extra', {})}
         return msg, kwargs
 
 
@@ -55,12 +218,40 @@ def get_logger_with_correlation(correlation_id: str) -> CorrelationLoggerAdapter
     return CorrelationLoggerAdapter(logger, {'correlation_id': correlation_id})
 
 
+# Durable destinations of audit records (e.g. app.audit.store), registered at startup
+AuditSink = Callable[[str, str, str, Dict[str, Any]], None]
+_audit_sinks: List[AuditSink] = []
+
+
+def register_audit_sink(sink: AuditSink) -> None:
+    if sink not in _audit_sinks:
+        _audit_sinks.append(sink)
+
+
+def unregister_audit_sink(sink: AuditSink) -> None:
+    if sink in _audit_sinks:
+        _audit_sinks.remove(sink)
+
+
 def audit_log(action: str, user: str, resource: str, details: Dict[str, Any]) -> None:
     """
     Emits immutable audit records for compliance-critical operations.
-    Mandatory for regulatory traceability.
+    Mandatory for regulatory traceability: besides the log line, every registered sink receives the record.
     """
+    for sink in _audit_sinks:
+        try:
+            sink(action, user, resource, details)
+        except Exception as e:
+            logger.error(f"Audit sink failed for action={action}: {str(e)}")
+
     logger.info(
-        f"AUDIT | action={action} | user={user} | resource={resource} | details={details}",
-        extra={'correlation_id': details.get('correlation_id', 'N/A')}
+        "AUDIT | action=%s | user=%s | resource=%s | details=%s", action, user, resource, details,
+        extra={
+            'correlation_id': details.get('correlation_id') or correlation_id_var.get() or 'N/A',
+            'category': 'audit',
+            'action': action,
+            'user': user,
+            'resource': resource,
+            'details': details
+        }
     )
@@ -0,0 +1,337 @@
+"""
+In-process metrics exposed in the Prometheus text format at `/metrics`.
+Each worker counts in memory; with METRICS_DIR set, workers periodically write a snapshot file
+there and a scrape on any worker merges every snapshot, so the totals cover all workers.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.logger import logger, queue_handler
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds: sub-millisecond SQL up to slow requests
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+
+class Counter(_Metric):
+    """Monotonic count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0.0)
+
+    def samples(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram(_Metric):
+    """Bucketed observations per label combination: [counts per bucket (non-cumulative) + overflow, sum]."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._values: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                entry = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return {labels: [list(counts), total] for labels, (counts, total) in self._values.items()}
+
+
+class Collected(_Metric):
+    """Counter or gauge read from a callback at snapshot time (pool usage, logging-queue drops)."""
+
+    def __init__(
+        self, name: str, documentation: str, kind: str, collect: Callable[[], Dict[LabelValues, float]],
+        labelnames: Sequence[str] = ()
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self) -> Dict[LabelValues, Any]:
+        try:
+            return dict(self.collect())
+        except Exception as e:
+            logger.warning(f"Metrics collector {self.name} failed: {str(e)}")
+            return {}
+
+
+class MetricsRegistry:
+    """
+    Metric definitions of this process plus the multi-worker snapshot exchange.
+
+    - Counters and histograms of every snapshot file are summed, including files left by workers
+      that have since exited, so totals stay monotonic across worker restarts
+    - Gauges only come from snapshots written within `stale_after` seconds (live workers)
+    """
+
+    def __init__(self, directory: str = "", interval: float = 5.0):
+        self.directory = directory
+        self.interval = interval
+        self.stale_after = max(3 * interval, 15.0)
+        self._metrics: Dict[str, _Metric] = {}
+        self._worker: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collected(
+        self, name: str, documentation: str, kind: str, collect: Callable[[], Dict[LabelValues, float]],
+        labelnames: Sequence[str] = ()
+    ) -> Collected:
+        return self.register(Collected(name, documentation, kind, collect, labelnames))
+
+    # --- Snapshots ---
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable state of this process: {metric: [[labelvalues, value], ...]}."""
+        return {
+            "pid": os.getpid(),
+            "written_at": time.time(),
+            "metrics": {
+                name: [[list(labels), value] for labels, value in metric.samples().items()]
+                for name, metric in self._metrics.items()
+            }
+        }
+
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.directory, f"worker-{os.getpid()}.json")
+
+    def write_snapshot(self) -> None:
+        """Atomically replaces this worker's snapshot file."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".worker-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, self._snapshot_path())
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _read_snapshots(self) -> List[Dict[str, Any]]:
+        snapshots = [self.snapshot()]
+        own = os.path.basename(self._snapshot_path())
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.startswith("worker-") or not filename.endswith(".json") or filename == own:
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics snapshot {filename}: {str(e)}")
+        return snapshots
+
+    def _merge(self, snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Dict[LabelValues, Any]]:
+        now = time.time()
+        merged: Dict[str, Dict[LabelValues, Any]] = {name: {} for name in self._metrics}
+        for snapshot in snapshots:
+            fresh = now - snapshot.get("written_at", 0) <= self.stale_after
+            for name, samples in snapshot.get("metrics", {}).items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.kind == "gauge" and not fresh):
+                    continue
+                target = merged[name]
+                for labels, value in samples:
+                    key = tuple(labels)
+                    if metric.kind == "histogram":
+                        current = target.get(key)
+                        if current is None or len(current[0]) != len(value[0]):
+                            target[key] = [list(value[0]), value[1]]
+                        else:
+                            current[0] = [a + b for a, b in zip(current[0], value[0])]
+                            current[1] += value[1]
+                    else:
+                        target[key] = target.get(key, 0.0) + value
+        return merged
+
+    def render(self) -> str:
+        """Prometheus text exposition (version 0.0.4) of this worker, or of every worker with METRICS_DIR."""
+        if self.directory:
+            self.write_snapshot()
+            merged = self._merge(self._read_snapshots())
+        else:
+            merged = self._merge([self.snapshot()])
+
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels, value in sorted(merged[name].items()):
+                pairs = list(zip(metric.labelnames, labels))
+                if isinstance(metric, Histogram):
+                    counts, total = value
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(pairs + [('le', _number(bound))])} {cumulative}")
+                    cumulative += counts[-1]
+                    lines.append(f"{name}_bucket{_labels(pairs + [('le', '+Inf')])} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(pairs)} {_number(total)}")
+                    lines.append(f"{name}_count{_labels(pairs)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    # --- Background snapshot writer ---
+
+    def start(self) -> None:
+        """Starts writing this worker's snapshot every `interval` seconds (no-op without METRICS_DIR)."""
+        if not self.directory or self._worker is not None:
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._worker.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.write_snapshot()
+            except Exception as e:
+                logger.warning(f"Metrics snapshot write failed: {str(e)}")
+
+    def stop(self) -> None:
+        """Stops the writer after a final snapshot, so counts up to shutdown are kept."""
+        if self._worker is None:
+            return
+        self._stop.set()
+        self._worker.join()
+        self._worker = None
+        try:
+            self.write_snapshot()
+        except Exception as e:
+            logger.warning(f"Metrics snapshot write failed: {str(e)}")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _statement_operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def track_sql(engine: Engine) -> None:
+    """Counts and times every SQL statement executed through the engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        start = getattr(context, "_metrics_start", None)
+        if start is not None:
+            operation = _statement_operation(statement)
+            sql_statements.inc(operation)
+            sql_statement_duration.observe(time.perf_counter() - start, operation)
+
+
+def track_pool(engine: Engine) -> None:
+    """Exposes the connection pool usage of the engine (pools without counters report nothing)."""
+
+    def pool_usage() -> Dict[LabelValues, float]:
+        pool = engine.pool
+        usage: Dict[LabelValues, float] = {}
+        for state in ("size", "checkedout", "checkedin", "overflow"):
+            reader = getattr(pool, state, None)
+            if callable(reader):
+                usage[(state,)] = float(reader())
+        return usage
+
+    metrics_registry.collected(
+        "db_pool_connections", "Connection pool usage by state, summed over live workers", "gauge", pool_usage, ("state",)
+    )
+
+
+def _log_queue_drops() -> Dict[LabelValues, float]:
+    return {(): float(queue_handler.dropped)}
+
+
+# Singleton registry and the application metrics
+metrics_registry = MetricsRegistry(settings.METRICS_DIR, settings.METRICS_WRITE_INTERVAL_SECONDS)
+
+http_requests = metrics_registry.counter(
+    "http_requests_total", "HTTP requests by method, route template and status", ("method", "route", "status")
+)
+http_request_duration = metrics_registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by method, route template and status", ("method", "route", "status")
+)
+sql_statements = metrics_registry.counter("db_statements_total", "SQL statements executed by operation", ("operation",))
+sql_statement_duration = metrics_registry.histogram(
+    "db_statement_duration_seconds", "SQL statement execution time by operation", ("operation",)
+)
+pix_created = metrics_registry.counter("pix_created_total", "PIX transactions created by type", ("type",))
+pix_confirmed = metrics_registry.counter("pix_confirmed_total", "PIX transactions that reached CONFIRMED")
+pix_failed = metrics_registry.counter("pix_failed_total", "PIX creations rejected or rolled back by reason", ("reason",))
+antifraud_decisions = metrics_registry.counter(
+    "antifraud_decisions_total", "Anti-fraud decisions by outcome and risk level", ("decision", "risk_level")
+)
+metrics_registry.collected("log_queue_dropped_total", "Log records discarded because the queue was full", "counter", _log_queue_drops)
@@ -0,0 +1,104 @@
+"""
+Pure ASGI middleware for tracing, timing and security headers.
+Works on the raw ASGI messages: no per-request task or response-stream wrapping, and streaming
+responses pass through untouched.
+"""
+import re
+import time
+from typing import List, Tuple
+from uuid import uuid4
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logger import correlation_id_var, logger
+from app.core.metrics import http_request_duration, http_requests
+from app.core.timing import start_request_timing, stop_request_timing
+
+CORRELATION_HEADER = b"x-correlation-id"
+# Client-supplied IDs are stored in String(100) correlation_id columns and echoed in logs: anything
+# longer or outside this alphabet is replaced by a generated UUID
+_VALID_CORRELATION_ID = re.compile(r"[A-Za-z0-9._:-]{1,100}")
+
+SECURITY_HEADERS: List[Tuple[bytes, bytes]] = [
+    # HSTS (HTTP Strict Transport Security) - Force HTTPS for 1 year
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    # Prevent Clickjacking (X-Frame-Options)
+    (b"x-frame-options", b"DENY"),
+    # XSS Protection
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-xss-protection", b"1; mode=block"),
+    # Referrer Policy
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+]
+_SECURITY_NAMES = frozenset(name for name, _ in SECURITY_HEADERS)
+
+
+class RequestContextMiddleware:
+    """
+    Distributed tracing and security headers for every HTTP response.
+
+    - Binds the X-Correlation-ID (or a new UUID when absent or invalid) to the logging context and `request.state`
+    - Logs the request line and, once the response completes, status and duration
+    - Collects the request's timing spans (app/core/timing.py) for the Server-Timing header and the log
+    - Counts the request and its latency per route template and status for /metrics
+    - Adds X-Correlation-ID, X-Process-Time (time to first response byte), Server-Timing and the
+      security headers by rewriting the `http.response.start` message
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        correlation_id = ""
+        for name, value in scope["headers"]:
+            if name == CORRELATION_HEADER:
+                correlation_id = value.decode("latin-1")
+                break
+        if not _VALID_CORRELATION_ID.fullmatch(correlation_id):
+            correlation_id = str(uuid4())
+        scope.setdefault("state", {})["correlation_id"] = correlation_id
+        token = correlation_id_var.set(correlation_id)
+        timings, timing_token = start_request_timing()
+
+        start_time = time.perf_counter()
+        status_code = 500
+        method, path = scope["method"], scope["path"]
+        logger.info("Request: %s %s", method, path, extra={"category": "access", "method": method, "path": path})
+
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [(name, value) for name, value in message.get("headers", ()) if name not in _SECURITY_NAMES]
+                headers.extend(SECURITY_HEADERS)
+                headers.append((CORRELATION_HEADER, correlation_id.encode("latin-1")))
+                elapsed = time.perf_counter() - start_time
+                headers.append((b"x-process-time", str(elapsed).encode()))
+                headers.append((b"server-timing", timings.header_value(elapsed * 1000).encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            process_time = time.perf_counter() - start_time
+            # Route template (e.g. /pix/transacoes/{pix_id}) keeps the label set bounded
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            status = str(status_code)
+            http_requests.inc(method, route, status)
+            http_request_duration.observe(process_time, method, route, status)
+            logger.info(
+                "Response: %s | %.3fs", status_code, process_time,
+                extra={
+                    "category": "access",
+                    "status_code": status_code,
+                    "duration_ms": round(process_time * 1000, 3),
+                    "timings": timings.as_dict()
+                }
+            )
+            stop_request_timing(timing_token)
+            correlation_id_var.reset(token)
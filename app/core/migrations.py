@@ -0,0 +1,181 @@
+"""
+Idempotent schema upgrades applied at startup, after `create_all`.
+`create_all` only creates missing tables; each step here inspects the live schema and alters tables
+that predate a model change, so it is a no-op on new or already upgraded databases.
+"""
+from typing import Callable, List
+
+from sqlalchemy import Integer, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.auth.models import User
+from app.core.logger import logger
+from app.parcelamento.models import InstallmentContract, InstallmentSimulation
+
+
+def simulation_ids_as_text(conn: Connection) -> bool:
+    """
+    simulacoes_parcelamento.id: INTEGER (autoincrement) -> VARCHAR(36) (client-assigned time-ordered IDs).
+    Existing rows keep their number as text, so old IDs stay valid.
+    """
+    table = InstallmentSimulation.__tablename__
+    inspector = inspect(conn)
+    if table not in inspector.get_table_names():
+        return False
+    id_column = next(column for column in inspector.get_columns(table) if column["name"] == "id")
+    if not isinstance(id_column["type"], Integer):
+        return False
+
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN id DROP DEFAULT"))
+        conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN id TYPE VARCHAR(36) USING id::text"))
+        conn.execute(text(f"DROP SEQUENCE IF EXISTS {table}_id_seq"))
+        return True
+
+    # SQLite cannot change a column type: rebuild the table and copy the rows over
+    legacy = f"{table}_legacy"
+    legacy_columns = {column["name"] for column in inspector.get_columns(table)}
+    for index in inspector.get_indexes(table):
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    InstallmentSimulation.__table__.create(conn)
+
+    # Columns added after the legacy table was created: NOT NULL ones get their model default
+    columns, selected, defaults = [], [], {}
+    for column in InstallmentSimulation.__table__.columns:
+        if column.name in legacy_columns:
+            columns.append(column.name)
+            selected.append("CAST(id AS TEXT)" if column.name == "id" else column.name)
+        elif not column.nullable and column.default is not None and column.default.is_scalar:
+            columns.append(column.name)
+            selected.append(f":{column.name}")
+            defaults[column.name] = column.default.arg
+    conn.execute(
+        text(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(selected)} FROM {legacy}"), defaults
+    )
+    conn.execute(text(f"DROP TABLE {legacy}"))
+    return True
+
+
+def amortization_table_nullable(conn: Connection) -> bool:
+    """
+    simulacoes_parcelamento.tabela_amortizacao: NOT NULL -> nullable (new rows store only the parameters).
+    SQLite tables from that release still have INTEGER ids and are rebuilt by `simulation_ids_as_text`.
+    """
+    table = InstallmentSimulation.__tablename__
+    inspector = inspect(conn)
+    if conn.dialect.name != "postgresql" or table not in inspector.get_table_names():
+        return False
+    column = next(column for column in inspector.get_columns(table) if column["name"] == "tabela_amortizacao")
+    if column["nullable"]:
+        return False
+    conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN tabela_amortizacao DROP NOT NULL"))
+    return True
+
+
+def _add_missing_column(conn: Connection, model, name: str) -> bool:
+    """
+    Adds a column of `model` that its table was created without.
+    NOT NULL columns must declare a `server_default`, which fills the existing rows.
+    """
+    table = model.__tablename__
+    inspector = inspect(conn)
+    if table not in inspector.get_table_names():
+        return False
+    if name in {column["name"] for column in inspector.get_columns(table)}:
+        return False
+    column = model.__table__.columns[name]
+    definition = column.type.compile(dialect=conn.dialect)
+    if not column.nullable:
+        default = column.server_default.arg.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+        definition += f" NOT NULL DEFAULT {default}"
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {definition}"))
+    return True
+
+
+def user_activation_column(conn: Connection) -> bool:
+    """
+    users.ativado_em (nullable): existing users start unactivated and are backfilled from their
+    first confirmed deposit on their next authenticated request.
+    """
+    return _add_missing_column(conn, User, "ativado_em")
+
+
+def simulation_owner_column(conn: Connection) -> bool:
+    """simulacoes_parcelamento.user_id (nullable): legacy simulations have no owner and cannot be contracted."""
+    return _add_missing_column(conn, InstallmentSimulation, "user_id")
+
+
+def simulation_pricing_columns(conn: Connection) -> bool:
+    """
+    simulacoes_parcelamento.tarifas (0), inclui_iof (false) and data_liberacao (nullable): existing rows are
+    fee-free, IOF-free simulations anchored on their creation date, which is what they priced.
+    """
+    added = [_add_missing_column(conn, InstallmentSimulation, name) for name in ("tarifas", "inclui_iof", "data_liberacao")]
+    return any(added)
+
+
+def simulation_hash_column(conn: Connection) -> bool:
+    """
+    simulacoes_parcelamento.hash_conteudo (nullable, indexed): rows written before content addressing
+    have no hash and are simply never reused.
+    """
+    added = _add_missing_column(conn, InstallmentSimulation, "hash_conteudo")
+    table = InstallmentSimulation.__tablename__
+    if table not in inspect(conn).get_table_names():
+        return False
+    if any(index["column_names"] == ["hash_conteudo"] for index in inspect(conn).get_indexes(table)):
+        return added
+    index = next(index for index in InstallmentSimulation.__table__.indexes if list(index.columns.keys()) == ["hash_conteudo"])
+    index.create(conn)
+    return True
+
+
+def contract_simulation_unique(conn: Connection) -> bool:
+    """
+    contratos_parcelamento.simulation_id: plain index -> unique index (one contract per simulation).
+    Skipped, with an error logged, while duplicate contracts exist; they have to be resolved by hand.
+    """
+    table = InstallmentContract.__tablename__
+    inspector = inspect(conn)
+    if table not in inspector.get_table_names():
+        return False
+    indexes = [index for index in inspector.get_indexes(table) if index["column_names"] == ["simulation_id"]]
+    if any(index["unique"] for index in indexes):
+        return False
+
+    duplicates = conn.execute(text(
+        f"SELECT COUNT(*) FROM (SELECT simulation_id FROM {table} GROUP BY simulation_id HAVING COUNT(*) > 1) d"
+    )).scalar()
+    if duplicates:
+        logger.error(f"Schema upgrade skipped: {duplicates} simulations of {table} have more than one contract")
+        return False
+
+    for index in indexes:
+        conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+    index = next(index for index in InstallmentContract.__table__.indexes if list(index.columns.keys()) == ["simulation_id"])
+    index.create(conn)
+    return True
+
+
+# Applied in order, each in its own transaction
+UPGRADES: List[Callable[[Connection], bool]] = [
+    simulation_ids_as_text,
+    amortization_table_nullable,
+    user_activation_column,
+    simulation_pricing_columns,
+    simulation_hash_column,
+    simulation_owner_column,
+    contract_simulation_unique,
+]
+
+
+def upgrade_schema(engine: Engine) -> int:
+    """Runs every pending upgrade step. Returns the number of steps that changed the schema."""
+    applied = 0
+    for step in UPGRADES:
+        with engine.begin() as conn:
+            if step(conn):
+                applied += 1
+                logger.info(f"Schema upgrade applied: {step.__name__}")
+    return applied
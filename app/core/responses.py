@@ -0,0 +1,18 @@
+"""
+Response classes tuned for large numeric payloads.
+"""
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered by pydantic-core's native serializer.
+    Meant for plain dict/list payloads (e.g. amortization tables) returned without
+    response-model validation; roughly 3x faster than `json.dumps` on float-heavy content.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
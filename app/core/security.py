@@ -2,32 +2,111 @@
 Cryptographic primitives and data masking implementation.
 Enforces least privilege, auditability, and secure data handling standards.
 """
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from jose import jwt
 from passlib.context import CryptContext
+from passlib.hash import argon2
 from app.core.config import settings
+from app.core.logger import logger
 
-# Cryptographic context for password hashing (bcrypt)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# OWASP floor for argon2id memory (KiB); calibration never goes below it
+ARGON2_MIN_MEMORY_COST = 19456
+
+# Single password policy: argon2id for new hashes; legacy bcrypt hashes still verify and are
+# flagged for rehash. Cost parameters are tuned at startup by `calibrate_password_hashing`.
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated=["bcrypt"],
+    argon2__rounds=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
-    Verifies the provided plaintext password against the stored bcrypt hash.
+    Verifies the provided plaintext password against the stored hash (argon2 or legacy bcrypt).
     Uses constant-time comparison to prevent timing attacks.
     """
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    True when the stored hash uses a deprecated scheme or an argon2 cost (passes x memory) below the
+    current policy by more than `ARGON2_REHASH_TOLERANCE`.
+    Workers calibrate independently and land on slightly different costs; comparing within a band
+    (and never against a higher cost) keeps them from re-hashing each other's hashes on every login.
+    """
+    if pwd_context.identify(hashed_password) != "argon2":
+        return pwd_context.needs_update(hashed_password)
+
+    stored = argon2.from_string(hashed_password)
+    policy = pwd_context.handler("argon2")
+    if stored.type != policy.type or stored.version < policy.max_version:
+        return True
+    floor = policy.default_rounds * policy.memory_cost * (1 - settings.ARGON2_REHASH_TOLERANCE)
+    return stored.rounds * stored.memory_cost < floor
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies the password and, when `password_needs_rehash` flags the stored hash, returns a
+    replacement hash under the current policy (None otherwise).
+    """
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if password_needs_rehash(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+
 def get_password_hash(password: str) -> str:
     """
-    Generates a cryptographically strong bcrypt hash for the provided password.
-    Work factor is automatically managed by passlib defaults.
+    Generates an argon2id hash for the provided password with the calibrated cost parameters.
     """
     return pwd_context.hash(password)
 
 
+def _time_argon2(rounds: int, memory_cost: int) -> float:
+    handler = argon2.using(rounds=rounds, memory_cost=memory_cost, parallelism=settings.ARGON2_PARALLELISM)
+    samples = []
+    for _ in range(2):
+        start = time.perf_counter()
+        handler.hash("calibration-probe")
+        samples.append((time.perf_counter() - start) * 1000)
+    return min(samples)
+
+
+def calibrate_password_hashing(budget_ms: float = settings.PASSWORD_HASH_BUDGET_MS) -> Dict[str, Any]:
+    """
+    Tunes argon2 cost to a per-hash latency budget on this host.
+    A single pass is timed at the configured memory cost (halved down to the OWASP floor while a
+    single pass alone exceeds the budget); the number of passes is then scaled linearly to fill the budget.
+    Hashes created under clearly weaker parameters are upgraded on the next successful login
+    (see `password_needs_rehash`); stronger ones are left alone.
+    """
+    if budget_ms <= 0:
+        return {"calibrated": False}
+
+    memory_cost = settings.ARGON2_MEMORY_COST
+    single_pass_ms = _time_argon2(1, memory_cost)
+    while single_pass_ms > budget_ms and memory_cost > ARGON2_MIN_MEMORY_COST:
+        memory_cost = max(ARGON2_MIN_MEMORY_COST, memory_cost // 2)
+        single_pass_ms = _time_argon2(1, memory_cost)
+
+    rounds = max(1, int(budget_ms // single_pass_ms))
+    pwd_context.update(argon2__rounds=rounds, argon2__memory_cost=memory_cost)
+
+    logger.info(
+        f"Password hashing calibrated: argon2id t={rounds}, m={memory_cost}KiB, "
+        f"~{single_pass_ms * rounds:.0f}ms (budget {budget_ms:.0f}ms)"
+    )
+    return {"calibrated": True, "rounds": rounds, "memory_cost": memory_cost, "estimated_ms": single_pass_ms * rounds}
+
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
     Generates a signed JWT (JSON Web Token) with configurable expiration.
@@ -0,0 +1,91 @@
+"""
+Per-request latency breakdown reported as Server-Timing.
+Named spans and SQL execution time accumulate in a context-local collector started by the request
+middleware, which emits them as a `Server-Timing` header and in the access log line.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestTimings:
+    """Accumulated milliseconds and call count per span name, in first-seen order."""
+
+    def __init__(self) -> None:
+        self._spans: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()  # Sync endpoints record from the threadpool
+
+    def add(self, name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            entry = self._spans.setdefault(name, [0.0, 0])
+            entry[0] += elapsed_ms
+            entry[1] += 1
+
+    def header_value(self, total_ms: float) -> str:
+        """e.g. `auth;dur=0.8, db;dur=3.1;desc="4 queries", total;dur=9.6`"""
+        with self._lock:
+            spans = [(name, ms, count) for name, (ms, count) in self._spans.items()]
+        parts = [
+            f'{name};dur={ms:.1f};desc="{int(count)} queries"' if name == "db" else f"{name};dur={ms:.1f}"
+            for name, ms, count in spans
+        ]
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            result: Dict[str, Any] = {name: round(ms, 3) for name, (ms, _) in self._spans.items()}
+            if "db" in self._spans:
+                result["db_queries"] = int(self._spans["db"][1])
+        return result
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timing() -> Tuple[RequestTimings, "Token[Optional[RequestTimings]]"]:
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def stop_request_timing(token: "Token[Optional[RequestTimings]]") -> None:
+    _current.reset(token)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times a block (or, as a decorator, a function) into the current request; a no-op outside one."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - start) * 1000)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Accounts cursor execution time of every statement to the `db` span of the current request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        if context is not None:
+            context._timing_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        timings = _current.get()
+        start = getattr(context, "_timing_start", None)
+        if timings is not None and start is not None:
+            timings.add("db", (time.perf_counter() - start) * 1000)
@@ -1,5 +1,10 @@
 from datetime import datetime, timedelta, timezone
+import multiprocessing
+from multiprocessing.context import BaseContext
+import os
 import re
+import time
+import uuid
 
 
 def mask_cpf_cnpj(doc: str) -> str:
@@ -22,16 +27,47 @@ def mask_cpf_cnpj(doc: str) -> str:
         return f"{doc[:3]}***{doc[-2:]}"
 
 
+# Brasilia is UTC-3 (ignoring DST as it's abolished)
+BRASILIA_TZ = timezone(timedelta(hours=-3))
+
+
+def to_brasilia_time(dt: datetime) -> datetime:
+    """
+    Converts a datetime to Brasília time (UTC-3).
+    Naive datetimes are assumed to be UTC, as persisted by the ORM models.
+    """
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+
+    return dt.astimezone(BRASILIA_TZ)
+
+
 def format_brasilia_time(dt: datetime) -> str:
     """
     Converts UTC datetime to Brasília time (UTC-3) and formats it.
     Format: DD/MM/YYYY at HH:mm:ss
     """
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
+    return to_brasilia_time(dt).strftime("%d/%m/%Y at %H:%M:%S")
+
+
+def time_ordered_uuid() -> str:
+    """
+    Generates a UUIDv7-layout identifier: 48-bit Unix epoch milliseconds followed by random bits.
+    IDs sort by creation time, so they can be assigned client-side and still index well as primary keys.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # Version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
 
-    # Brasilia is UTC-3 (ignoring DST as it's abolished)
-    brasilia_tz = timezone(timedelta(hours=-3))
-    dt_brasilia = dt.astimezone(brasilia_tz)
 
-    return dt_brasilia.strftime("%d/%m/%Y at %H:%M:%S")
+def process_pool_context() -> BaseContext:
+    """
+    Start method for worker process pools: forkserver where available, spawn otherwise.
+    Forking the serving process would copy its threads' locks (e.g. the log listener's) in whatever
+    state they are, so a child could deadlock on its first log call.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
@@ -5,7 +5,7 @@ Features strict input validation, audit logging, and distributed tracing.
 """
 import os
 import sys
-from typing import Callable, Awaitable, Dict, Any
+from typing import Dict, Any
 
 # STRICT STARTUP ENFORCEMENT
 # The application must be started via `python start.py`
@@ -20,23 +20,39 @@ if not os.environ.get("NEWCREDIT_ALLOWED_START") and "pytest" not in sys.modules
         print("\nDirect execution via uvicorn or other methods is prohibited to ensure environment consistency.\n")
         sys.exit(1)
 
-from fastapi import FastAPI, Request, Response
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from contextlib import asynccontextmanager
-import time
-from uuid import uuid4
 
 from app.core.config import settings
-from app.core.database import init_db
-from app.core.logger import logger
+from app.core.database import SessionLocal, engine, init_db
+from app.core.migrations import upgrade_schema
+from app.core.metrics import metrics_registry
+from app.core.middleware import RequestContextMiddleware
+from app.core.logger import logger, register_audit_sink, start_log_listener, stop_log_listener, unregister_audit_sink
 from app.parcelamento.router import router as parcelamento_router
+from app.parcelamento.service import (
+    schedule_catalog_rewarm,
+    shutdown_grid_pool,
+    stop_catalog_rewarm,
+    warm_simulation_cache
+)
+from app.parcelamento.writer import simulation_writer
 from app.pix.router import router as pix_router
 from app.antifraude.router import router as antifraude_router
+from app.antifraude.graph import rebuild_from_db, transfer_graph
+from app.antifraude.rules import antifraud_engine, configure_model
+from app.antifraude.shadow import configure_shadow
 from app.web_routes import router as web_router
 from app.auth.router import router as auth_router
+from app.auth.bulk import import_jobs
+from app.auth.hashing import password_hasher
+from app.core.security import calibrate_password_hashing
 from app.boleto.router import router as boleto_router
+from app.audit.router import router as audit_router
+from app.audit.store import audit_store
 from fastapi.staticfiles import StaticFiles
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
@@ -45,14 +61,37 @@ from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 async def lifespan(app: FastAPI):
     """Application lifecycle management (startup/shutdown hooks)."""
     # Startup
+    start_log_listener()
     logger.info(f"Initializing {settings.APP_NAME} v{settings.VERSION}")
     init_db()
+    upgrade_schema(engine)  # Alters tables created before a model change
     logger.info("Database initialized")
+    register_audit_sink(audit_store.append)
+    metrics_registry.start()
+    configure_model(antifraud_engine)
+    with SessionLocal() as db:
+        rebuild_from_db(db, transfer_graph)
+    configure_shadow(antifraud_engine)
+    warm_simulation_cache()
+    schedule_catalog_rewarm()  # Cache keys include the disbursement date (today by default)
+    calibrate_password_hashing()
+    password_hasher.reload_policy()
 
     yield
 
     # Shutdown
     logger.info("Shutting down application")
+    if antifraud_engine.shadow is not None:
+        antifraud_engine.shadow.stop()
+    stop_catalog_rewarm()
+    shutdown_grid_pool()
+    simulation_writer.stop()  # Writes simulations still buffered
+    import_jobs.stop()  # Queued imports fail; a running one stops after its chunk
+    password_hasher.shutdown()
+    unregister_audit_sink(audit_store.append)
+    audit_store.stop()  # Writes audit records still buffered
+    metrics_registry.stop()  # Final snapshot for the aggregated counters
+    stop_log_listener()  # Flushes queued log records
 
 
 # FastAPI Application Factory
@@ -66,8 +105,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Trust X-Forwarded-Proto headers from Render's Load Balancer
-app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
+# Trust X-Forwarded-For/-Proto only from the configured proxies (Render's load balancer), so clients
+# cannot pick the IP the login throttle sees
+app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=settings.TRUSTED_PROXY_IPS)
 
 # CORS Configuration
 app.add_middleware(
@@ -79,59 +119,8 @@ app.add_middleware(
 )
 
 
-# Middleware for distributed tracing and logging
-@app.middleware("http")
-async def add_security_headers(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
-    """
-    Security Middleware to add HTTP security headers to every response.
-    Protects against XSS, Clickjacking, and MIME-sniffing.
-    """
-    response = await call_next(request)
-
-    # HSTS (HTTP Strict Transport Security) - Force HTTPS for 1 year
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-
-    # Prevent Clickjacking (X-Frame-Options)
-    response.headers["X-Frame-Options"] = "DENY"
-
-    # XSS Protection
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-
-    # Referrer Policy
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-
-    return response
-
-
-@app.middleware("http")
-async def add_correlation_id(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
-    """
-    Middleware for distributed tracing.
-    Injects a unique Correlation ID into the request context and propagates it to the response headers.
-    """
-    correlation_id = request.headers.get("X-Correlation-ID", str(uuid4()))
-    request.state.correlation_id = correlation_id
-
-    start_time = time.time()
-
-    logger.info(
-        f"Request: {request.method} {request.url.path}",
-        extra={"correlation_id": correlation_id}
-    )
-
-    response = await call_next(request)
-
-    process_time = time.time() - start_time
-    response.headers["X-Correlation-ID"] = correlation_id
-    response.headers["X-Process-Time"] = str(process_time)
-
-    logger.info(
-        f"Response: {response.status_code} | {process_time:.3f}s",
-        extra={"correlation_id": correlation_id}
-    )
-
-    return response
+# Tracing, timing and security headers (pure ASGI, outermost of the application middlewares)
+app.add_middleware(RequestContextMiddleware)
 
 
 # Router Registration
@@ -140,6 +129,7 @@ app.include_router(pix_router, prefix="/pix", tags=["PIX"])
 app.include_router(antifraude_router, prefix="/antifraud", tags=["Anti-Fraud"])
 app.include_router(auth_router, prefix="/auth", tags=["Auth"])
 app.include_router(boleto_router, tags=["Boleto"])
+app.include_router(audit_router, prefix="/audit", tags=["Audit"])
 
 # Mount Static Files
 static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
@@ -166,6 +156,7 @@ def api_info() -> Dict[str, Any]:
             "pix_confirm": "/pix/confirm",
             "pix_statement": "/pix/statement",
             "antifraud": "/antifraud/analyze",
+            "metrics": "/metrics",
             "docs": "/docs",
             "redoc": "/redoc"
         }
@@ -184,6 +175,14 @@ def health_check() -> Dict[str, str]:
     }
 
 
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """
+    Prometheus scrape endpoint (text exposition format), aggregated over workers when METRICS_DIR is set.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # Global Exception Handler
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
@@ -207,7 +206,8 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
 
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail, "correlation_id": correlation_id}
+        content={"detail": exc.detail, "correlation_id": correlation_id},
+        headers=exc.headers  # e.g. Retry-After, WWW-Authenticate
     )
 
 
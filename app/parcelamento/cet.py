@@ -0,0 +1,138 @@
+"""
+Regulatory CET (Custo Efetivo Total) for Price Table loans.
+Builds day-counted cash flows from the disbursement date, finances fees and IOF,
+and solves the annual IRR row-wise with a safeguarded vectorized Newton method.
+"""
+from datetime import date
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+DAYS_PER_YEAR = 365.0
+
+# IOF on credit operations for individuals: flat rate plus a daily rate on each
+# principal portion, counted up to 365 days from disbursement
+IOF_FLAT_RATE = 0.0038
+IOF_DAILY_RATE = 0.000082
+IOF_MAX_DAYS = 365
+
+# Rows solved together are limited so the (rows x installments) discount matrix stays around 8 MB
+CHUNK_ELEMENTS = 1 << 20
+
+# fn(x, rows) -> (f, df) evaluated for the selected rows
+RootFunction = Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+def due_day_offsets(disbursement: date, installments: int) -> np.ndarray:
+    """
+    Days from disbursement to each monthly due date.
+    Installments fall on the disbursement day of month, clamped to the last day of shorter months.
+    """
+    start = np.datetime64(disbursement, "D")
+    months = np.datetime64(disbursement, "M") + np.arange(1, installments + 1)
+    month_start = months.astype("datetime64[D]")
+    month_length = ((months + 1).astype("datetime64[D]") - month_start).astype(np.int64)
+    due = month_start + np.minimum(disbursement.day - 1, month_length - 1)
+    return (due - start).astype(np.float64)
+
+
+def iof_rate(installments: int, rates: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """
+    IOF as a fraction of the financed principal, per monthly rate.
+    Price Table principal portions are PV * i * (1+i)^-(n-j+1) / (1 - (1+i)^-n), so the
+    fraction depends only on (term, rate) and the financed amount can be grossed up in closed form.
+    """
+    rates = np.asarray(rates, dtype=np.float64)
+    log_growth = np.log1p(rates)[:, None]
+    remaining = np.arange(installments, 0, -1, dtype=np.float64)[None, :]  # n - j + 1
+
+    shares = rates[:, None] * np.exp(-remaining * log_growth) / -np.expm1(-installments * log_growth)
+    taxed_days = np.minimum(days[:installments], IOF_MAX_DAYS)
+    return IOF_FLAT_RATE + IOF_DAILY_RATE * (shares @ taxed_days)
+
+
+def solve_decreasing(
+    fn: RootFunction,
+    lo: np.ndarray,
+    hi: np.ndarray,
+    x0: Optional[np.ndarray] = None,
+    tol: float = 1e-12,
+    max_iter: int = 100
+) -> np.ndarray:
+    """
+    Row-wise root of decreasing functions bracketed by f(lo) >= 0 >= f(hi).
+    Newton steps that leave the bracket fall back to bisection; converged rows drop out of later iterations.
+    """
+    lo = np.array(lo, dtype=np.float64)
+    hi = np.array(hi, dtype=np.float64)
+    x = (lo + hi) / 2 if x0 is None else np.clip(np.asarray(x0, dtype=np.float64), lo, hi)
+    active = np.arange(x.size)
+
+    for _ in range(max_iter):
+        current = x[active]
+        f, df = fn(current, active)
+
+        above = f > 0  # Root lies to the right of x
+        lo[active[above]] = current[above]
+        hi[active[~above]] = current[~above]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = current - f / df
+        outside = ~np.isfinite(step) | (step <= lo[active]) | (step >= hi[active])
+        updated = np.where(outside, (lo[active] + hi[active]) / 2, step)
+        updated[f == 0] = current[f == 0]  # Exact root: the bracket collapsed onto it
+
+        x[active] = updated
+        done = (f == 0) | (np.abs(updated - current) <= tol * (1 + np.abs(updated)))
+        active = active[~done]
+        if active.size == 0:
+            break
+
+    return x
+
+
+def level_payment_irr(
+    payments: np.ndarray,
+    released: np.ndarray,
+    days: np.ndarray,
+    monthly_rates: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Annual effective rate i per row such that released = sum(payment / (1+i)^(d_j/365)).
+    All rows share the due-day offsets `days`; payments and released amounts are (m,) arrays.
+    The nominal monthly rates, when given, seed Newton close to the root.
+    """
+    payments = np.asarray(payments, dtype=np.float64)
+    released = np.asarray(released, dtype=np.float64)
+    t = np.asarray(days, dtype=np.float64) / DAYS_PER_YEAR
+    x0 = None if monthly_rates is None else 12 * np.log1p(np.asarray(monthly_rates, dtype=np.float64))
+
+    result = np.empty_like(payments)
+    chunk = max(1, CHUNK_ELEMENTS // max(t.size, 1))
+    for start in range(0, payments.size, chunk):
+        rows = slice(start, start + chunk)
+        result[rows] = _solve_chunk(payments[rows], released[rows], t, None if x0 is None else x0[rows])
+    return result
+
+
+def _solve_chunk(payments: np.ndarray, released: np.ndarray, t: np.ndarray, x0: Optional[np.ndarray]) -> np.ndarray:
+    # Solved for x = ln(1+i), on which the present value is smooth and convex
+    def present_value(x: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        discount = np.exp(-np.outer(x, t))
+        pv = discount.sum(axis=1) * payments[rows]
+        dpv = -(discount @ t) * payments[rows]
+        return pv - released[rows], dpv
+
+    # Total paid exceeds the released amount, so x = 0 is a lower bracket; widen the upper one as needed
+    lo = np.zeros_like(payments)
+    hi = np.full_like(payments, 2.0)
+    rows = np.arange(payments.size)
+    for _ in range(8):
+        f, _ = present_value(hi[rows], rows)
+        rows = rows[f > 0]
+        if rows.size == 0:
+            break
+        lo[rows] = hi[rows]
+        hi[rows] *= 2
+
+    return np.expm1(solve_decreasing(present_value, lo, hi, x0))
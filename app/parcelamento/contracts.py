@@ -0,0 +1,209 @@
+"""
+Installment contracts and the daily accrual job.
+Contracts are created from persisted simulations; the accrual job decodes the columnar
+schedules of whole chunks of open contracts into flat NumPy arrays and writes back in bulk.
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logger import logger, audit_log
+from app.core.utils import time_ordered_uuid
+from app.parcelamento.cet import due_day_offsets
+from app.parcelamento.models import ContractStatus, InstallmentContract, InstallmentSimulation
+from app.parcelamento.service import amortization_schedule, recalculate_simulation, stored_simulation_key
+
+# Storage layout of the columnar schedule fields
+OFFSET_DTYPE = np.dtype("<i4")
+AMOUNT_DTYPE = np.dtype("<f8")
+
+
+def create_contract(
+    db: Session,
+    simulation: InstallmentSimulation,
+    user_id: str,
+    correlation_id: str
+) -> InstallmentContract:
+    """
+    Contracts an accepted simulation, freezing its dated schedule.
+    Raises ValueError if the simulation is already contracted (also enforced by a unique constraint).
+    """
+    if db.query(InstallmentContract.id).filter(InstallmentContract.simulation_id == simulation.id).first():
+        raise ValueError("Simulation already contracted")
+
+    result = recalculate_simulation(simulation)
+    disbursed = date.fromisoformat(stored_simulation_key(simulation)[5])
+    schedule = amortization_schedule(result["financed_value"], simulation.installments, simulation.monthly_rate)
+
+    contract = InstallmentContract(
+        id=time_ordered_uuid(),
+        user_id=user_id,
+        simulation_id=simulation.id,
+        status=ContractStatus.OPEN,
+        value=simulation.value,
+        financed_value=result["financed_value"],
+        monthly_rate=simulation.monthly_rate,
+        installments=simulation.installments,
+        installment_value=result["installment"],
+        disbursement_date=disbursed,
+        due_offsets=due_day_offsets(disbursed, simulation.installments).astype(OFFSET_DTYPE).tobytes(),
+        principal=np.round(schedule["principal"], 2).astype(AMOUNT_DTYPE).tobytes(),
+        interest=np.round(schedule["interest"], 2).astype(AMOUNT_DTYPE).tobytes(),
+        paid_installments=0,
+        correlation_id=correlation_id
+    )
+
+    db.add(contract)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # Concurrent request contracted it between the check and the insert
+        raise ValueError("Simulation already contracted")
+    db.refresh(contract)
+
+    audit_log(
+        action="installment_contract_created",
+        user=user_id,
+        resource=f"contract_id={contract.id}",
+        details={"correlation_id": correlation_id, "simulation_id": simulation.id, "financed_value": contract.financed_value}
+    )
+
+    logger.info(f"Contract created: id={contract.id}, simulation_id={simulation.id}")
+
+    return contract
+
+
+def contract_schedule(contract: InstallmentContract) -> List[Dict[str, Any]]:
+    """Decodes the columnar schedule into rows, with the status as of the last accrual run."""
+    offsets = np.frombuffer(contract.due_offsets, dtype=OFFSET_DTYPE).tolist()
+    principal = np.frombuffer(contract.principal, dtype=AMOUNT_DTYPE).tolist()
+    interest = np.frombuffer(contract.interest, dtype=AMOUNT_DTYPE).tolist()
+    overdue_until = contract.paid_installments + contract.overdue_installments
+
+    rows: List[Dict[str, Any]] = []
+    for k, (offset, amortization, charge) in enumerate(zip(offsets, principal, interest)):
+        if k < contract.paid_installments:
+            status = "PAID"
+        elif k < overdue_until:
+            status = "OVERDUE"
+        else:
+            status = "OPEN"
+        rows.append({
+            "number": k + 1,
+            "due_date": (contract.disbursement_date + timedelta(days=offset)).isoformat(),
+            "installment": contract.installment_value,
+            "principal": amortization,
+            "interest": charge,
+            "status": status
+        })
+    return rows
+
+
+def run_accrual(db: Session, as_of: date, chunk_size: int = settings.CONTRACT_ACCRUAL_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Recomputes overdue installments, late fees and moratory interest of every open contract as of a date.
+
+    Each chunk (keyset-paginated by time-ordered ID) is processed as flat arrays: the schedules are
+    concatenated into one offsets array with an owner index per installment, overdue installments
+    are masked in one pass and aggregated per contract with `np.bincount`. Only contracts whose
+    figures changed are written, in a single executemany UPDATE per chunk. Runs are idempotent.
+    """
+    late_fee_rate = settings.CONTRACT_LATE_FEE_RATE
+    daily_rate = settings.CONTRACT_MORATORY_MONTHLY_RATE / 30
+    today = np.datetime64(as_of, "D")
+
+    stats: Dict[str, Any] = {
+        "as_of": as_of.isoformat(), "contracts": 0, "installments": 0, "updated": 0,
+        "overdue_contracts": 0, "overdue_installments": 0, "late_fee": 0.0, "moratory_interest": 0.0
+    }
+    last_id = ""
+
+    while True:
+        rows = db.execute(
+            select(
+                InstallmentContract.id,
+                InstallmentContract.disbursement_date,
+                InstallmentContract.installments,
+                InstallmentContract.paid_installments,
+                InstallmentContract.installment_value,
+                InstallmentContract.overdue_installments,
+                InstallmentContract.late_fee,
+                InstallmentContract.moratory_interest,
+                InstallmentContract.due_offsets
+            )
+            .where(InstallmentContract.status == ContractStatus.OPEN, InstallmentContract.id > last_id)
+            .order_by(InstallmentContract.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+
+        ids, disbursed, counts, paid, payments, prev_overdue, prev_fee, prev_moratory, blobs = zip(*rows)
+        m = len(rows)
+        counts_arr = np.fromiter(counts, dtype=np.int64, count=m)
+        paid_arr = np.fromiter(paid, dtype=np.int64, count=m)
+        payments_arr = np.fromiter(payments, dtype=np.float64, count=m)
+
+        # Flat view of every installment in the chunk
+        offsets = np.frombuffer(b"".join(blobs), dtype=OFFSET_DTYPE)
+        owner = np.repeat(np.arange(m), counts_arr)
+        number = np.arange(offsets.size) - np.repeat(np.cumsum(counts_arr) - counts_arr, counts_arr)
+        elapsed = (today - np.array(disbursed, dtype="datetime64[D]")).astype(np.int64)
+
+        days_late = elapsed[owner] - offsets
+        overdue = (number >= paid_arr[owner]) & (days_late > 0)
+        late_owner = owner[overdue]
+
+        overdue_count = np.bincount(late_owner, minlength=m)
+        overdue_amount = np.round(overdue_count * payments_arr, 2)
+        late_fee = np.round(overdue_amount * late_fee_rate, 2)
+        moratory = np.round(payments_arr * daily_rate * np.bincount(late_owner, weights=days_late[overdue], minlength=m), 2)
+
+        changed = np.flatnonzero(
+            (overdue_count != np.fromiter(prev_overdue, dtype=np.int64, count=m))
+            | (late_fee != np.fromiter(prev_fee, dtype=np.float64, count=m))
+            | (moratory != np.fromiter(prev_moratory, dtype=np.float64, count=m))
+        )
+        if changed.size:
+            db.execute(update(InstallmentContract), [
+                {
+                    "id": ids[k],
+                    "overdue_installments": count,
+                    "overdue_amount": amount,
+                    "late_fee": fee,
+                    "moratory_interest": interest
+                }
+                for k, count, amount, fee, interest in zip(
+                    changed.tolist(),
+                    overdue_count[changed].tolist(),
+                    overdue_amount[changed].tolist(),
+                    late_fee[changed].tolist(),
+                    moratory[changed].tolist()
+                )
+            ])
+            db.commit()
+
+        stats["contracts"] += m
+        stats["installments"] += int(offsets.size)
+        stats["updated"] += int(changed.size)
+        stats["overdue_contracts"] += int(np.count_nonzero(overdue_count))
+        stats["overdue_installments"] += int(overdue_count.sum())
+        stats["late_fee"] += float(late_fee.sum())
+        stats["moratory_interest"] += float(moratory.sum())
+        last_id = ids[-1]
+
+    stats["late_fee"] = round(stats["late_fee"], 2)
+    stats["moratory_interest"] = round(stats["moratory_interest"], 2)
+
+    audit_log(action="installment_accrual", user="system", resource=f"as_of={stats['as_of']}", details=stats)
+    logger.info(
+        f"Accrual completed: {stats['contracts']} contracts, {stats['overdue_installments']} overdue installments, "
+        f"{stats['updated']} updated"
+    )
+
+    return stats
@@ -0,0 +1,111 @@
+"""
+Inverse Price Table solvers for goal-seek simulations.
+Given a target installment, finds the maximum principal, the required monthly rate
+or the minimum term, vectorized over arrays of targets.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.parcelamento.cet import iof_rate, solve_decreasing
+
+MIN_MONTHLY_RATE = 1e-6
+MAX_MONTHLY_RATE = 0.15
+MAX_INSTALLMENTS = 360
+
+
+def payment_factor(installments: int, rates: np.ndarray) -> np.ndarray:
+    """Installment per unit of financed principal: i / (1 - (1+i)^-n)."""
+    return rates / -np.expm1(-installments * np.log1p(rates))
+
+
+def _gross_up(installments: int, rates: np.ndarray, include_iof: bool, days: Optional[np.ndarray]) -> np.ndarray:
+    # Financed principal per unit of (value + fees)
+    if not include_iof or days is None:
+        return np.ones_like(rates)
+    return 1 / (1 - iof_rate(installments, rates, days))
+
+
+def max_principal(
+    payments: np.ndarray,
+    installments: int,
+    rates: np.ndarray,
+    fees: float = 0.0,
+    include_iof: bool = False,
+    days: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Closed form: value = PMT / factor / gross_up - fees (NaN where fees are not covered)."""
+    rates = np.asarray(rates, dtype=np.float64)
+    values = np.asarray(payments, dtype=np.float64) / (
+        payment_factor(installments, rates) * _gross_up(installments, rates, include_iof, days)
+    ) - fees
+    return np.where(values > 0, values, np.nan)
+
+
+def required_rate(
+    values: np.ndarray,
+    installments: int,
+    payments: np.ndarray,
+    fees: float = 0.0,
+    include_iof: bool = False,
+    days: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Monthly rate at which the installment equals the target (NaN outside (0, 15%]).
+    The installment is increasing in the rate, so PMT - installment(i) is solved as a decreasing root;
+    Newton uses the analytic derivative of the annuity factor (IOF treated as locally constant).
+    """
+    principal = np.asarray(values, dtype=np.float64) + fees
+    payments = np.asarray(payments, dtype=np.float64)
+    n = installments
+
+    def gap(rates: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        growth = np.exp(-n * np.log1p(rates))  # (1+i)^-n
+        annuity = 1 - growth
+        factor = rates / annuity
+        dfactor = (annuity - rates * n * growth / (1 + rates)) / annuity ** 2
+        gross = _gross_up(n, rates, include_iof, days)
+        return payments[rows] - principal[rows] * factor * gross, -principal[rows] * dfactor * gross
+
+    lo = np.full_like(payments, MIN_MONTHLY_RATE)
+    hi = np.full_like(payments, MAX_MONTHLY_RATE)
+    rows = np.arange(payments.size)
+    feasible = (gap(lo, rows)[0] >= 0) & (gap(hi, rows)[0] <= 0)
+
+    rates = solve_decreasing(gap, lo, hi)
+    return np.where(feasible, rates, np.nan)
+
+
+def minimum_term(
+    values: np.ndarray,
+    rates: np.ndarray,
+    payments: np.ndarray,
+    fees: float = 0.0,
+    include_iof: bool = False,
+    days: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Shortest term whose installment does not exceed the target (0 where none up to 360 exists).
+    Closed form n = -ln(1 - PV*i/PMT) / ln(1+i), rounded up; with IOF the financed amount grows
+    with the term, so candidates are stepped forward until the installment fits.
+    """
+    principal = np.asarray(values, dtype=np.float64) + fees
+    rates = np.asarray(rates, dtype=np.float64)
+    payments = np.asarray(payments, dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exact = -np.log1p(-principal * rates / payments) / np.log1p(rates)
+    # Tolerance keeps exact integer solutions from being pushed up by rounding noise
+    terms = np.where(np.isfinite(exact) & (exact > 0), np.ceil(exact - 1e-9), MAX_INSTALLMENTS + 1).astype(np.int64)
+
+    if include_iof and days is not None:
+        for row in np.flatnonzero(terms <= MAX_INSTALLMENTS):
+            rate = rates[row:row + 1]
+            while terms[row] <= MAX_INSTALLMENTS:
+                n = int(terms[row])
+                installment = principal[row] * payment_factor(n, rate) * _gross_up(n, rate, True, days)
+                if installment[0] <= payments[row]:
+                    break
+                terms[row] += 1
+
+    return np.where(terms <= MAX_INSTALLMENTS, np.maximum(terms, 1), 0)
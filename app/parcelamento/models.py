@@ -2,10 +2,13 @@
 Data models for installment simulations.
 Persists historical data for audit and analytics.
 """
-from sqlalchemy import Integer, Float, String, DateTime, Text
+from sqlalchemy import Boolean, Date, Enum, Integer, Float, LargeBinary, String, DateTime, Text, false, text
 from sqlalchemy.orm import Mapped, mapped_column
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
+import enum
+from typing import Optional
 from app.core.database import Base
+from app.pix.models import get_enum_values
 
 
 class InstallmentSimulation(Base):
@@ -13,16 +16,97 @@ class InstallmentSimulation(Base):
 
     __tablename__ = "simulacoes_parcelamento"
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, index=True)  # Time-ordered UUID, assigned client-side
+    # Requesting user; only the owner can contract the simulation (legacy rows have none)
+    user_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
     value: Mapped[float] = mapped_column("valor", Float, nullable=False)
     installments: Mapped[int] = mapped_column("parcelas", Integer, nullable=False)
     monthly_rate: Mapped[float] = mapped_column("taxa_mensal", Float, nullable=False)
+    # Server defaults let the upgrade add these NOT NULL columns to populated tables
+    fees: Mapped[float] = mapped_column("tarifas", Float, nullable=False, default=0.0, server_default=text("0"))
+    include_iof: Mapped[bool] = mapped_column(
+        "inclui_iof", Boolean, nullable=False, default=False, server_default=false()
+    )
+    # Anchors due dates (CET day counts); legacy rows fall back to the creation date
+    disbursement_date: Mapped[Optional[date]] = mapped_column("data_liberacao", Date, nullable=True)
     installment_value: Mapped[float] = mapped_column("valor_parcela", Float, nullable=False)
     total_paid: Mapped[float] = mapped_column("total_pago", Float, nullable=False)
     annual_cet: Mapped[float] = mapped_column("cet_anual", Float, nullable=False)
-    amortization_table: Mapped[str] = mapped_column("tabela_amortizacao", Text, nullable=False)  # Serialized JSON
+    # Legacy serialized JSON schedule; new rows store only the parameters and regenerate it on read
+    amortization_table: Mapped[Optional[str]] = mapped_column("tabela_amortizacao", Text, nullable=True)
+    # SHA-256 of the normalized simulation parameters and owner; identical simulations of a user share one row
+    content_hash: Mapped[str] = mapped_column("hash_conteudo", String(64), index=True, nullable=True)
     created_at: Mapped[datetime] = mapped_column("criado_em", DateTime, default=lambda: datetime.now(timezone.utc))
     correlation_id: Mapped[str] = mapped_column(String(100), index=True, nullable=True)
 
     def __repr__(self):
         return f"<InstallmentSimulation(id={self.id}, value={self.value}, installments={self.installments})>"
+
+
+class InstallmentGridSimulation(Base):
+    """Summary of an offer-matrix simulation (a single row per grid request)."""
+
+    __tablename__ = "simulacoes_parcelamento_grade"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    values: Mapped[str] = mapped_column("valores", Text, nullable=False)  # Serialized JSON
+    installments: Mapped[str] = mapped_column("parcelas", Text, nullable=False)  # Serialized JSON
+    monthly_rates: Mapped[str] = mapped_column("taxas_mensais", Text, nullable=False)  # Serialized JSON
+    cells: Mapped[int] = mapped_column("celulas", Integer, nullable=False)
+    min_installment: Mapped[float] = mapped_column("menor_parcela", Float, nullable=False)
+    max_installment: Mapped[float] = mapped_column("maior_parcela", Float, nullable=False)
+    min_annual_cet: Mapped[float] = mapped_column("menor_cet_anual", Float, nullable=False)
+    max_annual_cet: Mapped[float] = mapped_column("maior_cet_anual", Float, nullable=False)
+    created_at: Mapped[datetime] = mapped_column("criado_em", DateTime, default=lambda: datetime.now(timezone.utc))
+    correlation_id: Mapped[str] = mapped_column(String(100), index=True, nullable=True)
+
+    def __repr__(self):
+        return f"<InstallmentGridSimulation(id={self.id}, cells={self.cells})>"
+
+
+class ContractStatus(str, enum.Enum):
+    """Lifecycle of an installment contract."""
+    OPEN = "ABERTO"
+    SETTLED = "QUITADO"
+
+
+class InstallmentContract(Base):
+    """
+    Loan contracted from an accepted simulation.
+    The schedule is stored columnar: one little-endian array per field (due-day offsets from
+    disbursement as int32, principal and interest as float64), so the accrual job can decode
+    whole chunks of contracts with a single `np.frombuffer`.
+    """
+
+    __tablename__ = "contratos_parcelamento"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, index=True)  # Time-ordered UUID
+    user_id: Mapped[str] = mapped_column(String(36), nullable=False, index=True)  # Foreign Key to User
+    simulation_id: Mapped[str] = mapped_column(String(36), nullable=False, unique=True, index=True)  # One contract each
+    status: Mapped[ContractStatus] = mapped_column(
+        "status",
+        Enum(ContractStatus, values_callable=get_enum_values),
+        nullable=False,
+        default=ContractStatus.OPEN,
+        index=True
+    )
+    value: Mapped[float] = mapped_column("valor", Float, nullable=False)
+    financed_value: Mapped[float] = mapped_column("valor_financiado", Float, nullable=False)
+    monthly_rate: Mapped[float] = mapped_column("taxa_mensal", Float, nullable=False)
+    installments: Mapped[int] = mapped_column("parcelas", Integer, nullable=False)
+    installment_value: Mapped[float] = mapped_column("valor_parcela", Float, nullable=False)
+    disbursement_date: Mapped[date] = mapped_column("data_liberacao", Date, nullable=False)
+    due_offsets: Mapped[bytes] = mapped_column("vencimentos", LargeBinary, nullable=False)  # int32[n], days
+    principal: Mapped[bytes] = mapped_column("amortizacoes", LargeBinary, nullable=False)  # float64[n]
+    interest: Mapped[bytes] = mapped_column("juros", LargeBinary, nullable=False)  # float64[n]
+    paid_installments: Mapped[int] = mapped_column("parcelas_pagas", Integer, nullable=False, default=0)
+    # Accrual state, recomputed from scratch by each run of the accrual job
+    overdue_installments: Mapped[int] = mapped_column("parcelas_em_atraso", Integer, nullable=False, default=0)
+    overdue_amount: Mapped[float] = mapped_column("valor_em_atraso", Float, nullable=False, default=0.0)
+    late_fee: Mapped[float] = mapped_column("multa", Float, nullable=False, default=0.0)
+    moratory_interest: Mapped[float] = mapped_column("juros_mora", Float, nullable=False, default=0.0)
+    created_at: Mapped[datetime] = mapped_column("criado_em", DateTime, default=lambda: datetime.now(timezone.utc))
+    correlation_id: Mapped[str] = mapped_column(String(100), index=True, nullable=True)
+
+    def __repr__(self):
+        return f"<InstallmentContract(id={self.id}, installments={self.installments}, status={self.status})>"
@@ -2,20 +2,38 @@
 FastAPI Router for installment simulation endpoints.
 Exposes RESTful API with strict validation and automated documentation.
 """
-import json
-from uuid import uuid4
 from typing import Any, Dict, List
 
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from app.parcelamento.schemas import SimulationRequest, SimulationResponse, AmortizationInstallment
-from app.parcelamento.service import calculate_installments, save_simulation
-from app.parcelamento.models import InstallmentSimulation
+from app.parcelamento.contracts import contract_schedule, create_contract
+from app.parcelamento.models import InstallmentContract
+from app.parcelamento.schemas import (
+    ContractCreateRequest,
+    ContractResponse,
+    GoalSeekRequest,
+    GoalSeekResponse,
+    GridSimulationRequest,
+    GridSimulationResponse,
+    SimulationRequest,
+    SimulationResponse
+)
+from app.parcelamento.service import (
+    calculate_grid,
+    calculate_installments,
+    get_simulation,
+    goal_seek,
+    load_amortization_table,
+    recalculate_simulation,
+    save_grid_simulation,
+    save_simulation
+)
 from app.core.database import get_db
-from app.core.logger import get_logger_with_correlation
+from app.core.responses import FastJSONResponse
+from app.core.logger import current_correlation_id, logger
 from app.auth.dependencies import require_active_account
-from app.auth.models import User
+from app.auth.cache import UserSnapshot
 
 router = APIRouter(tags=["Installments"])
 
@@ -24,9 +42,8 @@ router = APIRouter(tags=["Installments"])
 def simulate_installments(
     data: SimulationRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_active_account),
-    x_correlation_id: str = Header(default=None)
-) -> SimulationResponse:
+    current_user: UserSnapshot = Depends(require_active_account)
+) -> FastJSONResponse:
     """
     **Challenge 1: Installment Simulation Engine**
 
@@ -36,37 +53,44 @@ def simulate_installments(
     - **value**: Principal amount (R$)
     - **installments**: Number of installments (1-360)
     - **monthly_rate**: Monthly interest rate in decimal (e.g., 0.035 = 3.5%)
+    - **fees**: Upfront fees financed into the loan (R$, optional)
+    - **include_iof**: Finance IOF into the loan (optional)
+    - **disbursement_date**: Disbursement date anchoring due dates (optional, defaults to today)
 
     **Returns:**
     - Monthly installment value
     - Total payable amount
-    - Annualized CET (%)
+    - Annualized CET (%): IRR of the released amount against the dated installments
+    - Financed value and IOF
     - Full amortization schedule
     """
-    # Generate correlation_id for traceability
-    correlation_id = x_correlation_id or str(uuid4())
-    logger = get_logger_with_correlation(correlation_id)
+    correlation_id = current_correlation_id()
 
     try:
-        logger.info(f"Starting simulation: {data.model_dump()}")
+        logger.info(
+            "Starting simulation: value=%s installments=%s monthly_rate=%s", data.value, data.installments, data.monthly_rate,
+            extra={"value": data.value, "installments": data.installments, "monthly_rate": data.monthly_rate}
+        )
 
         # Installment calculation
         result: Dict[str, Any] = calculate_installments(data)
 
         # Persistence for audit
-        simulation = save_simulation(db, data, result, correlation_id)
-
-        # Conversion to response schema
-        response = SimulationResponse(
-            installment=result["installment"],
-            total_paid=result["total_paid"],
-            annual_cet=result["annual_cet"],
-            table=[AmortizationInstallment(**item) for item in result["table"]],
-            simulation_id=simulation.id,
-            created_at=simulation.created_at
-        )
+        simulation = save_simulation(db, data, result, correlation_id, current_user.id)
 
-        logger.info(f"Simulation completed successfully: id={simulation.id}")
+        # Rows are already validated numeric output; serialize without per-row model validation
+        response = FastJSONResponse(status_code=201, content={
+            "installment": result["installment"],
+            "total_paid": result["total_paid"],
+            "annual_cet": result["annual_cet"],
+            "financed_value": result["financed_value"],
+            "iof": result["iof"],
+            "table": result["table"],
+            "simulation_id": simulation.id,
+            "created_at": simulation.created_at.isoformat()
+        })
+
+        logger.info("Simulation completed successfully: id=%s", simulation.id, extra={"simulation_id": simulation.id})
         return response
 
     except Exception as e:
@@ -74,28 +98,193 @@ def simulate_installments(
         raise HTTPException(status_code=500, detail=f"Error processing simulation: {str(e)}")
 
 
+@router.post("/simulate/grid", response_model=GridSimulationResponse, status_code=201)
+def simulate_installments_grid(
+    data: GridSimulationRequest,
+    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(require_active_account)
+) -> FastJSONResponse:
+    """
+    Prices an offer matrix (principals x terms x rates) in a single request.
+    **Requires active account (at least one deposit made).**
+
+    - **values**: Principal amounts (R$)
+    - **installments**: Numbers of installments (1-360)
+    - **monthly_rates**: Monthly interest rates in decimal
+    - **fees**, **include_iof**, **disbursement_date**: Applied to every offer, as in `/simulate`
+
+    **Returns:**
+    - Installment and annualized CET matrices indexed as [value][installments][monthly_rate]
+    - ID of the single persisted summary record
+    """
+    correlation_id = current_correlation_id()
+
+    try:
+        result = calculate_grid(data)
+        grid = save_grid_simulation(db, data, result, correlation_id)
+
+        return FastJSONResponse(status_code=201, content={
+            "values": data.values,
+            "installments": data.installments,
+            "monthly_rates": data.monthly_rates,
+            "installment": result["installment"].tolist(),
+            "annual_cet": result["annual_cet"].tolist(),
+            "grid_id": grid.id,
+            "created_at": grid.created_at.isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"Grid simulation error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error processing grid simulation: {str(e)}")
+
+
+@router.post("/simulate/goal-seek", response_model=GoalSeekResponse, status_code=201)
+def simulate_goal_seek(
+    data: GoalSeekRequest,
+    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(require_active_account)
+) -> FastJSONResponse:
+    """
+    Inverse simulation from an affordable installment.
+    **Requires active account (at least one deposit made).**
+
+    - **mode**: `max_principal` (given installments and monthly_rate), `required_rate`
+      (given value and installments) or `min_term` (given value and monthly_rate)
+    - **target_installment**: Monthly installment the customer can pay (R$)
+
+    **Returns:**
+    - Solved value / monthly_rate / installments
+    - Full simulation for the solved parameters (installment never above the target)
+    """
+    correlation_id = current_correlation_id()
+
+    try:
+        request = goal_seek(data)
+    except ValueError as e:
+        logger.warning(f"Goal seek infeasible: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        result: Dict[str, Any] = calculate_installments(request)
+        simulation = save_simulation(db, request, result, correlation_id, current_user.id)
+
+        return FastJSONResponse(status_code=201, content={
+            "mode": data.mode.value,
+            "target_installment": data.target_installment,
+            "value": request.value,
+            "installments": request.installments,
+            "monthly_rate": request.monthly_rate,
+            "installment": result["installment"],
+            "total_paid": result["total_paid"],
+            "annual_cet": result["annual_cet"],
+            "financed_value": result["financed_value"],
+            "iof": result["iof"],
+            "table": result["table"],
+            "simulation_id": simulation.id,
+            "created_at": simulation.created_at.isoformat()
+        })
+
+    except Exception as e:
+        logger.error(f"Goal seek error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error processing goal seek: {str(e)}")
+
+
 @router.get("/history/{simulation_id}", response_model=SimulationResponse)
-def get_simulation(
-    simulation_id: int,
+def get_simulation_history(
+    simulation_id: str,
     db: Session = Depends(get_db)
-) -> SimulationResponse:
+) -> FastJSONResponse:
     """
     Retrieves simulation history by ID for audit purposes.
+    Simulations still in the write-behind buffer are served from memory.
     """
-    simulation = db.query(InstallmentSimulation).filter(
-        InstallmentSimulation.id == simulation_id
-    ).first()
+    simulation = get_simulation(db, simulation_id)
 
     if not simulation:
         raise HTTPException(status_code=404, detail="Simulation not found")
 
-    table_data: List[Dict[str, Any]] = json.loads(simulation.amortization_table)
+    table_data: List[Dict[str, Any]] = load_amortization_table(simulation)
+    result: Dict[str, Any] = recalculate_simulation(simulation)
+
+    return FastJSONResponse(content={
+        "installment": simulation.installment_value,
+        "total_paid": simulation.total_paid,
+        "annual_cet": simulation.annual_cet,
+        "financed_value": result["financed_value"],
+        "iof": result["iof"],
+        "table": table_data,
+        "simulation_id": simulation.id,
+        "created_at": simulation.created_at.isoformat()
+    })
+
+
+def _contract_content(contract: InstallmentContract) -> Dict[str, Any]:
+    return {
+        "contract_id": contract.id,
+        "simulation_id": contract.simulation_id,
+        "status": contract.status.value,
+        "value": contract.value,
+        "financed_value": contract.financed_value,
+        "monthly_rate": contract.monthly_rate,
+        "installments": contract.installments,
+        "installment_value": contract.installment_value,
+        "disbursement_date": contract.disbursement_date.isoformat(),
+        "paid_installments": contract.paid_installments,
+        "overdue_installments": contract.overdue_installments,
+        "overdue_amount": contract.overdue_amount,
+        "late_fee": contract.late_fee,
+        "moratory_interest": contract.moratory_interest,
+        "schedule": contract_schedule(contract),
+        "created_at": contract.created_at.isoformat()
+    }
+
+
+@router.post("/contracts", response_model=ContractResponse, status_code=201)
+def create_installment_contract(
+    data: ContractCreateRequest,
+    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(require_active_account)
+) -> FastJSONResponse:
+    """
+    Contracts an accepted simulation.
+    **Requires active account (at least one deposit made).**
+
+    Due dates follow the simulation's disbursement date; late fees and moratory
+    interest are accrued by the nightly job (`scripts/run_accrual.py`).
+    """
+    correlation_id = current_correlation_id()
+
+    simulation = get_simulation(db, data.simulation_id)
+    # Another user's simulation is indistinguishable from a missing one
+    if not simulation or simulation.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+
+    try:
+        contract = create_contract(db, simulation, current_user.id, correlation_id)
+        return FastJSONResponse(status_code=201, content=_contract_content(contract))
+
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Contract error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error creating contract: {str(e)}")
+
+
+@router.get("/contracts/{contract_id}", response_model=ContractResponse)
+def get_installment_contract(
+    contract_id: str,
+    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(require_active_account)
+) -> FastJSONResponse:
+    """
+    Retrieves a contract of the current user with its schedule and accrued charges.
+    """
+    contract = db.query(InstallmentContract).filter(
+        InstallmentContract.id == contract_id,
+        InstallmentContract.user_id == current_user.id
+    ).first()
+
+    if not contract:
+        raise HTTPException(status_code=404, detail="Contract not found")
 
-    return SimulationResponse(
-        installment=simulation.installment_value,
-        total_paid=simulation.total_paid,
-        annual_cet=simulation.annual_cet,
-        table=[AmortizationInstallment(**item) for item in table_data],
-        simulation_id=simulation.id,
-        created_at=simulation.created_at
-    )
+    return FastJSONResponse(content=_contract_content(contract))
@@ -2,9 +2,11 @@
 Pydantic schemas for input/output validation.
 Enforces strict type checking and boundary constraints.
 """
-from pydantic import BaseModel, Field, field_validator, ConfigDict
-from typing import List
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator, model_validator, ConfigDict
+from typing import Annotated, List, Optional
+from datetime import date, datetime
+from enum import Enum
+from app.core.config import settings
 
 
 class AmortizationInstallment(BaseModel):
@@ -21,6 +23,9 @@ class SimulationRequest(BaseModel):
     value: float = Field(..., gt=0, le=1000000, description="Principal amount")
     installments: int = Field(..., ge=1, le=360, description="Number of installments")
     monthly_rate: float = Field(..., gt=0, le=0.15, description="Monthly interest rate (decimal)")
+    fees: float = Field(0.0, ge=0, le=100000, description="Upfront fees financed into the loan (R$)")
+    include_iof: bool = Field(False, description="Finance IOF (0.38% + 0.0082% per day, up to 365 days)")
+    disbursement_date: Optional[date] = Field(None, description="Disbursement date (defaults to today)")
 
     @field_validator('monthly_rate')
     @classmethod
@@ -35,8 +40,122 @@ class SimulationResponse(BaseModel):
     installment: float = Field(..., description="Monthly installment value")
     total_paid: float = Field(..., description="Total payable amount")
     annual_cet: float = Field(..., description="Annualized Total Effective Cost (%)")
+    financed_value: float = Field(..., description="Principal plus financed fees and IOF")
+    iof: float = Field(..., description="Financed IOF amount")
     table: List[AmortizationInstallment] = Field(..., description="Full amortization schedule")
-    simulation_id: int = Field(..., description="Persisted simulation ID")
+    simulation_id: str = Field(..., description="Persisted simulation ID")
     created_at: datetime = Field(..., description="Simulation timestamp")
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class GoalSeekMode(str, Enum):
+    """Parameter solved for in a goal-seek simulation."""
+    MAX_PRINCIPAL = "max_principal"
+    REQUIRED_RATE = "required_rate"
+    MIN_TERM = "min_term"
+
+
+# Parameters each mode requires (the remaining one is solved for)
+GOAL_SEEK_INPUTS = {
+    GoalSeekMode.MAX_PRINCIPAL: ("installments", "monthly_rate"),
+    GoalSeekMode.REQUIRED_RATE: ("value", "installments"),
+    GoalSeekMode.MIN_TERM: ("value", "monthly_rate"),
+}
+
+
+class GoalSeekRequest(BaseModel):
+    """Inverse simulation: starts from the installment the customer can afford."""
+    mode: GoalSeekMode = Field(..., description="Parameter to solve for")
+    target_installment: float = Field(..., gt=0, le=1000000, description="Affordable monthly installment (R$)")
+    value: Optional[float] = Field(None, gt=0, le=1000000, description="Principal amount")
+    installments: Optional[int] = Field(None, ge=1, le=360, description="Number of installments")
+    monthly_rate: Optional[float] = Field(None, gt=0, le=0.15, description="Monthly interest rate (decimal)")
+    fees: float = Field(0.0, ge=0, le=100000, description="Upfront fees financed into the loan (R$)")
+    include_iof: bool = Field(False, description="Finance IOF (0.38% + 0.0082% per day, up to 365 days)")
+    disbursement_date: Optional[date] = Field(None, description="Disbursement date (defaults to today)")
+
+    @model_validator(mode="after")
+    def validate_inputs(self) -> "GoalSeekRequest":
+        missing = [name for name in GOAL_SEEK_INPUTS[self.mode] if getattr(self, name) is None]
+        if missing:
+            raise ValueError(f"Mode {self.mode.value} requires: {', '.join(missing)}")
+        return self
+
+
+class GoalSeekResponse(SimulationResponse):
+    """Simulation for the solved parameters."""
+    mode: GoalSeekMode
+    target_installment: float
+    value: float = Field(..., description="Principal amount (solved for max_principal)")
+    installments: int = Field(..., description="Number of installments (solved for min_term)")
+    monthly_rate: float = Field(..., description="Monthly interest rate (solved for required_rate)")
+
+
+class GridSimulationRequest(BaseModel):
+    """Offer matrix request: every combination of principal x term x rate is priced."""
+    values: List[Annotated[float, Field(gt=0, le=1000000)]] = Field(
+        ..., min_length=1, max_length=1000, description="Principal amounts"
+    )
+    installments: List[Annotated[int, Field(ge=1, le=360)]] = Field(
+        ..., min_length=1, max_length=360, description="Numbers of installments"
+    )
+    monthly_rates: List[Annotated[float, Field(gt=0, le=0.15)]] = Field(
+        ..., min_length=1, max_length=200, description="Monthly interest rates (decimal)"
+    )
+    fees: float = Field(0.0, ge=0, le=100000, description="Upfront fees financed into every offer (R$)")
+    include_iof: bool = Field(False, description="Finance IOF (0.38% + 0.0082% per day, up to 365 days)")
+    disbursement_date: Optional[date] = Field(None, description="Disbursement date (defaults to today)")
+
+    @model_validator(mode="after")
+    def validate_grid_size(self) -> "GridSimulationRequest":
+        cells = len(self.values) * len(self.installments) * len(self.monthly_rates)
+        if cells > settings.INSTALLMENT_GRID_MAX_CELLS:
+            raise ValueError(f"Grid too large: {cells} cells (max {settings.INSTALLMENT_GRID_MAX_CELLS})")
+        return self
+
+
+class GridSimulationResponse(BaseModel):
+    """Offer matrix result, indexed as [value][installments][monthly_rate]."""
+    values: List[float]
+    installments: List[int]
+    monthly_rates: List[float]
+    installment: List[List[List[float]]] = Field(..., description="Monthly installment per cell")
+    annual_cet: List[List[List[float]]] = Field(..., description="Annualized CET (%) per cell")
+    grid_id: int = Field(..., description="Persisted grid summary ID")
+    created_at: datetime = Field(..., description="Simulation timestamp")
+
+
+class ContractCreateRequest(BaseModel):
+    """Accepts a persisted simulation as a loan contract."""
+    simulation_id: str = Field(..., min_length=1, max_length=36, description="Accepted simulation ID")
+
+
+class ContractInstallment(BaseModel):
+    """A dated installment of a contract."""
+    number: int
+    due_date: date
+    installment: float
+    principal: float
+    interest: float
+    status: str = Field(..., description="PAID, OVERDUE or OPEN (as of the last accrual run)")
+
+
+class ContractResponse(BaseModel):
+    """Installment contract with its schedule and accrued charges."""
+    contract_id: str
+    simulation_id: str
+    status: str
+    value: float
+    financed_value: float
+    monthly_rate: float
+    installments: int
+    installment_value: float
+    disbursement_date: date
+    paid_installments: int
+    overdue_installments: int
+    overdue_amount: float
+    late_fee: float
+    moratory_interest: float
+    schedule: List[ContractInstallment]
+    created_at: datetime
@@ -2,54 +2,153 @@
 Business logic for installment calculation.
 Implements Price Table (compound interest) and Total Effective Cost (CET) algorithms.
 """
+import hashlib
 import json
-from typing import Dict, Any, List
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
-from app.parcelamento.models import InstallmentSimulation
-from app.parcelamento.schemas import SimulationRequest
+from app.parcelamento.cet import due_day_offsets, iof_rate, level_payment_irr
+from app.parcelamento.goal_seek import MAX_INSTALLMENTS, max_principal, minimum_term, required_rate
+from app.parcelamento.models import InstallmentContract, InstallmentGridSimulation, InstallmentSimulation
+from app.parcelamento.schemas import GoalSeekMode, GoalSeekRequest, GridSimulationRequest, SimulationRequest
+from app.parcelamento.writer import simulation_writer
+from app.core.config import settings
 from app.core.logger import logger, audit_log
+from app.core.utils import BRASILIA_TZ, process_pool_context, time_ordered_uuid, to_brasilia_time
 
+# Interval between database lookups for a simulation written behind by another worker
+SIMULATION_POLL_SECONDS = 0.05
 
-def calculate_installments(data: SimulationRequest) -> Dict[str, Any]:
+# The catalog is warmed for the next day this long before midnight in Brasília
+CATALOG_REWARM_LEAD_SECONDS = 60.0
+_rewarm_timer: Optional[threading.Timer] = None
+
+# Lazily created pool for offer matrices above INSTALLMENT_GRID_PARALLEL_CELLS
+_grid_pool: Optional[ProcessPoolExecutor] = None
+_grid_pool_lock = threading.Lock()
+
+
+def amortization_schedule(value: float, installments: int, rate: float) -> Dict[str, Any]:
     """
-    Calculates amortization schedule using the Price Table method.
-    Returns monthly installment, total payable amount, annualized CET, and detailed amortization breakdown.
+    Closed-form Price Table schedule computed in one vectorized pass.
 
-    Formula: PMT = PV * [(1+i)^n * i] / [(1+i)^n - 1]
+    With G = 1 + i, the outstanding balance after month k is
+    B_k = PV * (1 - G^(k-n)) / (1 - G^-n), evaluated with expm1/log1p on negative
+    exponents to stay accurate for long terms and high rates.
     """
-    value = data.value
-    installments = data.installments
-    rate = data.monthly_rate
+    log_growth = np.log1p(rate)
+    months = np.arange(1, installments + 1, dtype=np.float64)
+
+    annuity = -np.expm1(-installments * log_growth)  # 1 - G^-n
+    installment = value * rate / annuity
+
+    balance = value * -np.expm1((months - installments) * log_growth) / annuity
+    previous_balance = np.empty_like(balance)
+    previous_balance[0] = value
+    previous_balance[1:] = balance[:-1]
+
+    interest = previous_balance * rate
+    principal = installment - interest
+
+    # Avoid negative balance due to floating point rounding
+    balance[balance < 0.01] = 0.0
+
+    return {
+        "installment": float(installment),
+        "interest": interest,
+        "principal": principal,
+        "balance": balance
+    }
+
+
+def schedule_rows(schedule: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Converts schedule arrays into JSON-ready amortization rows (rounded to cents)."""
+    installment = round(schedule["installment"], 2)
+    return [
+        {"month": month, "installment": installment, "interest": interest, "principal": principal, "balance": balance}
+        for month, (interest, principal, balance) in enumerate(
+            zip(
+                np.round(schedule["interest"], 2).tolist(),
+                np.round(schedule["principal"], 2).tolist(),
+                np.round(schedule["balance"], 2).tolist()
+            ),
+            start=1
+        )
+    ]
 
-    # Installment calculation (Price Table)
-    factor = (1 + rate) ** installments
-    installment = value * (rate * factor) / (factor - 1)
 
-    # Amortization schedule generation
-    amortization: List[Dict[str, Any]] = []
-    balance = value
+# Normalized simulation identity:
+# (value in cents precision, installments, rate, fees, include_iof, ISO disbursement date)
+SimulationKey = Tuple[float, int, float, float, bool, str]
 
-    for i in range(installments):
-        interest = balance * rate
-        principal = installment - interest
-        balance -= principal
 
-        # Avoid negative balance due to floating point rounding
-        if balance < 0.01:
-            balance = 0
+def disbursement_date(requested: Optional[date]) -> date:
+    """Requested disbursement date, defaulting to today in Brasília."""
+    return requested or to_brasilia_time(datetime.now(timezone.utc)).date()
 
-        amortization.append({
-            "month": i + 1,
-            "installment": round(installment, 2),
-            "interest": round(interest, 2),
-            "principal": round(principal, 2),
-            "balance": round(balance, 2)
-        })
 
-    # CET (Total Effective Cost) calculation - Annualized
+def simulation_key(data: SimulationRequest) -> SimulationKey:
+    """Normalizes a request so equivalent simulations share cache entries and persisted rows."""
+    return (
+        round(data.value, 2),
+        data.installments,
+        round(data.monthly_rate, 6),
+        round(data.fees, 2),
+        data.include_iof,
+        disbursement_date(data.disbursement_date).isoformat()
+    )
+
+
+def stored_simulation_key(simulation: InstallmentSimulation) -> SimulationKey:
+    """Simulation key of a persisted row (legacy rows are anchored on their creation date)."""
+    disbursed = simulation.disbursement_date or simulation.created_at.date()
+    return (
+        round(simulation.value, 2),
+        simulation.installments,
+        round(simulation.monthly_rate, 6),
+        round(simulation.fees or 0.0, 2),
+        bool(simulation.include_iof),
+        disbursed.isoformat()
+    )
+
+
+def simulation_hash(key: SimulationKey, user_id: Optional[str] = None) -> str:
+    """Content address of a simulation (SHA-256 of its normalized key and owner)."""
+    value, installments, rate, fees, include_iof, disbursed = key
+    content = f"{value:.2f}|{installments}|{rate:.6f}|{fees:.2f}|{int(include_iof)}|{disbursed}"
+    if user_id:
+        content += f"|{user_id}"
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+@lru_cache(maxsize=settings.INSTALLMENT_CACHE_SIZE)
+def _calculate(
+    value: float,
+    installments: int,
+    rate: float,
+    fees: float = 0.0,
+    include_iof: bool = False,
+    disbursed: Optional[str] = None
+) -> Dict[str, Any]:
+    days = due_day_offsets(disbursement_date(date.fromisoformat(disbursed) if disbursed else None), installments)
+
+    # Fees and IOF are financed: the customer receives `value` and repays the grossed-up principal
+    iof = float(iof_rate(installments, np.array([rate]), days)[0]) if include_iof else 0.0
+    financed = (value + fees) / (1 - iof)
+
+    # Installment calculation and amortization schedule (Price Table)
+    schedule = amortization_schedule(financed, installments, rate)
+    installment = schedule["installment"]
     total_paid = installment * installments
-    monthly_cet = (total_paid / value) ** (1 / installments) - 1
-    annual_cet = ((1 + monthly_cet) ** 12 - 1) * 100
+
+    # CET (Total Effective Cost): annual IRR of the released amount against the dated installments
+    annual_cet = float(level_payment_irr(np.array([installment]), np.array([value]), days, np.array([rate]))[0]) * 100
 
     logger.info(f"Simulation calculated: value={value}, installments={installments}, installment={round(installment, 2)}")
 
@@ -57,33 +156,162 @@ def calculate_installments(data: SimulationRequest) -> Dict[str, Any]:
         "installment": round(installment, 2),
         "total_paid": round(total_paid, 2),
         "annual_cet": round(annual_cet, 2),
-        "table": amortization
+        "financed_value": round(financed, 2),
+        "iof": round(financed * iof, 2),
+        "table": schedule_rows(schedule)
     }
 
 
+def calculate_installments(data: SimulationRequest) -> Dict[str, Any]:
+    """
+    Calculates amortization schedule using the Price Table method.
+    Returns monthly installment, total payable amount, annualized CET, financed value and IOF,
+    and detailed amortization breakdown.
+    Results are memoized per normalized request (bounded LRU) and shared: treat them as read-only.
+
+    Formula: PMT = PV * [(1+i)^n * i] / [(1+i)^n - 1]
+    """
+    return _calculate(*simulation_key(data))
+
+
+def goal_seek(data: GoalSeekRequest) -> SimulationRequest:
+    """
+    Solves the parameter missing from a goal-seek request and returns the equivalent simulation.
+    Solutions are rounded in the customer's favor (principal down to cents, rate down to 1e-6,
+    term up) so the resulting installment never exceeds the target.
+    """
+    target = np.array([data.target_installment])
+    days = due_day_offsets(disbursement_date(data.disbursement_date), MAX_INSTALLMENTS)
+    options = {"fees": data.fees, "include_iof": data.include_iof, "days": days}
+    params = {"value": data.value, "installments": data.installments, "monthly_rate": data.monthly_rate}
+
+    if data.mode == GoalSeekMode.MAX_PRINCIPAL:
+        value = float(max_principal(target, data.installments, np.array([data.monthly_rate]), **options)[0])
+        if not np.isfinite(value) or value < 0.01:
+            raise ValueError("Target installment does not cover the financed fees")
+        params["value"] = min(float(np.floor(value * 100)) / 100, 1000000.0)
+
+    elif data.mode == GoalSeekMode.REQUIRED_RATE:
+        rate = float(required_rate(np.array([data.value]), data.installments, target, **options)[0])
+        if not np.isfinite(rate):
+            raise ValueError("Target installment requires a monthly rate outside (0%, 15%]")
+        params["monthly_rate"] = max(float(np.floor(rate * 1e6)) / 1e6, 1e-6)
+
+    else:
+        term = int(minimum_term(np.array([data.value]), np.array([data.monthly_rate]), target, **options)[0])
+        if term == 0:
+            raise ValueError(f"Target installment cannot repay the loan within {MAX_INSTALLMENTS} installments")
+        params["installments"] = term
+
+    logger.info(f"Goal seek solved: mode={data.mode.value}, target={data.target_installment}, params={params}")
+
+    return SimulationRequest(
+        **params, fees=data.fees, include_iof=data.include_iof, disbursement_date=data.disbursement_date
+    )
+
+
+def warm_simulation_cache(day: Optional[date] = None) -> int:
+    """
+    Pre-computes the standard product catalog (INSTALLMENT_PRODUCT_CATALOG) for disbursement on `day`
+    (default: today in Brasília). Cache keys include the disbursement date, so a warm-up only serves
+    requests of that day; `schedule_catalog_rewarm` repeats it for each following day.
+    """
+    for product in settings.INSTALLMENT_PRODUCT_CATALOG:
+        calculate_installments(SimulationRequest(**{"disbursement_date": day, **product}))
+
+    logger.info(f"Simulation cache warmed: {len(settings.INSTALLMENT_PRODUCT_CATALOG)} products for {disbursement_date(day)}")
+    return len(settings.INSTALLMENT_PRODUCT_CATALOG)
+
+
+def next_catalog_rewarm(after: datetime) -> Tuple[datetime, date]:
+    """When to warm the catalog next (shortly before the midnight following `after`) and for which day."""
+    local = to_brasilia_time(after)
+    midnight = (local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight - timedelta(seconds=CATALOG_REWARM_LEAD_SECONDS), midnight.date()
+
+
+def schedule_catalog_rewarm(after: Optional[datetime] = None) -> None:
+    """Keeps the catalog warm across days: warms the next day's keys before each midnight (startup hook)."""
+    global _rewarm_timer
+    if not settings.INSTALLMENT_PRODUCT_CATALOG:
+        return
+    at, day = next_catalog_rewarm(after or datetime.now(timezone.utc))
+    delay = max(0.0, (at - datetime.now(timezone.utc)).total_seconds())
+    _rewarm_timer = threading.Timer(delay, _rewarm_catalog, args=(day,))
+    _rewarm_timer.daemon = True
+    _rewarm_timer.start()
+
+
+def _rewarm_catalog(day: date) -> None:
+    try:
+        warm_simulation_cache(day)
+    except Exception as e:
+        logger.error(f"Simulation cache re-warm failed: {str(e)}")
+    schedule_catalog_rewarm(after=datetime.combine(day, datetime.min.time(), tzinfo=BRASILIA_TZ))
+
+
+def stop_catalog_rewarm() -> None:
+    """Cancels the pending catalog re-warm (application shutdown hook)."""
+    global _rewarm_timer
+    if _rewarm_timer is not None:
+        _rewarm_timer.cancel()
+        _rewarm_timer = None
+
+
 def save_simulation(
     db: Session,
     data: SimulationRequest,
     result: Dict[str, Any],
-    correlation_id: str
+    correlation_id: str,
+    user_id: Optional[str] = None
 ) -> InstallmentSimulation:
     """
     Persists simulation results for audit trails and historical analysis.
+    Simulations are content-addressed per user: an identical pending or persisted simulation of the same
+    user is reused instead of duplicated, unless it is already contracted (one contract per simulation).
+    New records get a client-side time-ordered ID and are written behind by `simulation_writer`.
     """
+    key = simulation_key(data)
+    content_hash = simulation_hash(key, user_id)
+
+    contracted = exists().where(InstallmentContract.simulation_id == InstallmentSimulation.id)
+    existing = simulation_writer.find_by_hash(content_hash)
+    if existing is not None and db.query(exists().where(InstallmentContract.simulation_id == existing.id)).scalar():
+        existing = None
+    if existing is None:
+        existing = db.query(InstallmentSimulation).filter(
+            InstallmentSimulation.content_hash == content_hash, ~contracted
+        ).first()
+
+    if existing:
+        audit_log(
+            action="installment_simulation_reused",
+            user="system",
+            resource=f"simulation_id={existing.id}",
+            details={"correlation_id": correlation_id, "value": data.value, "installments": data.installments}
+        )
+        logger.info(f"Simulation reused: id={existing.id}")
+        return existing
+
     simulation = InstallmentSimulation(
+        id=time_ordered_uuid(),
+        user_id=user_id,
         value=data.value,
         installments=data.installments,
         monthly_rate=data.monthly_rate,
+        fees=data.fees,
+        include_iof=data.include_iof,
+        disbursement_date=date.fromisoformat(key[5]),
         installment_value=result["installment"],
         total_paid=result["total_paid"],
         annual_cet=result["annual_cet"],
-        amortization_table=json.dumps(result["table"]),
+        amortization_table=None,  # Pure function of the parameters; regenerated on read
+        content_hash=content_hash,
+        created_at=datetime.now(timezone.utc),
         correlation_id=correlation_id
     )
 
-    db.add(simulation)
-    db.commit()
-    db.refresh(simulation)
+    simulation_writer.enqueue(simulation)
 
     audit_log(
         action="installment_simulation",
@@ -92,6 +320,161 @@ def save_simulation(
         details={"correlation_id": correlation_id, "value": data.value, "installments": data.installments}
     )
 
-    logger.info(f"Simulation persisted: id={simulation.id}")
+    logger.info(f"Simulation queued for persistence: id={simulation.id}")
+
+    return simulation
+
 
+def get_simulation(db: Session, simulation_id: str) -> Optional[InstallmentSimulation]:
+    """
+    Looks up a simulation, including records still waiting in the write-behind buffer.
+    A recent ID missing everywhere may be pending in another worker's buffer: the database is polled
+    until that worker's flush is due (`SimulationWriter.visible_by`).
+    """
+    simulation = simulation_writer.get(simulation_id) or _find_simulation(db, simulation_id)
+    deadline = simulation_writer.visible_by(simulation_id) if simulation is None else None
+    while simulation is None and deadline is not None and time.time() < deadline:
+        time.sleep(SIMULATION_POLL_SECONDS)
+        simulation = simulation_writer.get(simulation_id) or _find_simulation(db, simulation_id)
     return simulation
+
+
+def _find_simulation(db: Session, simulation_id: str) -> Optional[InstallmentSimulation]:
+    return db.query(InstallmentSimulation).filter(InstallmentSimulation.id == simulation_id).first()
+
+
+def recalculate_simulation(simulation: InstallmentSimulation) -> Dict[str, Any]:
+    """Regenerates the full result of a persisted simulation through the memoized calculation."""
+    return _calculate(*stored_simulation_key(simulation))
+
+
+def load_amortization_table(simulation: InstallmentSimulation) -> List[Dict[str, Any]]:
+    """
+    Returns the amortization rows of a persisted simulation.
+    Legacy rows carry a serialized table; newer rows are regenerated from their parameters.
+    """
+    if simulation.amortization_table:
+        table: List[Dict[str, Any]] = json.loads(simulation.amortization_table)
+        return table
+
+    return recalculate_simulation(simulation)["table"]
+
+
+def _grid_block(
+    values: np.ndarray,
+    terms: np.ndarray,
+    rates: np.ndarray,
+    fees: float,
+    include_iof: bool,
+    days: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Prices a (values x terms x rates) block, one term at a time.
+    Returns unrounded installment and annual CET (%) arrays of that shape.
+
+    Without fees the installment/principal ratio does not depend on the principal, so the
+    CET is solved once per (term, rate) and broadcast along the values axis.
+    """
+    log_growth = np.log1p(rates)
+    installment = np.empty((values.size, terms.size, rates.size))
+    annual_cet = np.empty_like(installment)
+
+    for k, n in enumerate(terms.astype(np.int64)):
+        factor = rates / -np.expm1(-n * log_growth)  # PMT per unit of financed principal
+        if include_iof:
+            factor = factor / (1 - iof_rate(n, rates, days))
+        installment[:, k, :] = (values[:, None] + fees) * factor
+
+        if fees == 0:
+            annual_cet[:, k, :] = level_payment_irr(factor, np.ones_like(rates), days[:n], rates)
+        else:
+            annual_cet[:, k, :] = level_payment_irr(
+                installment[:, k, :].ravel(), np.repeat(values, rates.size), days[:n], np.tile(rates, values.size)
+            ).reshape(values.size, rates.size)
+
+    return installment, annual_cet * 100
+
+
+def _get_grid_pool() -> ProcessPoolExecutor:
+    global _grid_pool
+    with _grid_pool_lock:
+        if _grid_pool is None:
+            _grid_pool = ProcessPoolExecutor(max_workers=settings.INSTALLMENT_GRID_WORKERS, mp_context=process_pool_context())
+        return _grid_pool
+
+
+def shutdown_grid_pool() -> None:
+    """Releases the offer-matrix worker processes (application shutdown hook)."""
+    global _grid_pool
+    with _grid_pool_lock:
+        pool, _grid_pool = _grid_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def calculate_grid(data: GridSimulationRequest) -> Dict[str, np.ndarray]:
+    """
+    Prices every principal x term x rate combination of an offer matrix.
+    Large grids are split along the principal axis and priced across a process pool.
+    """
+    values = np.asarray(data.values, dtype=np.float64)
+    terms = np.asarray(data.installments, dtype=np.float64)
+    rates = np.asarray(data.monthly_rates, dtype=np.float64)
+    cells = values.size * terms.size * rates.size
+    days = due_day_offsets(disbursement_date(data.disbursement_date), int(terms.max()))
+    options = (data.fees, data.include_iof, days)
+
+    workers = min(settings.INSTALLMENT_GRID_WORKERS, values.size)
+    if cells >= settings.INSTALLMENT_GRID_PARALLEL_CELLS and workers > 1:
+        blocks = np.array_split(values, workers)
+        results = list(_get_grid_pool().map(
+            _grid_block, blocks, [terms] * workers, [rates] * workers, *([option] * workers for option in options)
+        ))
+        installment = np.concatenate([r[0] for r in results], axis=0)
+        annual_cet = np.concatenate([r[1] for r in results], axis=0)
+    else:
+        installment, annual_cet = _grid_block(values, terms, rates, *options)
+
+    logger.info(f"Grid calculated: {values.size}x{terms.size}x{rates.size} ({cells} cells)")
+
+    return {
+        "installment": np.round(installment, 2),
+        "annual_cet": np.round(annual_cet, 2)
+    }
+
+
+def save_grid_simulation(
+    db: Session,
+    data: GridSimulationRequest,
+    result: Dict[str, np.ndarray],
+    correlation_id: str
+) -> InstallmentGridSimulation:
+    """
+    Persists a single summary record for the whole offer matrix.
+    """
+    grid = InstallmentGridSimulation(
+        values=json.dumps(data.values),
+        installments=json.dumps(data.installments),
+        monthly_rates=json.dumps(data.monthly_rates),
+        cells=int(result["installment"].size),
+        min_installment=float(result["installment"].min()),
+        max_installment=float(result["installment"].max()),
+        min_annual_cet=float(result["annual_cet"].min()),
+        max_annual_cet=float(result["annual_cet"].max()),
+        correlation_id=correlation_id
+    )
+
+    db.add(grid)
+    db.commit()
+    db.refresh(grid)
+
+    audit_log(
+        action="installment_grid_simulation",
+        user="system",
+        resource=f"grid_id={grid.id}",
+        details={"correlation_id": correlation_id, "cells": grid.cells}
+    )
+
+    logger.info(f"Grid simulation persisted: id={grid.id}")
+
+    return grid
@@ -0,0 +1,219 @@
+"""
+Write-behind persistence for installment simulations.
+Records are buffered in memory and flushed by a background worker in batched multi-row inserts.
+"""
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.logger import logger
+from app.parcelamento.models import InstallmentSimulation
+
+# Columns copied from a pending simulation into the bulk INSERT parameters
+_COLUMNS = [column.key for column in InstallmentSimulation.__mapper__.column_attrs]
+
+
+class SimulationWriter:
+    """
+    Buffers simulations (with client-assigned IDs) and inserts them in batches.
+
+    - The worker flushes every `interval` seconds, or sooner once `batch_size` records are pending
+    - Pending records stay readable (`get`, `find_by_hash`) until their batch commits (read-your-writes);
+      other workers wait for them up to `visible_by` (see `get_simulation`)
+    - Above `max_pending` the caller flushes synchronously unless a flush is already running; at twice
+      that (database down) the caller inserts its own record, so the buffer stays bounded
+    - A batch rejected for its data (DataError/IntegrityError) is retried row by row and the rows that
+      still fail are quarantined to the error log; any other failure keeps the batch for the next cycle
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        batch_size: int = 500,
+        interval: float = 1.0,
+        max_pending: int = 10000
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+
+        self._pending: Dict[str, InstallmentSimulation] = {}  # Insertion-ordered by ID
+        self._by_hash: Dict[str, str] = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.written = 0
+        self.failed_batches = 0
+        self.quarantined = 0
+
+    def enqueue(self, simulation: InstallmentSimulation) -> None:
+        """Schedules a fully populated simulation (ID and created_at already set) for insertion."""
+        with self._cond:
+            overflow = len(self._pending) >= 2 * self.max_pending
+            if not overflow:
+                self._pending[simulation.id] = simulation
+                if simulation.content_hash:
+                    self._by_hash[simulation.content_hash] = simulation.id
+            pending = len(self._pending)
+            if pending >= self.batch_size:
+                self._cond.notify()
+            if self._worker is None and not self._stopping:
+                self._worker = threading.Thread(target=self._run, name="simulation-writer", daemon=True)
+                self._worker.start()
+
+        if overflow:
+            # Write-through: a failure here only fails the request that owns the record
+            logger.warning("Simulation write buffer full (%d pending); writing id=%s inline", pending, simulation.id)
+            self._insert([simulation])
+            self.written += 1
+        elif pending >= self.max_pending:
+            logger.warning("Simulation write buffer full (%d pending); flushing inline", pending)
+            try:
+                self.flush(blocking=False)
+            except Exception as e:
+                logger.error(f"Inline simulation flush failed: {str(e)}")
+
+    def get(self, simulation_id: str) -> Optional[InstallmentSimulation]:
+        """Returns a simulation that has not been written yet."""
+        with self._cond:
+            return self._pending.get(simulation_id)
+
+    def find_by_hash(self, content_hash: str) -> Optional[InstallmentSimulation]:
+        """Returns a pending simulation with the given content hash."""
+        with self._cond:
+            simulation_id = self._by_hash.get(content_hash)
+            return self._pending.get(simulation_id) if simulation_id else None
+
+    def visible_by(self, simulation_id: str) -> Optional[float]:
+        """
+        Epoch seconds by which the worker that created `simulation_id` should have written it: its
+        time-ordered ID carries the creation time, plus one flush interval and a commit margin.
+        None for IDs that are not time-ordered or claim a creation time in the future.
+        """
+        try:
+            value = uuid.UUID(simulation_id)
+        except ValueError:
+            return None
+        if value.version != 7:
+            return None
+        created = (value.int >> 80) / 1000
+        if created > time.time() + 1:
+            return None
+        return created + self.interval + 1.0
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self, blocking: bool = True) -> int:
+        """
+        Inserts every pending record in a single multi-row INSERT. Returns the number written.
+        With `blocking=False` it returns 0 right away when another flush is in progress.
+        """
+        if not self._flush_lock.acquire(blocking=blocking):
+            return 0
+        try:
+            with self._cond:
+                batch: List[InstallmentSimulation] = list(self._pending.values())
+            if not batch:
+                return 0
+
+            try:
+                self._insert(batch)
+                self._discard(batch)
+                written = len(batch)
+                self.written += written
+            except (DataError, IntegrityError) as e:
+                logger.warning(f"Simulation batch of {len(batch)} rejected, writing row by row: {str(e)}")
+                written = self._insert_row_by_row(batch)
+        finally:
+            self._flush_lock.release()
+
+        logger.debug(f"Simulation writer flushed {written} records")
+        return written
+
+    def _insert(self, batch: List[InstallmentSimulation]) -> None:
+        rows: List[Dict[str, Any]] = [
+            {key: getattr(simulation, key) for key in _COLUMNS} for simulation in batch
+        ]
+
+        db = self.session_factory()
+        try:
+            db.execute(insert(InstallmentSimulation), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self.failed_batches += 1
+            raise
+        finally:
+            db.close()
+
+    def _insert_row_by_row(self, batch: List[InstallmentSimulation]) -> int:
+        """Isolates the rows that make a batch fail; any error other than a rejected row propagates."""
+        written = 0
+        for simulation in batch:
+            try:
+                self._insert([simulation])
+                written += 1
+                self.written += 1
+            except (DataError, IntegrityError) as e:
+                self.quarantined += 1
+                logger.error(
+                    "Simulation quarantined (%s): %s", str(e).splitlines()[0],
+                    {key: getattr(simulation, key) for key in _COLUMNS}
+                )
+            self._discard([simulation])
+        return written
+
+    def _discard(self, batch: List[InstallmentSimulation]) -> None:
+        # Drop written records only after commit so readers never see a gap
+        with self._cond:
+            for simulation in batch:
+                self._pending.pop(simulation.id, None)
+                if simulation.content_hash and self._by_hash.get(simulation.content_hash) == simulation.id:
+                    del self._by_hash[simulation.content_hash]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.interval)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Simulation writer flush failed (will retry): {str(e)}")
+            if stopping:
+                return
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stops the worker and writes everything still buffered (application shutdown)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+        self.flush()
+        logger.info(
+            f"Simulation writer stopped: {self.written} written, {self.failed_batches} failed batches, "
+            f"{self.quarantined} quarantined"
+        )
+
+
+# Singleton writer shared by the installment service
+simulation_writer = SimulationWriter(
+    batch_size=settings.SIMULATION_WRITE_BATCH_SIZE,
+    interval=settings.SIMULATION_WRITE_INTERVAL_SECONDS,
+    max_pending=settings.SIMULATION_WRITE_MAX_PENDING
+)
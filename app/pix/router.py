@@ -22,10 +22,14 @@ from app.pix.schemas import (
 )
 from app.pix.service import create_pix, confirm_pix, get_pix, list_statement, cancel_pix
 from app.core.database import get_db
-from app.core.logger import get_logger_with_correlation
+from app.core.logger import current_correlation_id, logger
 from app.auth.dependencies import get_current_user, require_active_account
 from app.auth.models import User
+from app.auth.cache import UserSnapshot, token_cache
+from app.auth.service import mark_account_activated
 from app.core.utils import mask_cpf_cnpj, format_brasilia_time
+from app.core.metrics import pix_confirmed
+from app.core.timing import span
 
 router = APIRouter(tags=["PIX"])
 
@@ -35,8 +39,7 @@ def create_pix_transaction(
     data: PixCreateRequest,
     x_idempotency_key: str = Header(..., alias="X-Idempotency-Key"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_active_account),
-    x_correlation_id: str = Header(default=None)
+    current_user: UserSnapshot = Depends(require_active_account)
 ) -> PixResponse:
     """
     **Challenge 2: PIX Transaction API**
@@ -52,12 +55,13 @@ def create_pix_transaction(
     **Returns:**
     - Transaction metadata and initial state
     """
-    # Generate correlation_id for traceability
-    correlation_id = x_correlation_id or str(uuid4())
-    logger = get_logger_with_correlation(correlation_id)
+    correlation_id = current_correlation_id()
 
     try:
-        logger.info(f"Starting PIX creation: {data.model_dump()} for user {current_user.id}")
+        logger.info(
+            "Starting PIX creation: value=%s key_type=%s for user %s", data.value, data.key_type.value, current_user.id,
+            extra={"value": data.value, "key_type": data.key_type.value, "user_id": current_user.id}
+        )
 
         pix = create_pix(
             db,
@@ -74,7 +78,8 @@ def create_pix_transaction(
             if confirmed_pix:
                 pix = confirmed_pix
 
-        return build_pix_response(pix, db)
+        with span("response"):
+            return build_pix_response(pix, db)
 
     except ValueError as e:
         logger.warning(f"PIX validation error: {str(e)}")
@@ -88,15 +93,13 @@ def create_pix_transaction(
 def confirm_pix_transaction(
     data: PixConfirmRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    x_correlation_id: str = Header(default=None)
+    current_user: UserSnapshot = Depends(get_current_user)
 ) -> PixResponse:
     """
     Confirms a pending transaction.
     Simulates Payment Service Provider (PSP) callback.
     """
-    correlation_id = x_correlation_id or str(uuid4())
-    logger = get_logger_with_correlation(correlation_id)
+    correlation_id = current_correlation_id()
 
     try:
         logger.info(f"Confirming PIX: {data.pix_id}")
@@ -122,7 +125,7 @@ def confirm_pix_transaction(
 def get_pix_transaction(
     pix_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ) -> PixResponse:
     """
     Retrieves transaction details by ID.
@@ -139,14 +142,12 @@ def get_pix_transaction(
 def cancel_pix_scheduling(
     pix_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    x_correlation_id: str = Header(default=None)
+    current_user: UserSnapshot = Depends(get_current_user)
 ) -> PixResponse:
     """
     Cancels a scheduled transaction.
     """
-    correlation_id = x_correlation_id or str(uuid4())
-    logger = get_logger_with_correlation(correlation_id)
+    correlation_id = current_correlation_id()
 
     try:
         logger.info(f"PIX cancellation request: {pix_id} user={current_user.id}")
@@ -170,7 +171,7 @@ def get_statement(
     status: Optional[PixStatus] = None,
     limit: int = 50,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ) -> PixStatementResponse:
     """
     Retrieves transaction ledger with optional status filtering.
@@ -190,15 +191,13 @@ def generate_pix_charge(
     data: PixChargeRequest,
     request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    x_correlation_id: str = Header(default=None)
+    current_user: UserSnapshot = Depends(get_current_user)
 ) -> PixChargeResponse:
     """
     Generates a PIX Charge (Receive Money).
     Creates a pending transaction that expires after one use.
     """
-    correlation_id = x_correlation_id or str(uuid4())
-    logger = get_logger_with_correlation(correlation_id)
+    correlation_id = current_correlation_id()
 
     logger.info(f"Generating PIX charge: value={data.value} for user {current_user.id}")
 
@@ -257,16 +256,12 @@ def generate_pix_charge(
 def process_pix_receipt(
     data: PixChargeConfirmRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    x_correlation_id: str = Header(default=None)
+    current_user: UserSnapshot = Depends(get_current_user)
 ) -> PixResponse:
     """
     Processes a received PIX (Deposit) for a specific Charge ID.
     Enforces One-Time Use: If charge is already paid, rejects.
     """
-    correlation_id = x_correlation_id or str(uuid4())
-    logger = get_logger_with_correlation(correlation_id)
-
     logger.info(f"Processing PIX receipt for charge: {data.charge_id}")
 
     # Find the charge transaction
@@ -298,6 +293,7 @@ def process_pix_receipt(
             # Increase credit limit logic
             limit_increase = pix.value * 0.50
             receiver_user.credit_limit += limit_increase
+            mark_account_activated(receiver_user)
             db.add(receiver_user)
             logger.info(f"Credit limit increased by R$ {limit_increase:.2f} for user {receiver_user.id}")
         else:
@@ -305,6 +301,10 @@ def process_pix_receipt(
 
         db.commit()
         db.refresh(pix)
+        pix_confirmed.inc()
+        if receiver_user:
+            # Cached sessions must not keep serving the previous credit limit
+            token_cache.invalidate_user(receiver_user.id)
 
         logger.info(f"Charge {pix.id} successfully confirmed.")
         return build_pix_response(pix, db)
@@ -13,8 +13,14 @@ from app.core.logger import logger, audit_log
 from app.core.security import mask_sensitive_data
 from app.boleto.models import BoletoTransaction, BoletoStatus
 from app.auth.models import User
+from app.auth.cache import token_cache
+from app.auth.service import activate_account, mark_account_activated
+from app.antifraude.graph import transfer_graph
+from app.core.metrics import pix_confirmed, pix_created, pix_failed
+from app.core.timing import span
 
 
+@span("balance")
 def get_balance(db: Session, user_id: str) -> float:
     """Calculates current account balance for a specific user."""
     try:
@@ -54,12 +60,13 @@ def create_pix(
     Returns existing transaction if idempotency key collision occurs.
     """
     # Idempotency check
-    existing_pix = db.query(PixTransaction).filter(
-        PixTransaction.idempotency_key == idempotency_key
-    ).first()
+    with span("idempotency"):
+        existing_pix = db.query(PixTransaction).filter(
+            PixTransaction.idempotency_key == idempotency_key
+        ).first()
 
     if existing_pix:
-        logger.info(f"Duplicate PIX detected (idempotency): key={idempotency_key}, id={existing_pix.id}")
+        logger.info("Duplicate PIX detected (idempotency): key=%s, id=%s", idempotency_key, existing_pix.id)
         return existing_pix
 
     # Balance Check for Outgoing Transactions
@@ -71,6 +78,7 @@ def create_pix(
             # Immediate transaction - Check Balance
             current_balance = get_balance(db, user_id)
             if data.value > current_balance:
+                pix_failed.inc("insufficient_balance")
                 raise ValueError("Insufficient balance")
             initial_status = PixStatus.CONFIRMED
     else:
@@ -114,26 +122,29 @@ def create_pix(
         }
     )
 
-    logger.info(f"PIX created (pending commit): id={pix.id}, value={data.value}, type={type.value}, status={initial_status.value}")
+    logger.info(
+        "PIX created (pending commit): id=%s, value=%s, type=%s, status=%s", pix.id, data.value, type.value, initial_status.value,
+        extra={"pix_id": pix.id, "value": data.value, "transaction_type": type.value, "status": initial_status.value}
+    )
 
     # Real-time Internal Transfer Logic
     # If the destination key belongs to a local user, credit them immediately.
+    recipient_user = None
     if type == TransactionType.SENT and initial_status != PixStatus.SCHEDULED:
-        recipient_user = None
 
         # Search for recipient by Key
         if data.key_type in [PixKeyType.CPF, PixKeyType.CNPJ]:
             # Normalize key: remove non-digits
             clean_key = re.sub(r'\D', '', data.pix_key)
-            logger.info(f"Searching for recipient with CPF/CNPJ: {clean_key}")
+            logger.info("Searching for recipient with CPF/CNPJ: %s", masked_key)
             recipient_user = db.query(User).filter(User.cpf_cnpj == clean_key).first()
         elif data.key_type == PixKeyType.EMAIL:
             email_key = data.pix_key.strip().lower()
-            logger.info(f"Searching for recipient with Email: {email_key}")
+            logger.info("Searching for recipient with Email: %s", masked_key)
             recipient_user = db.query(User).filter(func.lower(User.email) == email_key).first()
 
         if recipient_user:
-            logger.info(f"Recipient found: {recipient_user.name} (ID: {recipient_user.id})")
+            logger.info("Recipient found: ID %s", recipient_user.id)
 
             # Create incoming transaction for recipient
             received_pix = PixTransaction(
@@ -153,21 +164,37 @@ def create_pix(
             # Apply Credit Limit Increase Rule (50% of received amount)
             limit_increase = data.value * 0.50
             recipient_user.credit_limit += limit_increase
+            mark_account_activated(recipient_user)
             db.add(recipient_user)
 
-            logger.info(f"Internal transfer executed: {data.value} to {recipient_user.name} (ID: {recipient_user.id})")
-            logger.info(f"Credit limit for {recipient_user.name} increased by R$ {limit_increase:.2f}")
+            logger.info(
+                "Internal transfer executed: %s to ID %s, credit limit increased by R$ %.2f",
+                data.value, recipient_user.id, limit_increase,
+                extra={"pix_id": pix.id, "recipient_id": recipient_user.id, "limit_increase": limit_increase}
+            )
         else:
-            logger.warning(f"Recipient NOT found for key: {data.pix_key} (Type: {data.key_type})")
+            logger.warning("Recipient NOT found for key: %s (Type: %s)", masked_key, data.key_type.value)
 
     try:
-        db.commit()
-        db.refresh(pix)
+        with span("commit"):
+            db.commit()
+            db.refresh(pix)
     except Exception as e:
         db.rollback()
+        pix_failed.inc("rollback")
         logger.error(f"Transaction failed, rolled back: {str(e)}")
         raise e
 
+    pix_created.inc(type.value)
+    if initial_status == PixStatus.CONFIRMED:
+        pix_confirmed.inc()
+
+    # Feed the anti-fraud transfer graph only once the transfer is durable
+    # and drop cached sessions of the recipient, whose credit limit just changed
+    if recipient_user is not None:
+        token_cache.invalidate_user(recipient_user.id)
+        transfer_graph.record_transfer(user_id, recipient_user.id, data.value)
+
     return pix
 
 
@@ -187,13 +214,17 @@ def confirm_pix(
         return None
 
     if pix.status == PixStatus.CONFIRMED:
-        logger.info(f"PIX already confirmed: id={pix_id}")
+        logger.info("PIX already confirmed: id=%s", pix_id)
         return pix
 
-    # Update status
+    # Update status; a confirmed deposit activates the owner's account in the same commit
     pix.status = PixStatus.CONFIRMED
+    activated = pix.type == TransactionType.RECEIVED and activate_account(db, pix.user_id)
     db.commit()
     db.refresh(pix)
+    pix_confirmed.inc()
+    if activated:
+        token_cache.invalidate_user(pix.user_id)
 
     audit_log(
         action="pix_confirmed",
@@ -202,7 +233,7 @@ def confirm_pix(
         details={"correlation_id": correlation_id}
     )
 
-    logger.info(f"PIX confirmed: id={pix.id}")
+    logger.info("PIX confirmed: id=%s", pix.id, extra={"pix_id": pix.id})
 
     return pix
 
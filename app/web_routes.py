@@ -5,7 +5,7 @@ from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.pix.service import list_statement
 from app.auth.dependencies import get_current_user
-from app.auth.models import User
+from app.auth.cache import UserSnapshot
 import os
 
 # Setup templates directory
@@ -28,7 +28,7 @@ async def register_page(request: Request):
 
 
 @router.get("/", response_class=HTMLResponse)
-async def read_root(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def read_root(request: Request, db: Session = Depends(get_db), current_user: UserSnapshot = Depends(get_current_user)):
     """Main Dashboard (Home)"""
     statement = list_statement(db, current_user.id)
     balance = statement["balance"]
@@ -42,7 +42,7 @@ async def read_root(request: Request, db: Session = Depends(get_db), current_use
 
 
 @router.get("/ui/pix", response_class=HTMLResponse)
-async def pix_ui(request: Request, current_user: User = Depends(get_current_user)):
+async def pix_ui(request: Request, current_user: UserSnapshot = Depends(get_current_user)):
     """PIX Interface"""
     return templates.TemplateResponse(
         "pix.html",
@@ -51,7 +51,7 @@ async def pix_ui(request: Request, current_user: User = Depends(get_current_user
 
 
 @router.get("/ui/parcelamento", response_class=HTMLResponse)
-async def parcelamento_ui(request: Request, current_user: User = Depends(get_current_user)):
+async def parcelamento_ui(request: Request, current_user: UserSnapshot = Depends(get_current_user)):
     """Simulation Interface"""
     return templates.TemplateResponse(
         "parcelamento.html",
@@ -60,7 +60,7 @@ async def parcelamento_ui(request: Request, current_user: User = Depends(get_cur
 
 
 @router.get("/pix/pagar-qrcode", response_class=HTMLResponse)
-async def pix_payment_simulation(request: Request, current_user: User = Depends(get_current_user)):
+async def pix_payment_simulation(request: Request, current_user: UserSnapshot = Depends(get_current_user)):
     """QR Code Payment Simulation Page"""
     return templates.TemplateResponse(
         "pix_payment.html",
@@ -69,6 +69,6 @@ async def pix_payment_simulation(request: Request, current_user: User = Depends(
 
 
 @router.get("/ui/extrato", response_class=HTMLResponse)
-async def extrato_ui(request: Request, current_user: User = Depends(get_current_user)):
+async def extrato_ui(request: Request, current_user: UserSnapshot = Depends(get_current_user)):
     """Statement Interface"""
     return templates.TemplateResponse("extrato.html", {"request": request, "page": "extrato", "user_name": current_user.name})
@@ -0,0 +1,283 @@
+"""
+Historical back-testing tool for anti-fraud rule sets.
+Replays outgoing PIX transactions from `transacoes_pix` through the active engine
+and one or more candidate rule sets, reporting approval-rate deltas and per-rule trigger counts.
+
+Rows are streamed from the database in chunks (server-side cursor on PostgreSQL),
+features are derived in the parent process and scoring is fanned out to a process pool.
+
+Usage:
+    python scripts/backtest_antifraud.py candidate.json [other.json ...]
+        [--chunk-size 50000] [--workers 4] [--since 2025-01-01] [--json]
+
+With `--workers 0` chunks are scored in-process.
+
+Graph rules (MULE_FAN_IN, FAN_OUT, TRANSFER_RING) are left out of every rule set: they read the
+live transfer graph, which the per-user replay does not rebuild, so they could never fire here.
+The report lists the rules excluded from each rule set.
+
+Rule-set file format (see AntifraudEngine.from_config):
+    {"name": "strict-night", "approval_limit": 50,
+     "rules": [{"name": "NIGHT_TIME", "points": 50}, {"name": "HIGH_VALUE", "limit": 500.0}]}
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.antifraude.rules import (  # noqa: E402
+    AntifraudEngine,
+    AntifraudRule,
+    FanInRule,
+    FanOutRule,
+    LargeComponentRule,
+    configure_model
+)
+from app.antifraude.schemas import AntifraudTransaction  # noqa: E402
+from app.core.database import SessionLocal  # noqa: E402
+from app.core.utils import process_pool_context, to_brasilia_time  # noqa: E402
+from app.pix.models import PixTransaction, TransactionType  # noqa: E402
+
+BASELINE = "active"
+VELOCITY_WINDOW = timedelta(hours=24)
+MAX_ATTEMPTS = 100  # Mirrors AntifraudTransaction.validate_attempts
+# Rules backed by the transfer graph, which the replay has no state for
+GRAPH_RULES = (FanInRule, FanOutRule, LargeComponentRule)
+
+# (value, "HH:MM", attempts_last_24h)
+Features = Tuple[float, str, int]
+
+# Per-process engines, built once by the pool initializer
+_engines: Dict[str, AntifraudEngine] = {}
+
+
+def load_rule_sets(paths: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Loads candidate rule-set configurations keyed by name (defaults to the file name)."""
+    rule_sets: Dict[str, Dict[str, Any]] = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        name = config.get("name") or os.path.splitext(os.path.basename(path))[0]
+        if name == BASELINE or name in rule_sets:
+            raise ValueError(f"Duplicate rule set name: {name}")
+        # Fail fast on invalid configurations before spawning workers
+        AntifraudEngine.from_config(config)
+        rule_sets[name] = config
+    return rule_sets
+
+
+def _replayable(rules: List[AntifraudRule]) -> List[AntifraudRule]:
+    return [rule for rule in rules if not isinstance(rule, GRAPH_RULES)]
+
+
+def excluded_rules(rule_sets: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Names of the graph rules left out of each rule set (baseline included)."""
+    engines = {BASELINE: AntifraudEngine(), **{name: AntifraudEngine.from_config(c) for name, c in rule_sets.items()}}
+    return {
+        name: [rule.name for rule in engine.rules if isinstance(rule, GRAPH_RULES)]
+        for name, engine in engines.items()
+    }
+
+
+def stream_features(
+    chunk_size: int,
+    since: Optional[datetime],
+    session_factory: Callable[[], Session] = SessionLocal
+) -> Iterator[List[Features]]:
+    """
+    Streams outgoing transactions ordered by user and time, deriving the engine inputs.
+    `attempts_last_24h` is rebuilt with a per-user sliding window, so only one user's
+    recent history is kept in memory at any time.
+    """
+    stmt = (
+        select(PixTransaction.user_id, PixTransaction.value, PixTransaction.created_at)
+        .where(PixTransaction.type == TransactionType.SENT)
+        .order_by(PixTransaction.user_id, PixTransaction.created_at)
+        .execution_options(yield_per=chunk_size)
+    )
+    if since:
+        stmt = stmt.where(PixTransaction.created_at >= since)
+
+    current_user: Optional[str] = None
+    window: Deque[datetime] = deque()
+
+    db = session_factory()
+    try:
+        for partition in db.execute(stmt).partitions():
+            chunk: List[Features] = []
+            for user_id, value, created_at in partition:
+                if user_id != current_user:
+                    current_user = user_id
+                    window.clear()
+                while window and created_at - window[0] > VELOCITY_WINDOW:
+                    window.popleft()
+                attempts = min(len(window), MAX_ATTEMPTS)
+                window.append(created_at)
+                chunk.append((float(value), to_brasilia_time(created_at).strftime("%H:%M"), attempts))
+            yield chunk
+    finally:
+        db.close()
+
+
+def _init_worker(rule_sets: Dict[str, Dict[str, Any]]) -> None:
+    _engines[BASELINE] = AntifraudEngine()
+    configure_model(_engines[BASELINE])
+    for name, config in rule_sets.items():
+        _engines[name] = AntifraudEngine.from_config(config)
+    for engine in _engines.values():
+        engine.rules = _replayable(engine.rules)
+
+
+def score_chunk(chunk: List[Features]) -> Dict[str, Dict[str, Any]]:
+    """Scores a chunk with every engine; returns mergeable counters per rule set."""
+    stats: Dict[str, Dict[str, Any]] = {
+        name: {"approved": 0, "flipped_to_reject": 0, "flipped_to_approve": 0, "triggers": Counter()}
+        for name in _engines
+    }
+    baseline = _engines[BASELINE]
+
+    # Inputs come from persisted rows; skip re-validation
+    transactions = [
+        AntifraudTransaction.model_construct(
+            value=value, time=hhmm, attempts_last_24h=attempts, transaction_type="PIX", origin=None
+        )
+        for value, hhmm, attempts in chunk
+    ]
+    baseline_results = baseline.evaluate_batch(transactions)
+    baseline_approved = [score < baseline.approval_limit for score, _ in baseline_results]
+
+    for name, engine in _engines.items():
+        entry = stats[name]
+        results = baseline_results if engine is baseline else engine.evaluate_batch(transactions)
+        for base_approved, (score, triggered) in zip(baseline_approved, results):
+            approved = score < engine.approval_limit
+            entry["approved"] += approved
+            if approved != base_approved:
+                entry["flipped_to_approve" if approved else "flipped_to_reject"] += 1
+            for rule in triggered:
+                entry["triggers"][rule.name] += 1
+
+    return stats
+
+
+def merge(total: Dict[str, Dict[str, Any]], partial: Dict[str, Dict[str, Any]]) -> None:
+    for name, entry in partial.items():
+        target = total.setdefault(
+            name, {"approved": 0, "flipped_to_reject": 0, "flipped_to_approve": 0, "triggers": Counter()}
+        )
+        for key in ("approved", "flipped_to_reject", "flipped_to_approve"):
+            target[key] += entry[key]
+        target["triggers"].update(entry["triggers"])
+
+
+def run_backtest(
+    rule_sets: Dict[str, Dict[str, Any]],
+    chunk_size: int,
+    workers: int,
+    since: Optional[datetime],
+    session_factory: Callable[[], Session] = SessionLocal
+) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+    """Feeds chunks to the pool keeping a bounded number in flight, merging results as they complete."""
+    total: Dict[str, Dict[str, Any]] = {}
+    rows = 0
+
+    if workers <= 0:
+        _init_worker(rule_sets)
+        for chunk in stream_features(chunk_size, since, session_factory):
+            rows += len(chunk)
+            merge(total, score_chunk(chunk))
+        return rows, total
+
+    max_in_flight = workers * 2
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=process_pool_context(), initializer=_init_worker, initargs=(rule_sets,)
+    ) as pool:
+        pending: Set[Future[Dict[str, Dict[str, Any]]]] = set()
+        for chunk in stream_features(chunk_size, since, session_factory):
+            rows += len(chunk)
+            pending.add(pool.submit(score_chunk, chunk))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    merge(total, future.result())
+        for future in pending:
+            merge(total, future.result())
+
+    return rows, total
+
+
+def build_report(
+    rows: int,
+    total: Dict[str, Dict[str, Any]],
+    elapsed: float,
+    excluded: Optional[Dict[str, List[str]]] = None
+) -> Dict[str, Any]:
+    baseline_rate = total[BASELINE]["approved"] / rows if rows else 0.0
+    report: Dict[str, Any] = {"rows": rows, "elapsed_seconds": round(elapsed, 2), "rule_sets": {}}
+    for name, entry in total.items():
+        rate = entry["approved"] / rows if rows else 0.0
+        report["rule_sets"][name] = {
+            "approval_rate": round(rate * 100, 4),
+            "delta_pp": round((rate - baseline_rate) * 100, 4),
+            "flipped_to_reject": entry["flipped_to_reject"],
+            "flipped_to_approve": entry["flipped_to_approve"],
+            "rule_triggers": dict(entry["triggers"].most_common()),
+            "excluded_rules": (excluded or {}).get(name, []),
+        }
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\nReplayed {report['rows']} transactions in {report['elapsed_seconds']}s\n")
+    print(f"{'Rule set':<24}{'Approval %':>12}{'Delta pp':>10}{'->Reject':>10}{'->Approve':>11}")
+    print("-" * 67)
+    for name, entry in report["rule_sets"].items():
+        print(
+            f"{name:<24}{entry['approval_rate']:>12.2f}{entry['delta_pp']:>+10.2f}"
+            f"{entry['flipped_to_reject']:>10}{entry['flipped_to_approve']:>11}"
+        )
+    for name, entry in report["rule_sets"].items():
+        print(f"\n[{name}] rule triggers")
+        for rule_name, count in entry["rule_triggers"].items():
+            print(f"  {rule_name:<22}{count:>12}")
+        if entry["excluded_rules"]:
+            print(f"  Not replayed (transfer graph rules): {', '.join(entry['excluded_rules'])}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay historical PIX traffic through candidate anti-fraud rule sets.")
+    parser.add_argument("rule_sets", nargs="+", help="Candidate rule-set JSON files")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Rows fetched and scored per chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scoring processes (0 = in-process)")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="Only replay rows created after (ISO date)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    rule_sets = load_rule_sets(args.rule_sets)
+
+    start = time.perf_counter()
+    rows, total = run_backtest(rule_sets, args.chunk_size, args.workers, args.since)
+    if not rows:
+        print("No transactions found for replay.")
+        return
+
+    report = build_report(rows, total, time.perf_counter() - start, excluded_rules(rule_sets))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
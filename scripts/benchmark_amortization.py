@@ -0,0 +1,113 @@
+"""
+Benchmark for amortization schedule generation.
+Compares the former per-month loop + per-row Pydantic model path against the
+closed-form NumPy schedule serialized directly, for n = 1..360 installments.
+
+Usage:
+    python scripts/benchmark_amortization.py [--repeat 50] [--step 1]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.responses import FastJSONResponse  # noqa: E402
+from app.parcelamento.schemas import AmortizationInstallment, SimulationResponse  # noqa: E402
+from app.parcelamento.service import amortization_schedule, schedule_rows  # noqa: E402
+
+VALUE = 50000.0
+RATE = 0.0199
+
+
+def legacy_loop(value: float, installments: int, rate: float) -> bytes:
+    """
+    Previous implementation: Python loop, one dict and one Pydantic model per row,
+    then response-model serialization and `json.dumps` as done by FastAPI.
+    """
+    factor = (1 + rate) ** installments
+    installment = value * (rate * factor) / (factor - 1)
+
+    amortization: List[Dict[str, Any]] = []
+    balance = value
+    for i in range(installments):
+        interest = balance * rate
+        principal = installment - interest
+        balance -= principal
+        if balance < 0.01:
+            balance = 0
+        amortization.append({
+            "month": i + 1,
+            "installment": round(installment, 2),
+            "interest": round(interest, 2),
+            "principal": round(principal, 2),
+            "balance": round(balance, 2)
+        })
+
+    response = SimulationResponse(
+        installment=round(installment, 2),
+        total_paid=round(installment * installments, 2),
+        annual_cet=0.0,
+        financed_value=value,
+        iof=0.0,
+        table=[AmortizationInstallment(**item) for item in amortization],
+        simulation_id="0190a1b2-c3d4-7e5f-8a9b-0c1d2e3f4a5b",
+        created_at="2025-01-01T00:00:00"
+    )
+    return json.dumps(response.model_dump(mode="json")).encode("utf-8")
+
+
+def vectorized(value: float, installments: int, rate: float) -> bytes:
+    """Current implementation: closed-form arrays, rows serialized without model validation."""
+    schedule = amortization_schedule(value, installments, rate)
+    return FastJSONResponse(content={
+        "installment": round(schedule["installment"], 2),
+        "total_paid": round(schedule["installment"] * installments, 2),
+        "annual_cet": 0.0,
+        "financed_value": value,
+        "iof": 0.0,
+        "table": schedule_rows(schedule),
+        "simulation_id": "0190a1b2-c3d4-7e5f-8a9b-0c1d2e3f4a5b",
+        "created_at": "2025-01-01T00:00:00"
+    }).body
+
+
+def timeit(fn: Callable[[float, int, float], bytes], installments: int, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(VALUE, installments, RATE)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark amortization schedule generation.")
+    parser.add_argument("--repeat", type=int, default=50, help="Runs per term")
+    parser.add_argument("--step", type=int, default=1, help="Step over n = 1..360")
+    args = parser.parse_args()
+
+    terms = list(range(1, 361, args.step))
+    if terms[-1] != 360:
+        terms.append(360)
+
+    legacy_total = vectorized_total = 0.0
+    print(f"{'n':>5}{'legacy (us)':>14}{'vectorized (us)':>18}{'speedup':>10}")
+    print("-" * 47)
+    for n in terms:
+        legacy_us = timeit(legacy_loop, n, args.repeat)
+        vectorized_us = timeit(vectorized, n, args.repeat)
+        legacy_total += legacy_us
+        vectorized_total += vectorized_us
+        if n in (1, 12, 24, 60, 120, 240, 360):
+            print(f"{n:>5}{legacy_us:>14.1f}{vectorized_us:>18.1f}{legacy_us / vectorized_us:>9.1f}x")
+
+    print("-" * 47)
+    print(f"{'mean':>5}{legacy_total / len(terms):>14.1f}{vectorized_total / len(terms):>18.1f}"
+          f"{legacy_total / vectorized_total:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark for login throughput under concurrent load.
+Fires concurrent `/auth/login` requests while probing `/health`, comparing inline
+hashing in the request threads against the bounded hashing process pool.
+
+Usage:
+    python scripts/benchmark_login.py [--logins 200] [--concurrency 32] [--workers 0 2 4] [--max-pending 16]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("NEWCREDIT_ALLOWED_START", "1")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.auth import router as auth_router  # noqa: E402
+from app.auth.hashing import PasswordHasher  # noqa: E402
+from app.core.database import Base, get_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+USER = {"name": "Bench User", "email": "bench@example.com", "cpf_cnpj": "52998224725", "password": "S3nha-forte!"}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(client: TestClient, logins: int, concurrency: int) -> Dict[str, float]:
+    login_ms: List[float] = []
+    health_ms: List[float] = []
+    statuses: Dict[int, int] = {}
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def login() -> None:
+        start = time.perf_counter()
+        response = client.post("/auth/login", json={"cpf_cnpj": USER["cpf_cnpj"], "password": USER["password"]})
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                login_ms.append(elapsed)
+
+    def probe() -> None:
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get("/health")
+            health_ms.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.01)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(logins):
+            pool.submit(login)
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+
+    return {
+        "ok": statuses.get(200, 0),
+        "shed": statuses.get(503, 0),
+        "throughput": statuses.get(200, 0) / elapsed,
+        "login_p50": statistics.median(login_ms) if login_ms else 0.0,
+        "login_p95": percentile(login_ms, 0.95),
+        "health_p95": percentile(health_ms, 0.95),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark login throughput under concurrent load.")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4], help="Hashing processes (0 = inline)")
+    parser.add_argument("--max-pending", type=int, default=16, help="Admitted hashing calls before shedding")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_bench_db():
+        db = factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_bench_db
+    client = TestClient(app)
+    auth_router.password_hasher = PasswordHasher(workers=0)
+    client.post("/auth/register", json=USER)
+
+    print(f"{'mode':<12}{'ok':>6}{'503':>6}{'logins/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'/health p95 ms':>16}")
+    print("-" * 68)
+    for workers in args.workers:
+        hasher = PasswordHasher(workers=workers, max_pending=args.max_pending if workers else args.concurrency)
+        auth_router.password_hasher = hasher
+        try:
+            result = run(client, args.logins, args.concurrency)
+        finally:
+            hasher.shutdown()
+        mode = "inline" if workers == 0 else f"pool x{workers}"
+        print(
+            f"{mode:<12}{result['ok']:>6}{result['shed']:>6}{result['throughput']:>10.1f}"
+            f"{result['login_p50']:>9.1f}{result['login_p95']:>9.1f}{result['health_p95']:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
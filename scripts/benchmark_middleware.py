@@ -0,0 +1,130 @@
+"""
+Microbenchmark of per-request middleware overhead.
+Drives minimal ASGI apps directly (no HTTP client, no network) and compares the previous pair of
+`@app.middleware("http")` layers (BaseHTTPMiddleware) with the pure ASGI RequestContextMiddleware.
+
+Usage:
+    python scripts/benchmark_middleware.py [--requests 20000] [--repeat 5] [--with-logging]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List
+from uuid import uuid4
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request, Response  # noqa: E402
+from starlette.types import ASGIApp, Message  # noqa: E402
+
+from app.core.logger import correlation_id_var, logger  # noqa: E402
+from app.core.middleware import RequestContextMiddleware  # noqa: E402
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping() -> Dict[str, str]:
+        return {"status": "ok"}
+
+    return app
+
+
+def baseline_app() -> FastAPI:
+    return _app()
+
+
+def legacy_app() -> FastAPI:
+    """Replica of the former add_security_headers + add_correlation_id http middlewares."""
+    app = _app()
+
+    @app.middleware("http")
+    async def add_security_headers(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+        response = await call_next(request)
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        return response
+
+    @app.middleware("http")
+    async def add_correlation_id(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+        correlation_id = request.headers.get("X-Correlation-ID") or str(uuid4())
+        request.state.correlation_id = correlation_id
+        token = correlation_id_var.set(correlation_id)
+        try:
+            start_time = time.time()
+            logger.info("Request: %s %s", request.method, request.url.path, extra={"category": "access"})
+            response = await call_next(request)
+            process_time = time.time() - start_time
+            response.headers["X-Correlation-ID"] = correlation_id
+            response.headers["X-Process-Time"] = str(process_time)
+            logger.info("Response: %s | %.3fs", response.status_code, process_time, extra={"category": "access"})
+            return response
+        finally:
+            correlation_id_var.reset(token)
+
+    return app
+
+
+def asgi_app() -> FastAPI:
+    app = _app()
+    app.add_middleware(RequestContextMiddleware)
+    return app
+
+
+async def drive(app: ASGIApp, requests: int) -> float:
+    """Runs `requests` sequential GET /ping calls; returns the mean microseconds per request."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/ping", "raw_path": b"/ping", "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"x-correlation-id", b"bench-1")],
+        "client": ("127.0.0.1", 1234), "server": ("bench", 80)
+    }
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        pass
+
+    await app(dict(scope), receive, send)  # Warm-up (routing tables, middleware stack build)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark per-request middleware overhead.")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant (median reported)")
+    parser.add_argument("--with-logging", action="store_true", help="Keep the access log lines enabled")
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        logger.setLevel(logging.WARNING)
+
+    variants = {"no middleware": baseline_app(), "BaseHTTPMiddleware x2": legacy_app(), "pure ASGI": asgi_app()}
+    results: Dict[str, List[float]] = {name: [] for name in variants}
+    for _ in range(args.repeat):
+        for name, app in variants.items():
+            results[name].append(asyncio.run(drive(app, args.requests)))
+
+    baseline = statistics.median(results["no middleware"])
+    print(f"{'variant':<24}{'us/request':>12}{'overhead us':>13}")
+    print("-" * 49)
+    for name, samples in results.items():
+        median = statistics.median(samples)
+        print(f"{name:<24}{median:>12.1f}{median - baseline:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark for the model-based anti-fraud scorer.
+Measures per-decision latency (single transaction) and batch throughput
+for the rule engine alone and combined with logistic and stumps models.
+
+Usage:
+    python scripts/benchmark_risk_model.py [--iterations 20000] [--batch-size 10000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.antifraude.model import load_model  # noqa: E402
+from app.antifraude.rules import AntifraudEngine  # noqa: E402
+from app.antifraude.schemas import AntifraudTransaction  # noqa: E402
+
+MODELS: Dict[str, Dict[str, Any]] = {
+    "logistic": {
+        "type": "logistic",
+        "intercept": -6.0,
+        "coefficients": {"log_value": 0.6, "is_night": 1.4, "attempts": 0.35}
+    },
+    "stumps": {
+        "type": "stumps",
+        "base_score": -3.0,
+        "stumps": [
+            {"feature": "value", "threshold": 300.0, "left": -0.3, "right": 0.8},
+            {"feature": "value", "threshold": 1000.0, "left": 0.0, "right": 1.2},
+            {"feature": "is_night", "threshold": 0.5, "left": -0.2, "right": 1.0},
+            {"feature": "attempts", "threshold": 3.0, "left": -0.1, "right": 1.5},
+            {"feature": "hour", "threshold": 12.0, "left": 0.1, "right": -0.1}
+        ] * 20  # 100 stumps
+    }
+}
+
+
+def random_transactions(n: int) -> List[AntifraudTransaction]:
+    return [
+        AntifraudTransaction(
+            value=round(random.uniform(1, 3000), 2),
+            time=f"{random.randint(0, 23):02d}:{random.randint(0, 59):02d}",
+            attempts_last_24h=random.randint(0, 10)
+        )
+        for _ in range(n)
+    ]
+
+
+def build_engine(model_name: Optional[str], workdir: str) -> AntifraudEngine:
+    engine = AntifraudEngine()
+    if model_name:
+        path = os.path.join(workdir, f"{model_name}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(MODELS[model_name], f)
+        engine.model = load_model(path)
+    return engine
+
+
+def bench(name: str, engine: AntifraudEngine, transactions: List[AntifraudTransaction], batch_size: int) -> None:
+    # Warm-up
+    for t in transactions[:100]:
+        engine.evaluate(t)
+
+    start = time.perf_counter()
+    for t in transactions:
+        engine.evaluate(t)
+    single_us = (time.perf_counter() - start) / len(transactions) * 1e6
+
+    batch = transactions[:batch_size]
+    start = time.perf_counter()
+    engine.evaluate_batch(batch)
+    batch_us = (time.perf_counter() - start) / len(batch) * 1e6
+
+    status = "OK" if single_us < 100 else "OVER BUDGET"
+    print(f"{name:<12}{single_us:>16.2f}{batch_us:>16.2f}   {status}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark anti-fraud scoring latency.")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    transactions = random_transactions(max(args.iterations, args.batch_size))
+
+    print(f"{'Engine':<12}{'single (us)':>16}{'batch (us/tx)':>16}   budget: 100us/decision")
+    print("-" * 60)
+    with tempfile.TemporaryDirectory() as workdir:
+        for model_name in (None, "logistic", "stumps"):
+            engine = build_engine(model_name, workdir)
+            bench(model_name or "rules-only", engine, transactions[:args.iterations], args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
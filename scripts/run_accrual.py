@@ -0,0 +1,49 @@
+"""
+Nightly accrual job for installment contracts.
+Recomputes overdue installments, late fees and moratory interest of every open
+contract as of a date, processing contracts in chunks as NumPy arrays.
+
+Usage:
+    python scripts/run_accrual.py [--as-of 2025-01-31] [--chunk-size 10000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timezone
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import SessionLocal  # noqa: E402
+from app.core.utils import to_brasilia_time  # noqa: E402
+from app.parcelamento.contracts import run_accrual  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Accrue late fees and moratory interest on open installment contracts.")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None, help="Accrual date (defaults to today in Brasília)")
+    parser.add_argument("--chunk-size", type=int, default=settings.CONTRACT_ACCRUAL_CHUNK_SIZE, help="Contracts per chunk")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    as_of = args.as_of or to_brasilia_time(datetime.now(timezone.utc)).date()
+
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        stats = run_accrual(db, as_of, args.chunk_size)
+    stats["elapsed_seconds"] = round(time.perf_counter() - start, 2)
+
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return
+
+    print(f"\nAccrual as of {stats['as_of']} ({stats['elapsed_seconds']}s)\n")
+    for key in ("contracts", "installments", "updated", "overdue_contracts", "overdue_installments", "late_fee", "moratory_interest"):
+        print(f"  {key:<22}{stats[key]:>16}")
+
+
+if __name__ == "__main__":
+    main()
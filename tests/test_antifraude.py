@@ -2,14 +2,34 @@
 Unit tests for Anti-Fraud module.
 Validates risk rules and scoring logic using data-driven tests.
 """
+import importlib.util
+import json
+import os
+import threading
+import time
+from datetime import datetime
 import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from app.main import app
+from app.antifraude.graph import TransferGraph
+from app.antifraude.model import featurize, load_model
 from app.antifraude.schemas import AntifraudTransaction
 from app.antifraude.rules import (
     AntifraudEngine,
+    antifraud_engine,
     NightTimeRule,
     HighValueRule,
-    ExcessiveAttemptsRule
+    ExcessiveAttemptsRule,
+    FanInRule,
+    LargeComponentRule
 )
+from app.antifraude.shadow import ShadowEvaluator
+from app.auth.cache import UserSnapshot
+from app.auth.dependencies import get_optional_user
+from app.core.database import Base
+from app.pix.models import PixStatus, PixTransaction, TransactionType
 
 
 @pytest.mark.parametrize("value, time, attempts, expected_approved, expected_risk", [
@@ -144,3 +164,324 @@ def test_multiple_rules_activated():
 
     assert len(result["triggered_rules"]) == 3
     assert result["score"] == 100  # Capped at 100
+
+
+def test_engine_from_config():
+    """Builds a candidate rule set from a declarative configuration."""
+    engine = AntifraudEngine.from_config({
+        "approval_limit": 50,
+        "rules": [
+            {"name": "NIGHT_TIME", "points": 50},
+            {"name": "HIGH_VALUE", "limit": 500.0}
+        ]
+    })
+
+    assert engine.approval_limit == 50
+    assert [rule.name for rule in engine.rules] == ["NIGHT_TIME", "HIGH_VALUE"]
+    assert engine.rules[0].points == 50
+
+    transaction = AntifraudTransaction(
+        value=400.0,  # Below the candidate limit
+        time="23:00",  # +50 points
+        attempts_last_24h=1,
+        origin=None
+    )
+    score, triggered = engine.evaluate(transaction)
+
+    assert score == 50
+    assert [rule.name for rule in triggered] == ["NIGHT_TIME"]
+    assert engine.analyze(transaction)["approved"] is False
+
+
+def test_engine_from_config_unknown_rule():
+    """Rejects configurations referencing unregistered rules."""
+    with pytest.raises(ValueError):
+        AntifraudEngine.from_config({"rules": [{"name": "UNKNOWN"}]})
+
+
+def test_shadow_evaluation_records_divergence():
+    """Shadow rule set is evaluated off the request path without affecting the primary decision."""
+    engine = AntifraudEngine()
+    shadow = ShadowEvaluator(
+        AntifraudEngine.from_config({"approval_limit": 30, "rules": [{"name": "HIGH_VALUE"}]}),
+        name="strict-value"
+    )
+    engine.shadow = shadow
+
+    low = AntifraudTransaction(value=50.0, time="14:00", attempts_last_24h=1, origin=None)
+    high = AntifraudTransaction(value=400.0, time="14:00", attempts_last_24h=1, origin=None)
+
+    assert engine.analyze(low)["approved"] is True
+    assert engine.analyze(high)["approved"] is True  # Primary decision unchanged
+
+    shadow.flush()
+    stats = shadow.stats()
+    shadow.stop()
+
+    assert stats["evaluated"] == 2
+    assert stats["agreements"] == 1
+    assert stats["disagreements"] == 1
+    assert stats["shadow_stricter"] == 1
+    assert stats["divergent_samples"][0]["shadow_rules"] == ["HIGH_VALUE"]
+
+
+def test_shadow_sampling_skips_unsampled():
+    """A zero sample rate never enqueues work."""
+    shadow = ShadowEvaluator(AntifraudEngine(), sample_rate=0.0)
+    transaction = AntifraudTransaction(value=50.0, time="14:00", attempts_last_24h=1, origin=None)
+
+    shadow.submit(transaction, 0, True)
+
+    assert shadow.stats()["sampled"] == 0
+
+
+def test_shadow_stop_with_full_queue_is_bounded():
+    """Stopping never blocks past its timeout, even while the worker is stuck and the queue is full."""
+    release = threading.Event()
+
+    class SlowEngine(AntifraudEngine):
+        def evaluate(self, transaction):
+            release.wait(5)
+            return super().evaluate(transaction)
+
+    shadow = ShadowEvaluator(SlowEngine(), queue_size=1)
+    transaction = AntifraudTransaction(value=50.0, time="14:00", attempts_last_24h=1, origin=None)
+    shadow.submit(transaction, 0, True)
+    time.sleep(0.05)  # Worker picks the first job up and blocks
+    shadow.submit(transaction, 0, True)
+
+    started = time.monotonic()
+    shadow.stop(timeout=0.2)
+    assert time.monotonic() - started < 1.0
+    release.set()
+
+
+@pytest.fixture
+def logistic_model_path(tmp_path):
+    """Logistic model that only reacts to night-time transactions."""
+    path = tmp_path / "risk.json"
+    path.write_text(json.dumps({
+        "type": "logistic",
+        "intercept": -10.0,
+        "coefficients": {"is_night": 20.0}
+    }))
+    return str(path)
+
+
+def test_featurize_matrix():
+    """Builds the feature matrix in the documented column order."""
+    X = featurize([AntifraudTransaction(value=100.0, time="23:15", attempts_last_24h=2, origin=None)])
+
+    assert X.shape == (1, 5)
+    assert X[0, 0] == 100.0
+    assert X[0, 2] == 23.0
+    assert X[0, 3] == 1.0
+    assert X[0, 4] == 2.0
+
+
+def test_featurize_single_digit_hour():
+    """Times accepted by the schema without a leading zero ("9:30") parse like NightTimeRule does."""
+    X = featurize([
+        AntifraudTransaction(value=100.0, time="9:30", attempts_last_24h=0, origin=None),
+        AntifraudTransaction(value=100.0, time="3:05", attempts_last_24h=0, origin=None)
+    ])
+
+    assert X[0, 2] == 9.0
+    assert X[0, 3] == 0.0
+    assert X[1, 2] == 3.0
+    assert X[1, 3] == 1.0
+
+
+def test_stumps_model_inference(tmp_path):
+    """Gradient-boosted stumps sum leaf values per row."""
+    path = tmp_path / "stumps.json"
+    path.write_text(json.dumps({
+        "type": "stumps",
+        "base_score": 0.0,
+        "stumps": [
+            {"feature": "value", "threshold": 500.0, "left": -5.0, "right": 5.0},
+            {"feature": "attempts", "threshold": 3.0, "left": 0.0, "right": 5.0}
+        ]
+    }))
+    model = load_model(str(path))
+
+    X = featurize([
+        AntifraudTransaction(value=100.0, time="10:00", attempts_last_24h=1, origin=None),
+        AntifraudTransaction(value=900.0, time="10:00", attempts_last_24h=5, origin=None)
+    ])
+    probabilities = model.predict_proba(X)
+
+    assert probabilities[0] < 0.01
+    assert probabilities[1] > 0.99
+
+
+def test_engine_with_model_adds_points(logistic_model_path: str):
+    """Model probability is scaled to `model_weight` points on top of the rule score."""
+    engine = AntifraudEngine(model=load_model(logistic_model_path), model_weight=40)
+
+    night = AntifraudTransaction(value=50.0, time="23:00", attempts_last_24h=1, origin=None)
+    day = AntifraudTransaction(value=50.0, time="14:00", attempts_last_24h=1, origin=None)
+
+    result = engine.analyze(night)
+    assert result["score"] == 80  # NIGHT_TIME (40) + model (40)
+    assert result["approved"] is False
+    assert any(rule.startswith("MODEL_RISK") for rule in result["triggered_rules"])
+
+    assert engine.analyze(day)["score"] == 0
+    assert engine.evaluate_batch([night, day]) == [engine.evaluate(night), engine.evaluate(day)]
+
+
+def test_engine_from_config_with_model(logistic_model_path: str):
+    """Rule-set configurations can reference a model file."""
+    engine = AntifraudEngine.from_config({"rules": [], "model": {"path": logistic_model_path, "weight": 70}})
+
+    score, triggered = engine.evaluate(
+        AntifraudTransaction(value=50.0, time="02:00", attempts_last_24h=0, origin=None)
+    )
+
+    assert score == 70
+    assert triggered == []
+
+
+def test_transfer_graph_rolling_window():
+    """Edge weights and fan-in/fan-out counters expire with the rolling window."""
+    graph = TransferGraph(window_seconds=3600)
+
+    graph.record_transfer("a", "mule", 100.0, timestamp=0)
+    graph.record_transfer("b", "mule", 50.0, timestamp=1800)
+    graph.record_transfer("a", "mule", 25.0, timestamp=1900)
+    graph.record_transfer("mule", "c", 160.0, timestamp=2000)
+
+    assert graph.fan_in("mule", now=2000) == 2
+    assert graph.fan_out("mule", now=2000) == 1
+    assert graph.edge_weight("a", "mule", now=2000) == (125.0, 2)
+    assert graph.flows("mule", now=2000) == (175.0, 160.0)
+
+    # First transfer from "a" leaves the window
+    assert graph.edge_weight("a", "mule", now=3700) == (25.0, 1)
+    # Every transfer into "mule" leaves the window
+    assert graph.fan_in("mule", now=6000) == 0
+    assert graph.edge_weight("a", "mule", now=6000) == (0.0, 0)
+
+
+def test_transfer_graph_components():
+    """Union-find joins the components of users linked by transfers."""
+    graph = TransferGraph()
+
+    graph.record_transfer("a", "b", 10.0)
+    graph.record_transfer("c", "d", 10.0)
+    assert graph.component_size("a") == 2
+
+    graph.record_transfer("b", "c", 10.0)
+    assert graph.component_size("d") == 4
+    assert graph.component_size("unknown") == 1
+
+
+def test_graph_rules():
+    """Graph-derived rules only trigger for transactions carrying a user ID."""
+    graph = TransferGraph()
+    for i in range(6):
+        graph.record_transfer(f"sender-{i}", "mule", 10.0)
+
+    fan_in = FanInRule(limit=5, graph=graph)
+    ring = LargeComponentRule(limit=5, graph=graph)
+
+    transaction = AntifraudTransaction(value=50.0, time="14:00", attempts_last_24h=0, user_id="mule")
+    anonymous = AntifraudTransaction(value=50.0, time="14:00", attempts_last_24h=0)
+
+    assert fan_in.evaluate(transaction) is True
+    assert ring.evaluate(transaction) is True
+    assert fan_in.evaluate(anonymous) is False
+
+
+def test_transfer_graph_components_expire():
+    """Components only span transfers within the window, rebuilt at most every refresh interval."""
+    graph = TransferGraph(window_seconds=3600, component_refresh_seconds=60)
+    graph.record_transfer("a", "b", 10.0, timestamp=0)
+    graph.record_transfer("b", "c", 10.0, timestamp=1800)
+    graph.record_transfer("e", "f", 10.0, timestamp=1830)
+    assert graph.component_size("a", now=1830) == 3
+
+    assert graph.component_size("a", now=3700) == 1  # a -> b expired
+    assert graph.component_size("c", now=3700) == 2
+
+    assert graph.component_size("b", now=5410) == 1  # b -> c expired
+    assert graph.component_size("e", now=5440) == 2  # e -> f expired less than a refresh ago
+    assert graph.component_size("e", now=5470) == 1
+
+
+def test_analyze_graph_rules_use_the_session_user(monkeypatch: pytest.MonkeyPatch):
+    """/analyze takes the user from the session; a user_id in the body cannot target another account."""
+    graph = TransferGraph()
+    for rule in antifraud_engine.rules:
+        if hasattr(rule, "graph"):
+            monkeypatch.setattr(rule, "graph", graph)
+    for i in range(6):
+        graph.record_transfer(f"api-sender-{i}", "api-mule", 10.0)
+    payload = {"value": 50.0, "time": "14:00", "attempts_last_24h": 0}
+    client = TestClient(app)
+
+    spoofed = client.post("/antifraud/analyze", json={**payload, "user_id": "api-mule"}).json()
+    assert not any(rule.startswith("MULE_FAN_IN") for rule in spoofed["triggered_rules"])
+
+    app.dependency_overrides[get_optional_user] = lambda: UserSnapshot(
+        id="api-mule", name="Mule", cpf_cnpj="52998224725", email="mule@example.com", credit_limit=0.0
+    )
+    try:
+        result = client.post("/antifraud/analyze", json={**payload, "user_id": "someone-else"}).json()
+    finally:
+        app.dependency_overrides.pop(get_optional_user, None)
+    assert any(rule.startswith("MULE_FAN_IN") for rule in result["triggered_rules"])
+
+
+def _load_backtest():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "backtest_antifraud.py")
+    spec = importlib.util.spec_from_file_location("backtest_antifraud", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_backtest_report_on_sqlite_fixture(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """Replays a small SQLite history: approval rates, flips and triggers per rule set, baseline scored once."""
+    backtest = _load_backtest()
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        for k, (user_id, value, created_at) in enumerate([
+            ("user-a", 100.0, datetime(2025, 3, 3, 17, 0)),  # 14:00 in Brasilia
+            ("user-a", 400.0, datetime(2025, 3, 3, 18, 0)),
+            ("user-b", 50.0, datetime(2025, 3, 3, 17, 0)),
+        ]):
+            db.add(PixTransaction(
+                id=f"pix-{k}", value=value, pix_key="key", key_type="EMAIL", type=TransactionType.SENT,
+                status=PixStatus.CONFIRMED, user_id=user_id, idempotency_key=f"idem-{k}", created_at=created_at
+            ))
+        db.commit()
+
+    rule_sets = {"strict-value": {
+        "name": "strict-value", "approval_limit": 30, "rules": [{"name": "HIGH_VALUE"}, {"name": "FAN_OUT", "limit": 0}]
+    }}
+    batches = []
+    evaluate_batch = AntifraudEngine.evaluate_batch
+
+    def counting_evaluate_batch(self, transactions):
+        batches.append(len(transactions))
+        return evaluate_batch(self, transactions)
+
+    monkeypatch.setattr(AntifraudEngine, "evaluate_batch", counting_evaluate_batch)
+    rows, total = backtest.run_backtest(rule_sets, chunk_size=10, workers=0, since=None, session_factory=session_factory)
+    report = backtest.build_report(rows, total, elapsed=0.0, excluded=backtest.excluded_rules(rule_sets))
+
+    assert rows == 3
+    assert batches == [3, 3]  # One batch per engine: the baseline is not scored twice
+    assert report["rule_sets"]["active"]["approval_rate"] == 100.0
+    candidate = report["rule_sets"]["strict-value"]
+    assert candidate["approval_rate"] == pytest.approx(66.6667)
+    assert candidate["delta_pp"] == pytest.approx(-33.3333)
+    assert candidate["flipped_to_reject"] == 1 and candidate["flipped_to_approve"] == 0
+    assert candidate["rule_triggers"] == {"HIGH_VALUE": 1}
+    # Graph rules cannot be replayed: reported as excluded instead of silently never firing
+    assert candidate["excluded_rules"] == ["FAN_OUT"]
+    assert report["rule_sets"]["active"]["excluded_rules"] == ["MULE_FAN_IN", "FAN_OUT", "TRANSFER_RING"]
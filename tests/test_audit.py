@@ -0,0 +1,181 @@
+"""
+Unit tests for the Audit module.
+Validates batched persistence, hash chaining, isolation of rejected records and the admin query API.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.main import app
+from app.audit import router as audit_router
+from app.audit.models import AuditRecord
+from app.audit.store import AuditStore, verify_chain
+from app.core.config import settings
+from app.core.database import Base, get_db
+from app.core.logger import audit_log, register_audit_sink, unregister_audit_sink
+
+client = TestClient(app)
+ADMIN = {"X-Admin-Key": "secret"}
+
+
+@pytest.fixture
+def factory():
+    """Session factory over an isolated in-memory database."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def store(factory):
+    """Audit store registered as the audit_log sink (no background batching during the test)."""
+    audit_store = AuditStore(session_factory=factory, batch_size=1000, interval=60)
+    register_audit_sink(audit_store.append)
+    yield audit_store
+    unregister_audit_sink(audit_store.append)
+    audit_store.stop()
+
+
+def test_audit_log_batched_and_chained(store: AuditStore, factory):
+    """Records reach the table only on flush, numbered in order and chained to their predecessor."""
+    audit_log(action="pix_created", user="user-1", resource="pix_id=1", details={"correlation_id": "corr-1", "value": 10.0})
+    audit_log(action="pix_confirmed", user="system", resource="pix_id=1", details={"correlation_id": "corr-1"})
+    assert store.pending_count() == 2
+
+    assert store.flush() == 2
+    audit_log(action="pix_canceled", user="user-1", resource="pix_id=2", details={"correlation_id": "corr-2"})
+    store.flush()
+
+    with factory() as db:
+        records = db.query(AuditRecord).order_by(AuditRecord.sequence).all()
+        assert [record.sequence for record in records] == [1, 2, 3]
+        assert records[1].prev_hash == records[0].hash and records[2].prev_hash == records[1].hash
+        assert verify_chain(db) == {"valid": True, "records": 3, "broken_at": None}
+
+
+def test_tampering_breaks_the_chain(store: AuditStore, factory):
+    """Editing or deleting a record is detected at the first affected sequence."""
+    for k in range(4):
+        audit_log(action="pix_created", user="user-1", resource=f"pix_id={k}", details={"correlation_id": f"corr-{k}"})
+    store.flush()
+
+    with factory() as db:
+        db.execute(update(AuditRecord).where(AuditRecord.sequence == 2).values(details='{"value": 1}'))
+        db.commit()
+        assert verify_chain(db)["broken_at"] == 2
+
+        db.query(AuditRecord).filter(AuditRecord.sequence == 2).delete()
+        db.commit()
+        assert verify_chain(db) == {"valid": False, "records": 1, "broken_at": 2}
+
+
+def test_query_endpoint(store: AuditStore, factory, monkeypatch: pytest.MonkeyPatch):
+    """Admin-only search by correlation ID and action, newest first, with keyset pagination."""
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "secret")
+    monkeypatch.setattr(audit_router, "audit_store", store)
+    db = factory()
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        for k in range(3):
+            audit_log(action="pix_created", user="user-1", resource=f"pix_id={k}", details={"correlation_id": "corr-1"})
+        audit_log(action="pix_confirmed", user="system", resource="pix_id=0", details={"correlation_id": "corr-2"})
+
+        assert client.get("/audit/records").status_code == 403
+
+        page = client.get("/audit/records", params={"correlation_id": "corr-1", "limit": 2}, headers=ADMIN).json()
+        assert [record["resource"] for record in page["records"]] == ["pix_id=2", "pix_id=1"]
+        assert page["records"][0]["details"] == {"correlation_id": "corr-1"}
+
+        rest = client.get(
+            "/audit/records", params={"correlation_id": "corr-1", "before": page["next_before"]}, headers=ADMIN
+        ).json()
+        assert [record["resource"] for record in rest["records"]] == ["pix_id=0"] and rest["next_before"] is None
+
+        confirmed = client.get("/audit/records", params={"action": "pix_confirmed"}, headers=ADMIN).json()
+        assert [record["user"] for record in confirmed["records"]] == ["system"]
+
+        assert client.get("/audit/verify", headers=ADMIN).json() == {"valid": True, "records": 4, "broken_at": None}
+    finally:
+        app.dependency_overrides = {}
+        db.close()
+
+
+def test_rejected_record_is_quarantined(store: AuditStore, factory):
+    """A record the database rejects is isolated; the rest of its batch and later batches are written."""
+    engine = factory.kw["bind"]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def reject_poison(conn, cursor, statement, parameters, context, executemany):
+        # Stands in for PostgreSQL's "value too long" (SQLite does not enforce VARCHAR lengths)
+        if "INSERT INTO auditoria" in statement and "poison" in str(parameters):
+            raise DataError(statement, parameters, Exception("value too long"))
+
+    for resource in ("pix_id=1", "poison", "pix_id=2"):
+        audit_log(action="pix_created", user="user-1", resource=resource, details={"correlation_id": "corr-1"})
+
+    assert store.flush() == 2
+    assert store.quarantined == 1 and store.pending_count() == 0
+
+    audit_log(action="pix_created", user="user-1", resource="pix_id=3", details={"correlation_id": "corr-1"})
+    assert store.flush() == 1
+    with factory() as db:
+        resources = [record.resource for record in db.query(AuditRecord).order_by(AuditRecord.sequence)]
+        assert resources == ["pix_id=1", "pix_id=2", "pix_id=3"]
+        assert verify_chain(db)["valid"] is True
+
+
+def test_sequence_collision_retries_whole_batch(store: AuditStore, factory, monkeypatch: pytest.MonkeyPatch):
+    """A batch that collides with another writer's sequence is retried as a batch, not record by record."""
+    insert = store._insert
+    calls = []
+
+    def colliding_insert(records):
+        calls.append(len(records))
+        if len(calls) == 1:
+            raise IntegrityError("INSERT INTO auditoria", {}, Exception("UNIQUE constraint failed: auditoria.sequencia"))
+        insert(records)
+
+    monkeypatch.setattr(store, "_insert", colliding_insert)
+    for resource in ("pix_id=1", "pix_id=2", "pix_id=3"):
+        audit_log(action="pix_created", user="user-1", resource=resource, details={"correlation_id": "corr-1"})
+
+    assert store.flush() == 3
+    assert calls == [3, 3]
+    assert store.quarantined == 0 and store.pending_count() == 0
+    with factory() as db:
+        assert verify_chain(db) == {"valid": True, "records": 3, "broken_at": None}
+
+
+def test_oversized_fields_are_truncated(store: AuditStore, factory):
+    """Values longer than their column are cut before hashing, so the chain still verifies."""
+    audit_log(action="pix_created", user="user-1", resource="pix_id=1", details={"correlation_id": "c" * 500})
+    store.flush()
+
+    with factory() as db:
+        assert db.query(AuditRecord).one().correlation_id == "c" * 100
+        assert verify_chain(db)["valid"] is True
+
+
+def test_query_survives_failed_flush(store: AuditStore, factory, monkeypatch: pytest.MonkeyPatch):
+    """The query endpoint serves persisted records even when flushing the buffer fails."""
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "secret")
+    monkeypatch.setattr(audit_router, "audit_store", store)
+    audit_log(action="pix_created", user="user-1", resource="pix_id=1", details={"correlation_id": "corr-1"})
+    store.flush()
+
+    def failing_flush(blocking: bool = True) -> int:
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(store, "flush", failing_flush)
+    db = factory()
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        response = client.get("/audit/records", headers=ADMIN)
+    finally:
+        app.dependency_overrides = {}
+        db.close()
+
+    assert response.status_code == 200
+    assert [record["resource"] for record in response.json()["records"]] == ["pix_id=1"]
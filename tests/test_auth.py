@@ -0,0 +1,409 @@
+"""
+Unit tests for the Auth module.
+Validates registration, login, password-hashing load shedding, login throttling,
+the verified-token cache, account activation and bulk onboarding.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException, Response
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.main import app
+from app.auth import router as auth_router
+from passlib.hash import argon2
+from app.auth.bulk import import_jobs, valid_documents
+from app.auth.cache import TokenCache, UserSnapshot, token_cache
+from app.auth.dependencies import get_current_user, require_active_account
+from app.auth.hashing import PasswordHasher
+from app.auth.service import create_access_token
+from app.auth.throttle import LoginThrottle, SQLiteCounterStore
+from app.auth.models import User
+from app.core.config import settings
+from app.core.database import Base, get_db
+from app.core.migrations import upgrade_schema
+from app.pix.models import PixStatus, PixTransaction, TransactionType
+from app.pix.service import confirm_pix
+from app.core.security import (
+    ARGON2_MIN_MEMORY_COST, calibrate_password_hashing, password_needs_rehash, pwd_context, verify_and_update_password
+)
+
+client = TestClient(app)
+
+USER = {"name": "Test User", "email": "test@example.com", "cpf_cnpj": "52998224725", "password": "S3nha-forte!"}
+
+
+@pytest.fixture
+def db_session():
+    """Isolated in-memory database shared across the request thread."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def api(db_session, monkeypatch: pytest.MonkeyPatch):
+    """Test client with the database overridden, hashing inline and fresh login counters."""
+    monkeypatch.setattr(auth_router, "password_hasher", PasswordHasher(workers=0))
+    monkeypatch.setattr(auth_router, "login_throttle", LoginThrottle())
+    app.dependency_overrides[get_db] = lambda: db_session
+    yield client
+    app.dependency_overrides = {}
+
+
+@pytest.fixture
+def session_cookie(db_session):
+    """Registered user and a valid access_token cookie, with an empty token cache."""
+    user = User(name=USER["name"], email=USER["email"], cpf_cnpj=USER["cpf_cnpj"], hashed_password="x")
+    db_session.add(user)
+    db_session.commit()
+    token_cache.clear()
+    yield user, f"Bearer {create_access_token({'sub': user.cpf_cnpj}, timedelta(minutes=5))}"
+    token_cache.clear()
+
+
+@pytest.fixture
+def policy():
+    """Restores the shared password policy after calibration tests."""
+    saved = pwd_context.to_string()
+    yield pwd_context
+    pwd_context.load(saved)
+
+
+def test_register_and_login(api: TestClient):
+    """Registered users can log in; wrong passwords and duplicates are rejected."""
+    assert api.post("/auth/register", json=USER).status_code == 201
+    assert api.post("/auth/register", json=USER).status_code == 400
+
+    response = api.post("/auth/login", json={"cpf_cnpj": USER["cpf_cnpj"], "password": USER["password"]})
+    assert response.status_code == 200
+    assert response.json()["name"] == USER["name"]
+
+    assert api.post("/auth/login", json={"cpf_cnpj": USER["cpf_cnpj"], "password": "wrong"}).status_code == 401
+
+
+def test_auth_logs_mask_documents(api: TestClient, caplog: pytest.LogCaptureFixture):
+    """Registration and login logs carry the masked CPF/CNPJ and e-mail, never the raw values."""
+    with caplog.at_level("INFO", logger="fintech"):
+        api.post("/auth/register", json=USER)
+        api.post("/auth/register", json=USER)
+        api.post("/auth/login", json={"cpf_cnpj": USER["cpf_cnpj"], "password": "wrong"})
+        api.post("/auth/login", json={"cpf_cnpj": USER["cpf_cnpj"], "password": USER["password"]})
+
+    assert USER["cpf_cnpj"] not in caplog.text
+    assert USER["email"] not in caplog.text
+    assert "************.com" in caplog.text
+    assert any(getattr(record, "cpf_cnpj", None) == "***.982.247-**" for record in caplog.records)
+
+
+def test_login_shed_when_hashing_overloaded(api: TestClient, monkeypatch: pytest.MonkeyPatch):
+    """Beyond the admitted queue depth, login answers 503 with Retry-After instead of queueing."""
+    api.post("/auth/register", json=USER)
+    monkeypatch.setattr(auth_router, "password_hasher", PasswordHasher(workers=0, max_pending=0))
+
+    response = api.post("/auth/login", json={"cpf_cnpj": USER["cpf_cnpj"], "password": USER["password"]})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_hashing_process_pool():
+    """Hash and verify round-trip through worker processes."""
+    hasher = PasswordHasher(workers=1, max_pending=2)
+    try:
+        hashed = hasher.hash("S3nha-forte!")
+        assert hasher._pool._mp_context.get_start_method() != "fork"  # Never inherit the log listener's locks
+        assert hasher.verify("S3nha-forte!", hashed)
+        assert not hasher.verify("wrong", hashed)
+        assert all(hasher.verify(p, h) for p, h in zip(["a1b2c3", "d4e5f6"], hasher.hash_many(["a1b2c3", "d4e5f6"])))
+    finally:
+        hasher.shutdown()
+
+
+def test_bulk_hashing_does_not_take_interactive_slots():
+    """Batches run in the separate bulk pool: with every interactive slot busy, hash_many still runs."""
+    hasher = PasswordHasher(workers=1, max_pending=1, bulk_workers=1)
+    try:
+        with hasher._admitted():  # Interactive capacity exhausted
+            hashes = hasher.hash_many(["a1b2c3", "d4e5f6"])
+            assert hasher._bulk_pool is not None and hasher._pool is None
+        assert hasher.rejected == 0
+        assert all(pwd_context.verify(p, h) for p, h in zip(["a1b2c3", "d4e5f6"], hashes))
+    finally:
+        hasher.shutdown()
+
+
+def test_outdated_hash_upgraded_on_login(api: TestClient, db_session):
+    """Hashes with outdated cost parameters are transparently replaced on successful login."""
+    api.post("/auth/register", json=USER)
+    user = db_session.query(User).one()
+    user.hashed_password = argon2.using(rounds=1, memory_cost=8192, parallelism=1).hash(USER["password"])
+    db_session.commit()
+
+    assert api.post("/auth/login", json={"cpf_cnpj": USER["cpf_cnpj"], "password": USER["password"]}).status_code == 200
+
+    db_session.refresh(user)
+    assert not pwd_context.needs_update(user.hashed_password)
+    assert pwd_context.verify(USER["password"], user.hashed_password)
+
+
+def test_calibration_fits_budget(policy):
+    """Calibration scales passes to the budget and never drops memory below the floor."""
+    tight = calibrate_password_hashing(budget_ms=0.001)
+    assert tight["rounds"] == 1
+    assert tight["memory_cost"] == ARGON2_MIN_MEMORY_COST
+
+    calibrate_password_hashing(budget_ms=0.001)
+    hashed = policy.hash("S3nha-forte!")
+    assert "t=1" in hashed and f"m={ARGON2_MIN_MEMORY_COST}" in hashed
+
+    assert calibrate_password_hashing(budget_ms=0) == {"calibrated": False}
+
+
+def test_rehash_only_below_tolerance(policy):
+    """Hashes from a worker that calibrated slightly differently are kept; clearly weaker ones are replaced."""
+    policy.update(argon2__rounds=4, argon2__memory_cost=ARGON2_MIN_MEMORY_COST, argon2__parallelism=1)
+
+    def hashed(rounds: int) -> str:
+        return argon2.using(rounds=rounds, memory_cost=ARGON2_MIN_MEMORY_COST, parallelism=1).hash("S3nha-forte!")
+
+    assert not password_needs_rehash(hashed(6))  # Stronger: never downgraded
+    assert not password_needs_rehash(hashed(3))  # Within the band
+    assert password_needs_rehash(hashed(1))
+    assert verify_and_update_password("S3nha-forte!", hashed(3)) == (True, None)
+    valid, new_hash = verify_and_update_password("S3nha-forte!", hashed(1))
+    assert valid and "t=4" in new_hash
+    assert verify_and_update_password("wrong", hashed(1)) == (False, None)
+
+
+def test_verified_token_served_from_cache(db_session, session_cookie, monkeypatch: pytest.MonkeyPatch):
+    """After the first request, the token is neither decoded nor looked up again."""
+    user, cookie = session_cookie
+    request = SimpleNamespace(cookies={"access_token": cookie})
+
+    first = get_current_user(request, db_session)
+    assert isinstance(first, UserSnapshot) and first.id == user.id
+
+    monkeypatch.setattr("app.auth.dependencies.jwt.decode", lambda *args, **kwargs: pytest.fail("token decoded"))
+    db_session.delete(user)
+    db_session.commit()
+
+    assert get_current_user(request, db_session) == first
+
+
+def test_token_cache_invalidation(db_session, session_cookie):
+    """Logout drops the token; user changes drop every cached session of that user."""
+    user, cookie = session_cookie
+    request = SimpleNamespace(cookies={"access_token": cookie})
+
+    get_current_user(request, db_session)
+    auth_router.logout(request, Response())
+    assert token_cache.get(cookie) is None
+
+    get_current_user(request, db_session)
+    token_cache.invalidate_user(user.id)
+    assert token_cache.get(cookie) is None
+
+    db_session.delete(user)
+    db_session.commit()
+    with pytest.raises(HTTPException) as exc:
+        get_current_user(request, db_session)
+    assert exc.value.status_code == 401
+
+
+def test_token_cache_expiry_and_bound():
+    """Entries never outlive the token's exp and the cache evicts least recently used tokens."""
+    cache = TokenCache(max_entries=2, ttl_seconds=60)
+    snapshot = UserSnapshot(id="u1", name="A", cpf_cnpj="1", email="a@example.com", credit_limit=0.0)
+
+    cache.put("expired", snapshot, exp=time.time() - 1)
+    assert cache.get("expired") is None
+
+    cache.put("a", snapshot)
+    cache.put("b", snapshot)
+    cache.get("a")
+    cache.put("c", snapshot)
+    assert cache.get("b") is None
+    assert cache.get("a") == snapshot and cache.get("c") == snapshot
+
+
+def test_activated_account_skips_deposit_probe():
+    """The activation flag in the snapshot is enough; the database is not touched."""
+    snapshot = UserSnapshot(
+        id="u1", name="A", cpf_cnpj="1", email="a@example.com", credit_limit=0.0, activated_at=datetime.now(timezone.utc)
+    )
+    db = MagicMock()
+
+    assert require_active_account(snapshot, db) is snapshot
+    db.query.assert_not_called()
+    db.execute.assert_not_called()
+
+
+def test_confirmed_deposit_activates_account(db_session, session_cookie):
+    """Confirming a received PIX sets activated_at and refreshes cached sessions."""
+    user, cookie = session_cookie
+    request = SimpleNamespace(cookies={"access_token": cookie})
+    with pytest.raises(HTTPException) as exc:
+        require_active_account(get_current_user(request, db_session), db_session)
+    assert exc.value.status_code == 403
+
+    deposit = PixTransaction(
+        id="pix-1", value=100.0, pix_key="k", key_type="ALEATORIA", type=TransactionType.RECEIVED,
+        status=PixStatus.CREATED, idempotency_key="dep-1", user_id=user.id
+    )
+    db_session.add(deposit)
+    db_session.commit()
+    confirm_pix(db_session, "pix-1", "corr-1")
+
+    db_session.refresh(user)
+    assert user.activated_at is not None
+    assert get_current_user(request, db_session).activated_at is not None
+
+
+def test_legacy_account_backfilled(db_session, session_cookie):
+    """Accounts with a deposit but no flag pass the probe once and are backfilled."""
+    user, cookie = session_cookie
+    db_session.add(PixTransaction(
+        id="pix-1", value=100.0, pix_key="k", key_type="ALEATORIA", type=TransactionType.RECEIVED,
+        status=PixStatus.CONFIRMED, idempotency_key="dep-1", user_id=user.id
+    ))
+    db_session.commit()
+    request = SimpleNamespace(cookies={"access_token": cookie})
+
+    require_active_account(get_current_user(request, db_session), db_session)
+
+    db_session.refresh(user)
+    assert user.activated_at is not None
+    assert get_current_user(request, db_session).activated_at is not None
+
+
+def test_upgrade_adds_activation_column():
+    """Users tables created before activation tracking gain a nullable ativado_em; the upgrade is idempotent."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE users (id VARCHAR(36) PRIMARY KEY, nome VARCHAR(100) NOT NULL, cpf_cnpj VARCHAR(20) NOT NULL, "
+            "email VARCHAR(100) NOT NULL, hashed_password VARCHAR(255) NOT NULL, limite_credito FLOAT NOT NULL, criado_em DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO users VALUES ('u1', 'Legacy', '52998224725', 'l@example.com', 'x', 10000.0, NULL)"))
+
+    assert upgrade_schema(engine) == 1
+    assert upgrade_schema(engine) == 0
+
+    with sessionmaker(bind=engine)() as db:
+        assert db.query(User).one().activated_at is None
+
+
+def test_login_throttled_before_hashing(api: TestClient, monkeypatch: pytest.MonkeyPatch):
+    """After the identity limit, logins get 429 without reaching the hasher, even with the right password."""
+    api.post("/auth/register", json=USER)
+    for _ in range(5):
+        assert api.post("/auth/login", json={"cpf_cnpj": USER["cpf_cnpj"], "password": "wrong"}).status_code == 401
+
+    monkeypatch.setattr(auth_router, "password_hasher", PasswordHasher(workers=0, max_pending=0))
+    response = api.post("/auth/login", json={"cpf_cnpj": USER["cpf_cnpj"], "password": USER["password"]})
+
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 300
+
+
+def test_spoofed_forwarded_for_does_not_evade_ip_limit(api: TestClient, monkeypatch: pytest.MonkeyPatch):
+    """X-Forwarded-For from an untrusted peer is ignored: rotating it still counts against the peer's IP."""
+    monkeypatch.setattr(auth_router, "login_throttle", LoginThrottle(max_per_identity=0, max_per_ip=3))
+    for i in range(3):
+        response = api.post(
+            "/auth/login",
+            json={"cpf_cnpj": USER["cpf_cnpj"], "password": "wrong"},
+            headers={"X-Forwarded-For": f"203.0.113.{i}"}
+        )
+        assert response.status_code == 401
+
+    response = api.post(
+        "/auth/login", json={"cpf_cnpj": USER["cpf_cnpj"], "password": "wrong"}, headers={"X-Forwarded-For": "203.0.113.99"}
+    )
+    assert response.status_code == 429
+
+
+def test_sliding_window_estimate():
+    """Previous-window failures decay linearly as the sliding window moves past them."""
+    now = [0.0]
+    throttle = LoginThrottle(window_seconds=100, max_per_identity=4, max_per_ip=0, clock=lambda: now[0])
+    for _ in range(4):
+        throttle.record_failure("123", "1.1.1.1")
+    assert throttle.check("123", "1.1.1.1") == 100
+
+    now[0] = 150.0  # half of the previous window still counts: 4 * 0.5 = 2
+    assert throttle.check("123", "1.1.1.1") is None
+    throttle.record_failure("123", "1.1.1.1")
+    throttle.record_failure("123", "1.1.1.1")
+    assert throttle.check("123", "1.1.1.1") == 50
+
+    throttle.reset("123")
+    assert throttle.check("123", "1.1.1.1") is None
+
+
+def test_sqlite_store_shared_between_workers(tmp_path):
+    """Two throttles on the same SQLite file see each other's failures (per-IP limit)."""
+    path = str(tmp_path / "throttle.db")
+    first = LoginThrottle(SQLiteCounterStore(path), max_per_identity=0, max_per_ip=3)
+    second = LoginThrottle(SQLiteCounterStore(path), max_per_identity=0, max_per_ip=3)
+
+    first.record_failure("111", "10.0.0.1")
+    second.record_failure("222", "10.0.0.1")
+    assert first.check("333", "10.0.0.1") is None
+    first.record_failure("333", "10.0.0.1")
+
+    assert second.check("444", "10.0.0.1") is not None
+    assert second.check("444", "10.0.0.2") is None
+
+
+def test_document_check_digits():
+    """Vectorized CPF/CNPJ check digits, including repeated-digit and malformed documents."""
+    docs = ["52998224725", "11144477735", "52998224726", "11111111111", "11222333000181", "11222333000182", "123", "5299822472a"]
+    assert valid_documents(docs).tolist() == [True, True, False, False, True, False, False, False]
+
+
+def test_bulk_import_requires_admin_key(api: TestClient, monkeypatch: pytest.MonkeyPatch):
+    """Without ADMIN_API_KEY configured, or with a wrong key, the endpoint is refused."""
+    payload = {"users": [USER]}
+    assert api.post("/auth/admin/users/bulk", json=payload, headers={"X-Admin-Key": ""}).status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "secret")
+    assert api.post("/auth/admin/users/bulk", json=payload, headers={"X-Admin-Key": "wrong"}).status_code == 403
+
+
+def test_bulk_import_reports_row_failures(api: TestClient, db_session, monkeypatch: pytest.MonkeyPatch):
+    """The import runs as a background job; valid rows are inserted and each rejected row is reported."""
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "secret")
+    monkeypatch.setattr(import_jobs, "session_factory", sessionmaker(bind=db_session.get_bind()))
+    api.post("/auth/register", json=USER)
+    users = [
+        {"name": "Ana Souza", "email": "ana@example.com", "cpf_cnpj": "111.444.777-35", "password": "S3nha-forte!"},
+        {"name": "Empresa Ltda", "email": "empresa@example.com", "cpf_cnpj": "11.222.333/0001-81", "password": "S3nha-forte!"},
+        {"name": "Bad Digits", "email": "bad@example.com", "cpf_cnpj": "52998224726", "password": "S3nha-forte!"},
+        dict(USER, email="other@example.com"),
+        {"name": "Ana Clone", "email": "ana@example.com", "cpf_cnpj": "11222333000181", "password": "S3nha-forte!"},
+        {"name": "No Email", "cpf_cnpj": "11144477735", "password": "S3nha-forte!"},
+    ]
+
+    response = api.post("/auth/admin/users/bulk", json={"users": users}, headers={"X-Admin-Key": "secret"})
+
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    import_jobs.wait(job_id, timeout=30)
+    report = api.get(f"/auth/admin/users/bulk/{job_id}", headers={"X-Admin-Key": "secret"}).json()
+    assert report["status"] == "CONCLUIDO" and report["finished_at"] is not None
+    assert (report["received"], report["processed"], report["created"], report["failed"]) == (6, 6, 2, 4)
+    assert [error["row"] for error in report["errors"]] == [2, 3, 4, 5]
+    assert "check digits" in report["errors"][0]["reason"]
+    assert "email" in report["errors"][3]["reason"]
+    assert {user.cpf_cnpj for user in db_session.query(User)} == {USER["cpf_cnpj"], "11144477735", "11222333000181"}
+    assert api.post("/auth/login", json={"cpf_cnpj": "11144477735", "password": "S3nha-forte!"}).status_code == 200
+    assert api.get("/auth/admin/users/bulk/missing", headers={"X-Admin-Key": "secret"}).status_code == 404
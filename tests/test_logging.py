@@ -0,0 +1,140 @@
+"""
+Unit tests for the logging pipeline.
+Validates the bounded queue handler policies, JSON formatting, category sampling
+and context-based correlation IDs.
+"""
+import json
+import logging
+import queue
+from typing import List
+
+from fastapi.testclient import TestClient
+
+from app.core.logger import (
+    BoundedQueueHandler,
+    CorrelationFilter,
+    JsonFormatter,
+    SamplingFilter,
+    correlation_id_var,
+    logger
+)
+from app.main import app
+
+
+def _record(msg: str, level: int = logging.INFO, **fields) -> logging.LogRecord:
+    record = logging.LogRecord("fintech", level, __file__, 0, msg, None, None)
+    record.__dict__.update(fields)
+    return record
+
+
+def test_drop_policy_counts_and_reports():
+    """A full queue discards records without blocking; the loss is reported once there is room."""
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=2)
+    handler = BoundedQueueHandler(log_queue, policy="drop")
+
+    for k in range(5):
+        handler.handle(_record(f"line {k}"))
+    assert handler.dropped == 3
+    assert [log_queue.get_nowait().getMessage() for _ in range(2)] == ["line 0", "line 1"]
+
+    handler.handle(_record("line 5"))
+    assert log_queue.get_nowait().getMessage() == "line 5"
+    assert log_queue.get_nowait().getMessage() == "Log queue full: 3 records dropped"
+    assert handler.dropped == 3
+
+
+def test_block_policy_waits_then_drops():
+    """The block policy waits for room up to its timeout before discarding."""
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=1)
+    handler = BoundedQueueHandler(log_queue, policy="block", block_timeout=0.01)
+
+    handler.handle(_record("kept"))
+    handler.handle(_record("dropped"))
+
+    assert handler.dropped == 1
+    assert log_queue.get_nowait().getMessage() == "kept"
+
+
+def test_records_frozen_when_queued():
+    """Arguments and container extras are captured at the call, not when the listener formats them."""
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue()
+    handler = BoundedQueueHandler(log_queue)
+    details = {"status": "created"}
+
+    handler.handle(logging.LogRecord("fintech", logging.INFO, __file__, 0, "details=%s", (details,), None))
+    handler.handle(_record("audit", details=details))
+    details["status"] = "cancelled"
+
+    assert log_queue.get_nowait().getMessage() == "details={'status': 'created'}"
+    assert log_queue.get_nowait().details == {"status": "created"}
+
+
+def test_json_formatter_includes_structured_fields():
+    """Extra fields become top-level keys; the message is rendered lazily from its arguments."""
+    record = logging.LogRecord("fintech", logging.INFO, __file__, 0, "PIX confirmed: id=%s", ("pix-1",), None)
+    record.__dict__.update({"correlation_id": "corr-1", "pix_id": "pix-1"})
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "PIX confirmed: id=pix-1"
+    assert entry["level"] == "INFO" and entry["logger"] == "fintech"
+    assert entry["correlation_id"] == "corr-1" and entry["pix_id"] == "pix-1"
+    assert "args" not in entry and "msecs" not in entry
+
+
+def test_sampling_by_category():
+    """Sampled categories keep an even fraction; other categories and warnings always pass."""
+    sampler = SamplingFilter({"access": 0.1})
+
+    kept = sum(sampler.filter(_record("Request", category="access")) for _ in range(100))
+
+    assert kept == 10
+    assert sampler.filter(_record("Response", logging.WARNING, category="access"))
+    assert all(sampler.filter(_record("AUDIT", category="audit")) for _ in range(5))
+    assert sampler.filter(_record("plain"))
+
+
+class _Capture(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: List[logging.LogRecord] = []
+        self.addFilter(CorrelationFilter())
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def test_correlation_filter_reads_context():
+    """Records get the context's correlation ID, or N/A outside a request."""
+    token = correlation_id_var.set("corr-1")
+    try:
+        record = _record("inside")
+        CorrelationFilter().filter(record)
+        assert record.correlation_id == "corr-1"
+    finally:
+        correlation_id_var.reset(token)
+
+    record = _record("outside")
+    CorrelationFilter().filter(record)
+    assert record.correlation_id == "N/A"
+
+
+def test_request_logs_share_the_correlation_id():
+    """Middleware, router and audit lines of one request all carry the request's correlation ID."""
+    capture = _Capture()
+    logger.addHandler(capture)
+    try:
+        response = TestClient(app).post(
+            "/antifraud/analyze",
+            json={"value": 50.0, "time": "14:30", "attempts_last_24h": 1},
+            headers={"X-Correlation-ID": "corr-xyz"}
+        )
+    finally:
+        logger.removeHandler(capture)
+
+    assert response.headers["X-Correlation-ID"] == "corr-xyz"
+    messages = [record.getMessage() for record in capture.records]
+    assert any(message.startswith("Starting anti-fraud analysis") for message in messages)
+    assert any(message.startswith("AUDIT | action=antifraud_analysis") for message in messages)
+    assert {record.correlation_id for record in capture.records} == {"corr-xyz"}
+    assert correlation_id_var.get() is None
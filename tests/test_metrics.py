@@ -0,0 +1,95 @@
+"""
+Unit tests for the Prometheus metrics.
+Validates the text exposition, request and anti-fraud instrumentation and the
+aggregation of per-worker snapshot files.
+"""
+import json
+import os
+import time
+
+from fastapi.testclient import TestClient
+
+from app.core.metrics import MetricsRegistry, antifraud_decisions, http_requests
+from app.main import app
+
+client = TestClient(app)
+
+
+def _registry(directory: str = "") -> MetricsRegistry:
+    registry = MetricsRegistry(directory)
+    registry.counter("jobs_total", "Jobs by queue", ("queue",))
+    registry.histogram("job_seconds", "Job latency", buckets=(0.1, 1.0))
+    registry.collected("workers_busy", "Busy workers", "gauge", lambda: {(): 2.0})
+    return registry
+
+
+def test_render_text_exposition():
+    """Counters, cumulative histogram buckets and collected gauges follow the text format."""
+    registry = _registry()
+    jobs = registry._metrics["jobs_total"]
+    jobs.inc("emails")
+    jobs.inc("emails", amount=2)
+    seconds = registry._metrics["job_seconds"]
+    for value in (0.05, 0.5, 3.0):
+        seconds.observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE jobs_total counter" in lines
+    assert 'jobs_total{queue="emails"} 3' in lines
+    assert 'job_seconds_bucket{le="0.1"} 1' in lines
+    assert 'job_seconds_bucket{le="1"} 2' in lines
+    assert 'job_seconds_bucket{le="+Inf"} 3' in lines
+    assert "job_seconds_sum 3.55" in lines
+    assert "job_seconds_count 3" in lines
+    assert "workers_busy 2" in lines
+
+
+def test_snapshots_aggregate_across_workers(tmp_path):
+    """Counters of every worker file are summed; gauges only from recently written snapshots."""
+    def worker_file(pid: int, jobs: float, written_at: float) -> None:
+        snapshot = {
+            "pid": pid,
+            "written_at": written_at,
+            "metrics": {
+                "jobs_total": [[["emails"], jobs]],
+                "job_seconds": [[[], [[1, 0, 0], 0.05]]],
+                "workers_busy": [[[], 1.0]]
+            }
+        }
+        with open(os.path.join(tmp_path, f"worker-{pid}.json"), "w") as f:
+            json.dump(snapshot, f)
+
+    worker_file(1, 4, time.time())  # Live worker
+    worker_file(2, 6, time.time() - 3600)  # Exited worker: counts kept, gauge ignored
+
+    registry = _registry(str(tmp_path))
+    registry._metrics["jobs_total"].inc("emails")
+    lines = registry.render().splitlines()
+
+    assert 'jobs_total{queue="emails"} 11' in lines
+    assert "job_seconds_count 2" in lines
+    assert "workers_busy 3" in lines  # This worker (2) + live worker (1)
+    assert os.path.exists(os.path.join(tmp_path, f"worker-{os.getpid()}.json"))
+
+
+def test_metrics_endpoint_reports_routes_and_decisions():
+    """Requests are labelled by route template; anti-fraud decisions and SQL/pool series are exposed."""
+    before = http_requests.value("GET", "/health", "200")
+    rejected = antifraud_decisions.value("rejected", "HIGH")
+
+    client.get("/health")
+    client.get("/does-not-exist")
+    client.post("/antifraud/analyze", json={"value": 50000.0, "time": "03:00", "attempts_last_24h": 10})
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert http_requests.value("GET", "/health", "200") == before + 1
+    assert http_requests.value("GET", "unmatched", "404") >= 1
+    assert antifraud_decisions.value("rejected", "HIGH") == rejected + 1
+    body = response.text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/health",status="200",le="+Inf"}' in body
+    for name in ("db_statements_total", "db_pool_connections", "pix_created_total", "log_queue_dropped_total"):
+        assert f"# TYPE {name} " in body
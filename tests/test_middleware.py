@@ -0,0 +1,125 @@
+"""
+Unit tests for the ASGI request middleware.
+Validates tracing and security headers, correlation context, streaming pass-through
+and the Server-Timing breakdown.
+"""
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.auth.cache import token_cache
+from app.auth.models import User
+from app.auth.service import create_access_token
+from app.core.database import Base, get_db
+from app.core.logger import correlation_id_var
+from app.core.middleware import RequestContextMiddleware
+from app.core.timing import RequestTimings, current_timings, instrument_engine, span
+from app.main import app
+from app.pix.models import PixStatus, PixTransaction, TransactionType
+
+client = TestClient(app)
+
+
+def _streaming_app() -> FastAPI:
+    streaming = FastAPI()
+
+    @streaming.get("/stream")
+    def stream(request: Request) -> StreamingResponse:
+        seen = (request.state.correlation_id, correlation_id_var.get())
+
+        def chunks():
+            yield f"{seen[0]},{seen[1]}\n".encode()
+            for k in range(3):
+                yield f"chunk {k}\n".encode()
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    streaming.add_middleware(RequestContextMiddleware)
+    return streaming
+
+
+def test_headers_added_to_every_response():
+    """Security, correlation and timing headers are set, echoing a provided correlation ID."""
+    response = client.get("/health", headers={"X-Correlation-ID": "corr-abc"})
+
+    assert response.status_code == 200
+    assert response.headers["X-Correlation-ID"] == "corr-abc"
+    assert float(response.headers["X-Process-Time"]) >= 0
+    assert response.headers["Strict-Transport-Security"] == "max-age=31536000; includeSubDomains"
+    assert response.headers["X-Frame-Options"] == "DENY"
+    assert response.headers["X-Content-Type-Options"] == "nosniff"
+    assert response.headers["Referrer-Policy"] == "strict-origin-when-cross-origin"
+
+    assert len(client.get("/health").headers["X-Correlation-ID"]) == 36  # Generated UUID
+
+
+def test_invalid_correlation_id_is_replaced():
+    """Oversized or malformed client correlation IDs are replaced by a generated UUID."""
+    for value in ("x" * 101, "bad id\twith spaces"):
+        correlation_id = client.get("/health", headers={"X-Correlation-ID": value}).headers["X-Correlation-ID"]
+        assert correlation_id != value and len(correlation_id) == 36
+
+
+def test_streaming_response_passes_through():
+    """Streaming bodies are forwarded chunk by chunk with the context visible to the endpoint."""
+    response = TestClient(_streaming_app()).get("/stream", headers={"X-Correlation-ID": "corr-stream"})
+
+    assert response.status_code == 200
+    assert response.headers["X-Correlation-ID"] == "corr-stream"
+    assert response.text == "corr-stream,corr-stream\nchunk 0\nchunk 1\nchunk 2\n"
+
+
+def test_span_is_noop_outside_a_request():
+    """Spans only record while a request collector is active."""
+    with span("idle"):
+        pass
+    assert current_timings() is None
+
+    timings = RequestTimings()
+    timings.add("auth", 1.25)
+    timings.add("db", 2.0)
+    timings.add("db", 1.0)
+    assert timings.header_value(10.0) == 'auth;dur=1.2, db;dur=3.0;desc="2 queries", total;dur=10.0'
+    assert timings.as_dict() == {"auth": 1.25, "db": 3.0, "db_queries": 2}
+
+
+def test_pix_creation_server_timing():
+    """A PIX transfer reports its stages and SQL time in the Server-Timing header."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    instrument_engine(engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    user = User(
+        name="Test User", email="test@example.com", cpf_cnpj="52998224725", hashed_password="x",
+        activated_at=datetime.now(timezone.utc)
+    )
+    db.add(user)
+    db.commit()
+    db.add(PixTransaction(
+        id="deposit-1", value=500.0, pix_key="k", key_type="ALEATORIA", type=TransactionType.RECEIVED,
+        status=PixStatus.CONFIRMED, idempotency_key="deposit-1", user_id=user.id
+    ))
+    db.commit()
+    token = create_access_token({"sub": user.cpf_cnpj}, timedelta(minutes=5))
+
+    app.dependency_overrides[get_db] = lambda: db
+    token_cache.clear()
+    try:
+        response = client.post(
+            "/pix/transacoes",
+            json={"value": 10.0, "pix_key": "dest@example.com", "key_type": "EMAIL"},
+            headers={"X-Idempotency-Key": "idem-1", "Cookie": f'access_token="Bearer {token}"'}
+        )
+    finally:
+        app.dependency_overrides = {}
+        token_cache.clear()
+        db.close()
+
+    assert response.status_code == 201
+    metrics = {entry.split(";")[0].strip() for entry in response.headers["Server-Timing"].split(",")}
+    assert {"auth", "idempotency", "balance", "commit", "response", "db", "total"} <= metrics
@@ -2,9 +2,69 @@
 Unit tests for Installment module.
 Validates compound interest calculation, CET, and persistence.
 """
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
 import pytest
-from app.parcelamento.service import calculate_installments
-from app.parcelamento.schemas import SimulationRequest
+from fastapi.testclient import TestClient
+from sqlalchemy import String, create_engine, event, inspect, text
+from sqlalchemy.exc import DataError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.main import app
+from app.core.database import Base, get_db
+from app.auth.dependencies import require_active_account
+from app.auth.cache import UserSnapshot
+from app.core.config import settings
+from app.core.migrations import upgrade_schema
+from app.core.utils import time_ordered_uuid
+from app.parcelamento.cet import due_day_offsets, level_payment_irr
+from app.parcelamento.goal_seek import max_principal, minimum_term, payment_factor, required_rate
+from app.parcelamento.contracts import run_accrual
+from app.parcelamento.models import InstallmentContract, InstallmentSimulation
+from app.parcelamento.service import (
+    _get_grid_pool,
+    amortization_schedule,
+    calculate_grid,
+    calculate_installments,
+    get_simulation,
+    _calculate,
+    load_amortization_table,
+    next_catalog_rewarm,
+    save_simulation,
+    shutdown_grid_pool,
+    simulation_key,
+    warm_simulation_cache
+)
+from app.parcelamento.schemas import GridSimulationRequest, SimulationRequest
+from app.parcelamento.writer import SimulationWriter, simulation_writer
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def db_session(monkeypatch: pytest.MonkeyPatch):
+    """Isolated in-memory database shared across the request thread and the simulation writer."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(simulation_writer, "session_factory", factory)
+    session = factory()
+    yield session
+    simulation_writer.flush()
+    session.close()
+
+
+@pytest.fixture
+def api(db_session):
+    """Test client with database and active-account dependencies overridden."""
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[require_active_account] = lambda: UserSnapshot(
+        id="user-123", name="Test User", cpf_cnpj="12345678901", email="test@example.com", credit_limit=10000.0
+    )
+    yield client
+    app.dependency_overrides = {}
 
 
 def test_basic_installment_calculation():
@@ -98,3 +158,529 @@ def test_decreasing_balance():
 
     for i in range(len(result["table"]) - 1):
         assert result["table"][i]["balance"] > result["table"][i + 1]["balance"]
+
+
+@pytest.mark.parametrize("value, installments, rate", [
+    (1000.0, 1, 0.035),
+    (5000.0, 24, 0.02),
+    (250000.0, 360, 0.0099),
+])
+def test_vectorized_schedule_matches_recurrence(value: float, installments: int, rate: float):
+    """Closed-form schedule matches the month-by-month Price Table recurrence."""
+    schedule = amortization_schedule(value, installments, rate)
+    installment = schedule["installment"]
+
+    balance = value
+    for month in range(installments):
+        interest = balance * rate
+        principal = installment - interest
+        balance -= principal
+
+        assert abs(schedule["interest"][month] - interest) < 1e-6
+        assert abs(schedule["principal"][month] - principal) < 1e-6
+
+
+def test_simulate_endpoint(api: TestClient):
+    """Simulation endpoint serializes the schedule and exposes it through the history endpoint."""
+    response = api.post("/installments/simulate", json={"value": 1000.0, "installments": 12, "monthly_rate": 0.035})
+
+    assert response.status_code == 201
+    data = response.json()
+    assert len(data["table"]) == 12
+    assert data["table"][0] == {"month": 1, "installment": 103.48, "interest": 35.0, "principal": 68.48, "balance": 931.52}
+
+    history = api.get(f"/installments/history/{data['simulation_id']}")
+
+    assert history.status_code == 200
+    assert history.json()["table"] == data["table"]
+
+
+def test_grid_simulation_endpoint(api: TestClient):
+    """Offer matrix cells match individual simulations and persist a single summary."""
+    payload = {"values": [1000.0, 5000.0], "installments": [6, 12, 24], "monthly_rates": [0.02, 0.035]}
+
+    response = api.post("/installments/simulate/grid", json=payload)
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["grid_id"] == 1
+
+    single = calculate_installments(SimulationRequest(value=5000.0, installments=12, monthly_rate=0.035))
+    assert data["installment"][1][1][1] == single["installment"]
+    assert data["annual_cet"][1][1][1] == single["annual_cet"]
+
+
+def test_grid_simulation_parallel(monkeypatch: pytest.MonkeyPatch):
+    """Large grids priced across the process pool match the single-pass result."""
+    data = GridSimulationRequest(
+        values=[1000.0 * k for k in range(1, 9)],
+        installments=list(range(1, 61)),
+        monthly_rates=[0.005 * k for k in range(1, 11)]
+    )
+    sequential = calculate_grid(data)
+
+    monkeypatch.setattr(settings, "INSTALLMENT_GRID_PARALLEL_CELLS", 100)
+    monkeypatch.setattr(settings, "INSTALLMENT_GRID_WORKERS", 2)
+    try:
+        parallel = calculate_grid(data)
+    finally:
+        shutdown_grid_pool()
+
+    assert (parallel["installment"] == sequential["installment"]).all()
+    assert parallel["annual_cet"].shape == (8, 60, 10)
+
+
+def test_grid_pool_created_once_under_concurrency():
+    """Concurrent first requests share a single lazily created pool."""
+    barrier = threading.Barrier(8)
+    pools = []
+
+    def first_request():
+        barrier.wait()
+        pools.append(_get_grid_pool())
+
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len({id(pool) for pool in pools}) == 1
+    finally:
+        shutdown_grid_pool()
+
+
+def test_grid_size_validation(monkeypatch: pytest.MonkeyPatch):
+    """Rejects grids above the configured cell limit."""
+    monkeypatch.setattr(settings, "INSTALLMENT_GRID_MAX_CELLS", 10)
+    with pytest.raises(Exception):
+        GridSimulationRequest(values=[1000.0, 2000.0], installments=[12, 24], monthly_rates=[0.01, 0.02, 0.03])
+
+
+def test_simulation_memoized():
+    """Equivalent requests share one cached result."""
+    first = calculate_installments(SimulationRequest(value=1234.5, installments=18, monthly_rate=0.021))
+    second = calculate_installments(SimulationRequest(value=1234.500001, installments=18, monthly_rate=0.0210000001))
+
+    assert first is second
+    key = simulation_key(SimulationRequest(value=1234.504, installments=18, monthly_rate=0.021, disbursement_date=date(2025, 3, 10)))
+    assert key == (1234.5, 18, 0.021, 0.0, False, "2025-03-10")
+
+
+def test_due_day_offsets_clamp_to_month_end():
+    """Due dates keep the disbursement day of month, clamped on shorter months."""
+    days = due_day_offsets(date(2025, 1, 31), 4)
+
+    assert days.tolist() == [28.0, 59.0, 89.0, 120.0]  # Feb 28, Mar 31, Apr 30, May 31
+
+
+def test_cet_with_fees_and_iof():
+    """CET is the annual IRR of the released amount against the dated installments, including financed costs."""
+    data = SimulationRequest(
+        value=1000.0, installments=12, monthly_rate=0.035, fees=50.0, include_iof=True, disbursement_date=date(2025, 1, 31)
+    )
+    result = calculate_installments(data)
+    plain = calculate_installments(SimulationRequest(value=1000.0, installments=12, monthly_rate=0.035, disbursement_date=date(2025, 1, 31)))
+
+    # IOF grossed up on the financed amount: flat 0.38% plus 0.0082%/day on each principal portion
+    assert result["financed_value"] == 1072.44
+    assert result["iof"] == 22.44
+    assert result["table"][0]["balance"] + result["table"][0]["principal"] == pytest.approx(result["financed_value"], abs=0.02)
+
+    # Reference IRR by scalar bisection
+    days = due_day_offsets(date(2025, 1, 31), 12)
+    lo, hi = 0.0, 5.0
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if sum(result["installment"] / (1 + mid) ** (d / 365) for d in days) > 1000.0:
+            lo = mid
+        else:
+            hi = mid
+    assert result["annual_cet"] == pytest.approx(lo * 100, abs=0.01)
+    assert result["annual_cet"] > plain["annual_cet"] > 50.0
+
+
+def test_level_payment_irr_vectorized():
+    """Row-wise solver matches closed-form rates on evenly spaced flows, including long terms and high rates."""
+    rates = np.array([0.001, 0.02, 0.15, 0.15])
+    terms = [12, 12, 12, 360]
+    results = [
+        level_payment_irr(np.array([rate / -np.expm1(-n * np.log1p(rate))]), np.ones(1), np.arange(1, n + 1) * 365 / 12)[0]
+        for rate, n in zip(rates, terms)
+    ]
+
+    assert np.allclose(results, (1 + rates) ** 12 - 1, rtol=1e-9)
+
+
+def test_grid_cet_with_fees_matches_single():
+    """Grid CET with fees and IOF matches single simulations."""
+    payload = {
+        "values": [1000.0, 5000.0], "installments": [6, 24], "monthly_rates": [0.01, 0.05],
+        "fees": 30.0, "include_iof": True, "disbursement_date": "2025-02-10"
+    }
+    result = calculate_grid(GridSimulationRequest(**payload))
+
+    single = calculate_installments(SimulationRequest(
+        value=1000.0, installments=24, monthly_rate=0.05, fees=30.0, include_iof=True, disbursement_date=date(2025, 2, 10)
+    ))
+    assert result["installment"][0, 1, 1] == single["installment"]
+    assert result["annual_cet"][0, 1, 1] == single["annual_cet"]
+
+
+def test_simulation_persistence_is_content_addressed(db_session):
+    """Identical simulations reuse the persisted row instead of inserting duplicates."""
+    data = SimulationRequest(value=3000.0, installments=10, monthly_rate=0.025)
+    result = calculate_installments(data)
+
+    first = save_simulation(db_session, data, result, "corr-1")
+    second = save_simulation(db_session, data, result, "corr-2")
+    other = save_simulation(
+        db_session, SimulationRequest(value=3000.0, installments=12, monthly_rate=0.025), result, "corr-3"
+    )
+
+    assert first.id == second.id
+    assert other.id != first.id
+    simulation_writer.flush()
+    assert db_session.query(InstallmentSimulation).count() == 2
+
+    # Reused from the database once written
+    assert save_simulation(db_session, data, result, "corr-4").id == first.id
+
+
+def test_simulation_write_behind(api: TestClient, db_session):
+    """Simulations get time-ordered IDs, are readable before the batch is written and are inserted together."""
+    ids = []
+    for installments in (6, 12, 24):
+        response = api.post("/installments/simulate", json={"value": 777.0, "installments": installments, "monthly_rate": 0.02})
+        assert response.status_code == 201
+        ids.append(response.json()["simulation_id"])
+
+    assert ids == sorted(ids)
+    assert db_session.query(InstallmentSimulation).count() == 0
+    assert api.get(f"/installments/history/{ids[0]}").status_code == 200
+
+    assert simulation_writer.flush() == 3
+    assert simulation_writer.pending_count() == 0
+    assert db_session.query(InstallmentSimulation).filter(InstallmentSimulation.id.in_(ids)).count() == 3
+    assert api.get(f"/installments/history/{ids[2]}").json()["table"][-1]["balance"] == 0.0
+    assert api.get("/installments/history/missing").status_code == 404
+
+
+def test_rejected_simulation_does_not_block_the_batch(db_session):
+    """A row the database rejects is quarantined; the rest of its batch is written."""
+    engine = db_session.get_bind()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def reject_poison(conn, cursor, statement, parameters, context, executemany):
+        # Stands in for PostgreSQL's "value too long" (SQLite does not enforce VARCHAR lengths)
+        if "INSERT INTO simulacoes_parcelamento" in statement and "poison" in str(parameters):
+            raise DataError(statement, parameters, Exception("value too long"))
+
+    ids = []
+    for installments, correlation_id in ((6, "corr-1"), (7, "poison"), (8, "corr-3")):
+        data = SimulationRequest(value=640.0, installments=installments, monthly_rate=0.02)
+        ids.append(save_simulation(db_session, data, calculate_installments(data), correlation_id).id)
+
+    quarantined = simulation_writer.quarantined
+    assert simulation_writer.flush() == 2
+    assert simulation_writer.quarantined == quarantined + 1
+    assert simulation_writer.pending_count() == 0
+    stored = {row.id for row in db_session.query(InstallmentSimulation).filter(InstallmentSimulation.id.in_(ids))}
+    assert stored == {ids[0], ids[2]}
+
+
+def test_simulation_written_by_another_worker_is_awaited(db_session):
+    """A recent ID pending in another worker's buffer is found once that worker's flush commits."""
+    data = SimulationRequest(value=910.0, installments=5, monthly_rate=0.02)
+    other_worker = SimulationWriter(session_factory=simulation_writer.session_factory, interval=60)
+    simulation = save_simulation(db_session, data, calculate_installments(data), "corr-1")
+    simulation_writer._discard([simulation])  # Pending in the other worker's buffer instead
+    other_worker.enqueue(simulation)
+
+    timer = threading.Timer(0.2, other_worker.flush)
+    timer.start()
+    try:
+        found = get_simulation(db_session, simulation.id)
+    finally:
+        timer.join()
+        other_worker.stop()
+
+    assert found is not None and found.id == simulation.id
+    assert simulation_writer.visible_by("not-a-uuid") is None
+    assert get_simulation(db_session, "not-a-uuid") is None
+
+
+def test_buffer_overflow_writes_through(db_session, monkeypatch: pytest.MonkeyPatch):
+    """At twice max_pending the caller inserts its own record instead of growing the buffer."""
+    writer = SimulationWriter(session_factory=simulation_writer.session_factory, interval=60, max_pending=1)
+    monkeypatch.setattr(writer, "flush", lambda blocking=True: 0)  # Stalled background flushing
+    for installments in (2, 3, 4):
+        data = SimulationRequest(value=520.0, installments=installments, monthly_rate=0.02)
+        result = calculate_installments(data)
+        writer.enqueue(InstallmentSimulation(
+            id=time_ordered_uuid(), value=data.value, installments=installments, monthly_rate=data.monthly_rate,
+            fees=0.0, include_iof=False, installment_value=result["installment"], total_paid=result["total_paid"],
+            annual_cet=result["annual_cet"]
+        ))
+
+    assert writer.pending_count() == 2
+    assert db_session.query(InstallmentSimulation).filter(InstallmentSimulation.value == 520.0).count() == 1
+
+
+def test_upgrade_converts_integer_simulation_ids():
+    """Legacy INTEGER simulation IDs are converted to text in place; the upgrade is idempotent."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        # Table as created by the first release (INTEGER id, no fees/IOF/disbursement/hash columns)
+        conn.execute(text(
+            "CREATE TABLE simulacoes_parcelamento (id INTEGER NOT NULL, valor FLOAT NOT NULL, parcelas INTEGER NOT NULL, "
+            "taxa_mensal FLOAT NOT NULL, valor_parcela FLOAT NOT NULL, total_pago FLOAT NOT NULL, cet_anual FLOAT NOT NULL, "
+            "tabela_amortizacao TEXT NOT NULL, criado_em DATETIME, correlation_id VARCHAR(100), PRIMARY KEY (id))"
+        ))
+        conn.execute(text("CREATE INDEX ix_simulacoes_parcelamento_id ON simulacoes_parcelamento (id)"))
+        conn.execute(text(
+            "CREATE INDEX ix_simulacoes_parcelamento_correlation_id ON simulacoes_parcelamento (correlation_id)"
+        ))
+        conn.execute(text(
+            "INSERT INTO simulacoes_parcelamento VALUES (7, 100.0, 1, 0.01, 101.0, 101.0, 12.68, '[]', '2024-01-02 03:04:05', 'c')"
+        ))
+
+    assert upgrade_schema(engine) == 1
+    assert upgrade_schema(engine) == 0
+
+    columns = {column["name"]: column["type"] for column in inspect(engine).get_columns("simulacoes_parcelamento")}
+    assert isinstance(columns["id"], String)
+    with sessionmaker(bind=engine)() as db:
+        legacy = db.query(InstallmentSimulation).filter(InstallmentSimulation.id == "7").one()
+        assert legacy.installment_value == 101.0 and legacy.content_hash is None
+        assert legacy.fees == 0.0 and legacy.include_iof is False and legacy.amortization_table == "[]"
+
+
+def test_amortization_table_regenerated_on_read(db_session):
+    """Only parameters are stored; legacy rows with a serialized table are still readable."""
+    data = SimulationRequest(value=8000.0, installments=36, monthly_rate=0.015)
+    result = calculate_installments(data)
+    simulation = save_simulation(db_session, data, result, "corr-1")
+
+    assert simulation.amortization_table is None
+    assert load_amortization_table(simulation) == result["table"]
+
+    legacy = InstallmentSimulation(
+        value=100.0, installments=1, monthly_rate=0.01, installment_value=101.0, total_paid=101.0, annual_cet=12.68,
+        amortization_table='[{"month": 1, "installment": 101.0, "interest": 1.0, "principal": 100.0, "balance": 0.0}]'
+    )
+    assert load_amortization_table(legacy)[0]["principal"] == 100.0
+
+
+@pytest.mark.parametrize("payload, solved, expected", [
+    ({"mode": "max_principal", "installments": 12, "monthly_rate": 0.035}, "value", 999.96),
+    ({"mode": "required_rate", "value": 1000.0, "installments": 12}, "monthly_rate", 0.034993),
+    ({"mode": "min_term", "value": 1000.0, "monthly_rate": 0.035}, "installments", 13),
+])
+def test_goal_seek_endpoint(api: TestClient, payload: dict, solved: str, expected: float):
+    """Each mode solves its missing parameter without exceeding the target installment."""
+    response = api.post("/installments/simulate/goal-seek", json={"target_installment": 103.48, **payload})
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data[solved] == expected
+    assert data["installment"] <= 103.48
+    assert len(data["table"]) == data["installments"]
+
+
+def test_goal_seek_with_iof_and_infeasible_targets(api: TestClient):
+    """Financed costs are accounted for; unreachable targets are rejected."""
+    response = api.post("/installments/simulate/goal-seek", json={
+        "mode": "required_rate", "target_installment": 103.48, "value": 1000.0, "installments": 12,
+        "fees": 10.0, "include_iof": True
+    })
+    assert response.status_code == 201
+    assert 0.02 < response.json()["monthly_rate"] < 0.035
+    assert response.json()["installment"] <= 103.48
+
+    assert api.post("/installments/simulate/goal-seek", json={
+        "mode": "min_term", "target_installment": 30.0, "value": 1000.0, "monthly_rate": 0.035
+    }).status_code == 400
+    assert api.post("/installments/simulate/goal-seek", json={
+        "mode": "required_rate", "target_installment": 80.0, "value": 1000.0, "installments": 12
+    }).status_code == 400
+    assert api.post("/installments/simulate/goal-seek", json={
+        "mode": "max_principal", "target_installment": 100.0, "installments": 12
+    }).status_code == 422
+
+
+def test_goal_seek_solvers_vectorized():
+    """Inverse solvers round-trip the forward installment formula over arrays of targets."""
+    rates = np.array([0.005, 0.02, 0.035, 0.12])
+    payments = 1000.0 * payment_factor(24, rates)
+
+    assert np.allclose(max_principal(payments, 24, rates), 1000.0)
+    assert np.allclose(required_rate(np.full(4, 1000.0), 24, payments), rates, rtol=1e-9)
+    assert minimum_term(np.full(4, 1000.0), rates, payments).tolist() == [24, 24, 24, 24]
+
+
+def test_catalog_warmed_per_disbursement_day(monkeypatch):
+    product = {"value": 1234.5, "installments": 7, "monthly_rate": 0.021}
+    monkeypatch.setattr(settings, "INSTALLMENT_PRODUCT_CATALOG", [product])
+    tomorrow = date.today() + timedelta(days=1)
+
+    assert warm_simulation_cache(tomorrow) == 1
+    hits = _calculate.cache_info().hits
+    calculate_installments(SimulationRequest(**product, disbursement_date=tomorrow))
+    assert _calculate.cache_info().hits == hits + 1
+
+    # Re-warmed shortly before the next midnight in Brasília (UTC-3), for the day starting then
+    at, day = next_catalog_rewarm(datetime(2025, 3, 3, 12, 0, tzinfo=timezone.utc))
+    assert day == date(2025, 3, 4)
+    assert at == datetime(2025, 3, 4, 3, 0, tzinfo=timezone.utc) - timedelta(seconds=60)
+    assert next_catalog_rewarm(datetime(2025, 3, 4, 3, 0, tzinfo=timezone.utc))[1] == date(2025, 3, 5)
+
+
+def test_contract_from_simulation_and_accrual(api: TestClient, db_session):
+    """Contracts freeze the dated schedule; accrual charges late fee and pro rata moratory interest."""
+    simulation = api.post("/installments/simulate", json={
+        "value": 1200.0, "installments": 6, "monthly_rate": 0.02, "disbursement_date": "2025-01-31"
+    }).json()
+
+    response = api.post("/installments/contracts", json={"simulation_id": simulation["simulation_id"]})
+    assert response.status_code == 201
+    contract = response.json()
+    assert contract["installment_value"] == simulation["installment"]
+    assert [row["due_date"] for row in contract["schedule"][:2]] == ["2025-02-28", "2025-03-31"]
+    assert sum(row["principal"] for row in contract["schedule"]) == pytest.approx(1200.0, abs=0.05)
+
+    # Second installment due 2025-03-31: on 2025-04-10 two installments are late by 41 and 10 days
+    stats = run_accrual(db_session, date(2025, 4, 10), chunk_size=1)
+    assert stats["overdue_installments"] == 2
+
+    accrued = api.get(f"/installments/contracts/{contract['contract_id']}").json()
+    installment = contract["installment_value"]
+    assert accrued["overdue_installments"] == 2
+    assert accrued["late_fee"] == round(round(2 * installment, 2) * 0.02, 2)
+    assert accrued["moratory_interest"] == round(installment * 0.01 / 30 * 51, 2)
+    assert [row["status"] for row in accrued["schedule"][:3]] == ["OVERDUE", "OVERDUE", "OPEN"]
+
+    # Idempotent: nothing changes on a rerun; paid installments stop accruing
+    assert run_accrual(db_session, date(2025, 4, 10))["updated"] == 0
+    db_session.query(InstallmentContract).update({"paid_installments": 2})
+    db_session.commit()
+    assert run_accrual(db_session, date(2025, 4, 10))["overdue_installments"] == 0
+
+    assert api.get("/installments/contracts/unknown").status_code == 404
+    assert api.post("/installments/contracts", json={"simulation_id": "unknown"}).status_code == 404
+
+
+def test_contract_requires_own_uncontracted_simulation(api: TestClient, db_session):
+    """Only the owner can contract a simulation, and only once; another user's simulation looks missing."""
+    data = SimulationRequest(value=900.0, installments=3, monthly_rate=0.02)
+    result = calculate_installments(data)
+    foreign = save_simulation(db_session, data, result, "corr-1", "someone-else")
+    legacy = save_simulation(db_session, data, result, "corr-2")
+    own = api.post("/installments/simulate", json={"value": 900.0, "installments": 3, "monthly_rate": 0.02}).json()
+
+    assert len({foreign.id, legacy.id, own["simulation_id"]}) == 3  # Content addressing is scoped per user
+    assert api.post("/installments/contracts", json={"simulation_id": foreign.id}).status_code == 404
+    assert api.post("/installments/contracts", json={"simulation_id": legacy.id}).status_code == 404
+
+    assert api.post("/installments/contracts", json={"simulation_id": own["simulation_id"]}).status_code == 201
+    assert api.post("/installments/contracts", json={"simulation_id": own["simulation_id"]}).status_code == 409
+    assert db_session.query(InstallmentContract).count() == 1
+
+
+def test_contracted_simulation_not_reused(api: TestClient, db_session):
+    """Simulating the same loan again after contracting it yields a new, contractable simulation."""
+    payload = {"value": 650.0, "installments": 4, "monthly_rate": 0.02}
+    first = api.post("/installments/simulate", json=payload).json()["simulation_id"]
+    assert api.post("/installments/simulate", json=payload).json()["simulation_id"] == first
+    assert api.post("/installments/contracts", json={"simulation_id": first}).status_code == 201
+
+    second = api.post("/installments/simulate", json=payload).json()["simulation_id"]
+    assert second != first
+    assert api.post("/installments/contracts", json={"simulation_id": second}).status_code == 201
+
+    simulation_writer.flush()
+    assert api.post("/installments/simulate", json=payload).json()["simulation_id"] not in (first, second)
+
+
+def test_upgrade_adds_pricing_columns_to_populated_table():
+    """Fees, IOF and disbursement date are added to a table that already holds simulations."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for column in ("tarifas", "inclui_iof", "data_liberacao"):
+            conn.execute(text(f"ALTER TABLE simulacoes_parcelamento DROP COLUMN {column}"))
+        conn.execute(text(
+            "INSERT INTO simulacoes_parcelamento (id, valor, parcelas, taxa_mensal, valor_parcela, total_pago, cet_anual, "
+            "criado_em) VALUES ('s1', 100.0, 1, 0.01, 101.0, 101.0, 12.68, '2024-01-02 03:04:05')"
+        ))
+
+    assert upgrade_schema(engine) == 1
+    assert upgrade_schema(engine) == 0
+
+    with sessionmaker(bind=engine)() as db:
+        legacy = db.query(InstallmentSimulation).filter(InstallmentSimulation.id == "s1").one()
+        assert legacy.fees == 0.0 and legacy.include_iof is False and legacy.disbursement_date is None
+        assert load_amortization_table(legacy)[0]["principal"] == 100.0
+
+
+def test_upgrade_adds_content_hash_column():
+    """Simulation tables created before content addressing gain hash_conteudo and its index."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_simulacoes_parcelamento_hash_conteudo"))
+        conn.execute(text("ALTER TABLE simulacoes_parcelamento DROP COLUMN hash_conteudo"))
+
+    assert upgrade_schema(engine) == 1
+    assert upgrade_schema(engine) == 0
+
+    indexes = inspect(engine).get_indexes("simulacoes_parcelamento")
+    assert any(index["column_names"] == ["hash_conteudo"] for index in indexes)
+    with sessionmaker(bind=engine)() as db:
+        data = SimulationRequest(value=500.0, installments=5, monthly_rate=0.02)
+        assert save_simulation(db, data, calculate_installments(data), "corr-1").content_hash
+
+
+def test_upgrade_makes_contract_simulation_unique():
+    """The plain simulation_id index of existing contract tables becomes unique; the upgrade is idempotent."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_contratos_parcelamento_simulation_id"))
+        conn.execute(text("CREATE INDEX ix_contratos_parcelamento_simulation_id ON contratos_parcelamento (simulation_id)"))
+
+    assert upgrade_schema(engine) == 1
+    assert upgrade_schema(engine) == 0
+
+    indexes = inspect(engine).get_indexes("contratos_parcelamento")
+    assert any(index["column_names"] == ["simulation_id"] and index["unique"] for index in indexes)
+
+
+def test_accrual_vectorized_over_chunks(db_session):
+    """Chunked accrual matches a per-installment reference over many contracts."""
+    rng = np.random.default_rng(7)
+    contracts = []
+    for k in range(300):
+        installments = int(rng.integers(1, 48))
+        offsets = due_day_offsets(date(2024, 1, 1) + timedelta(days=int(rng.integers(0, 300))), installments)
+        contracts.append(InstallmentContract(
+            id=f"{k:036d}", user_id="user-123", simulation_id=f"sim-{k}", value=1000.0, financed_value=1000.0,
+            monthly_rate=0.02, installments=installments, installment_value=float(rng.integers(50, 500)),
+            disbursement_date=date(2024, 1, 1) + timedelta(days=int(rng.integers(0, 300))),
+            due_offsets=offsets.astype("<i4").tobytes(), principal=b"", interest=b"",
+            paid_installments=int(rng.integers(0, installments + 1))
+        ))
+    db_session.add_all(contracts)
+    db_session.commit()
+
+    as_of = date(2025, 1, 1)
+    stats = run_accrual(db_session, as_of, chunk_size=64)
+
+    assert stats["contracts"] == 300
+    for contract in contracts:
+        db_session.refresh(contract)
+        offsets = np.frombuffer(contract.due_offsets, dtype="<i4")
+        elapsed = (as_of - contract.disbursement_date).days
+        late = [elapsed - int(d) for d in offsets[contract.paid_installments:] if elapsed - int(d) > 0]
+        assert contract.overdue_installments == len(late)
+        assert contract.moratory_interest == pytest.approx(contract.installment_value * 0.01 / 30 * sum(late), abs=0.006)